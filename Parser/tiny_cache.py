@@ -0,0 +1,261 @@
+# tiny_cache.py
+# Content-addressed parse cache: the tokens and the AST (or the syntax error) of a TINY source or token text
+# are stored under a hash of that text, so scanning and parsing an unchanged file again is a lookup.
+# Entries live in memory and, given a directory, on disk; both are bounded in bytes and evict the least
+# recently used entries first. The disk entries sit in a subdirectory named after CACHE_VERSION, a hash
+# of the scanner and parser sources, so any change to either starts a fresh cache
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import io
+import os
+import re
+import struct
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+import scanner
+import tiny_parser
+from scanner import TinyLexer, BINARY_MAGIC, write_tokens, write_binary_tokens, load_binary_tokens
+from tiny_parser import PARSER_ENGINES, parse_token_text, with_eof, write_binary_tree, read_binary_tree
+
+
+### Entry: header (magic, flags, size of the token section), the tokens as a binary token file (or as
+### "value , TYPE" text when a token type has no binary code, e.g. LPAREN), then the tree as written by
+### write_binary_tree or, for a rejected program, the error message as UTF-8 text
+ENTRY_MAGIC = b'TINYPC01'
+ENTRY_HEADER = struct.Struct('<8sBQ')
+ENTRY_TEXT_TOKENS = 1
+ENTRY_REJECTED = 2
+ENTRY_SUFFIX = '.entry'
+
+MEMORY_BYTES = 64 * 1024 * 1024
+DISK_BYTES = 1024 * 1024 * 1024
+### temporary files older than this (seconds) in the cache directory were left by a writer that died
+TEMPORARY_MAX_AGE = 3600
+
+VERSION_NAME = re.compile(r'[0-9a-f]{16}')
+
+
+##### hash of the entry format and of the scanner and parser sources: the name of the cache subdirectory
+def cache_version():
+    digest = hashlib.sha256(ENTRY_MAGIC)
+    for module in (scanner, tiny_parser):
+        try:
+            digest.update(Path(module.__file__).read_bytes())
+        except OSError:  # no sources next to a frozen executable, its version is its build
+            digest.update(sys.executable.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()[:16]
+
+
+CACHE_VERSION = cache_version()
+
+
+##### tokens of a source text ('source') or of a token file ('tokens': its text, or its bytes for a binary
+##### token file), ending with EOF
+def load_tokens(content, kind):
+    if kind == 'source':
+        return TinyLexer(content, engine='regex').tokenize_stream()
+    if isinstance(content, bytes):
+        if content.startswith(BINARY_MAGIC):
+            return with_eof(load_binary_tokens(io.BytesIO(content), '<cached input>'))
+        content = content.decode('utf-8')
+    return with_eof(parse_token_text(content))
+
+
+##### the bytes of a cache entry for the tokens and the tree of an accepted program, or its error message
+def encode_entry(tokens, tree=None, error=None):
+    flags = 0
+    token_section = io.BytesIO()
+    try:
+        write_binary_tokens(tokens, token_section)
+    except Exception:  # a token type without a binary code
+        flags |= ENTRY_TEXT_TOKENS
+        text = io.StringIO()
+        write_tokens(tokens, text)
+        token_section = io.BytesIO(text.getvalue().encode('utf-8'))
+
+    out = io.BytesIO()
+    out.write(ENTRY_HEADER.pack(ENTRY_MAGIC, flags | (ENTRY_REJECTED if error is not None else 0),
+                                token_section.getbuffer().nbytes))
+    out.write(token_section.getbuffer())
+    if error is not None:
+        out.write(error.encode('utf-8', 'replace'))
+    else:
+        write_binary_tree(tree, out)
+    return out.getvalue()
+
+
+##### (tokens, tree, error) of an entry written by encode_entry, tree is None for a rejected program
+def decode_entry(data):
+    if len(data) < ENTRY_HEADER.size:
+        raise Exception("Invalid cache entry: truncated")
+    magic, flags, token_size = ENTRY_HEADER.unpack_from(data)
+    if magic != ENTRY_MAGIC:
+        raise Exception("Invalid cache entry: bad header")
+    f = io.BytesIO(data)
+    f.seek(ENTRY_HEADER.size)
+    if flags & ENTRY_TEXT_TOKENS:
+        tokens = parse_token_text(f.read(token_size).decode('utf-8'))
+    else:
+        tokens = load_binary_tokens(f, '<cache entry>')
+    if flags & ENTRY_REJECTED:
+        return tokens, None, f.read().decode('utf-8')
+    return tokens, read_binary_tree(f), None
+
+
+##### The cache itself. Keys come from key(); get() and parse() return fresh token and tree objects on every
+##### hit (entries are kept serialized), so callers may modify what they get, e.g. with IncrementalParser.
+##### Several processes may share a directory: entries are written to a temporary file and renamed into
+##### place, and each process keeps its own (approximate) account of the disk space in use
+class ParseCache:
+    def __init__(self, directory=None, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.memory = OrderedDict()  # key -> entry bytes, least recently used first
+        self.memory_bytes = memory_bytes
+        self.memory_used = 0
+        self.disk = OrderedDict()    # key -> entry file size, least recently used first
+        self.disk_bytes = disk_bytes
+        self.disk_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.directory = None
+        if directory is not None:
+            root = Path(directory)
+            self.directory = root / CACHE_VERSION
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._remove_stale_versions(root)
+            entries = []
+            for path in self.directory.glob('*' + ENTRY_SUFFIX):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path.name[:-len(ENTRY_SUFFIX)], stat.st_size))
+            for _, key, size in sorted(entries):
+                self.disk[key] = size
+                self.disk_used += size
+            self._evict_disk()
+
+##### cache key of a source text or token file content (str or bytes) of the given kind ('source' / 'tokens')
+    @staticmethod
+    def key(kind, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8', 'surrogatepass')
+        return hashlib.sha256(kind.encode('ascii') + b'\0' + content).hexdigest()
+
+##### (tokens, tree, error) stored under key, or None
+    def get(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+        elif self.directory is not None:
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)  # the file times order the entries on disk for the next ParseCache
+            except OSError:
+                data = None
+            if data is not None:
+                if key not in self.disk:
+                    self.disk_used += len(data)
+                self.disk[key] = len(data)
+                self.disk.move_to_end(key)
+                self._remember(key, data)
+        if data is None:
+            self.misses += 1
+            return None
+
+        try:
+            entry = decode_entry(data)
+        except Exception:  # damaged entry: drop it and treat the lookup as a miss
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+##### store the tokens and the tree of an accepted program, or the error message of a rejected one
+    def put(self, key, tokens, tree=None, error=None):
+        data = encode_entry(tokens, tree, error)
+        self._remember(key, data)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            temporary.write_bytes(data)
+            os.replace(temporary, path)
+        except OSError:
+            temporary.unlink(missing_ok=True)
+            return
+        self.disk_used += len(data) - self.disk.get(key, 0)
+        self.disk[key] = len(data)
+        self.disk.move_to_end(key)
+        self._evict_disk()
+
+##### scan and parse content (see load_tokens) with a parser engine unless it is cached.
+##### Returns (tokens, tree, error) like get(); only syntax errors are cached, not RecursionError
+    def parse(self, content, kind='source', engine='iterative'):
+        key = self.key(kind, content)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        tokens = load_tokens(content, kind)
+        try:
+            tree = PARSER_ENGINES[engine](tokens).parse_program()
+        except RecursionError:
+            raise
+        except Exception as e:
+            self.put(key, tokens, error=str(e))
+            return tokens, None, str(e)
+        self.put(key, tokens, tree)
+        return tokens, tree, None
+
+    def _path(self, key):
+        return self.directory / (key + ENTRY_SUFFIX)
+
+    def _remember(self, key, data):
+        self.memory_used += len(data) - len(self.memory.get(key, b''))
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while self.memory_used > self.memory_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_used -= len(evicted)
+
+    def _forget(self, key):
+        data = self.memory.pop(key, None)
+        if data is not None:
+            self.memory_used -= len(data)
+        if self.directory is not None:
+            self.disk_used -= self.disk.pop(key, 0)
+            self._path(key).unlink(missing_ok=True)
+
+    def _evict_disk(self):
+        while self.disk_used > self.disk_bytes and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self.disk_used -= size
+            self._path(key).unlink(missing_ok=True)
+
+##### delete the entries of other cache versions under root, and the temporary files left behind in this
+##### version's directory by writers that died: only old ones, a live writer renames its file within seconds
+    def _remove_stale_versions(self, root):
+        expired = time.time() - TEMPORARY_MAX_AGE
+        for directory in root.iterdir():
+            if not directory.is_dir() or not VERSION_NAME.fullmatch(directory.name):
+                continue
+            for path in directory.iterdir():
+                if directory != self.directory:
+                    if path.name.endswith(('.tmp', ENTRY_SUFFIX)):
+                        path.unlink(missing_ok=True)
+                elif path.name.endswith('.tmp'):
+                    try:
+                        if path.stat().st_mtime < expired:
+                            path.unlink(missing_ok=True)
+                    except OSError:  # renamed into place meanwhile
+                        pass
+            if directory != self.directory:
+                try:
+                    directory.rmdir()
+                except OSError:  # not only cache entries in it
+                    pass
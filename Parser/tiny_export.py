@@ -0,0 +1,209 @@
+# tiny_export.py
+# Headless syntax tree export: the TreeLayout of a program (the shapes of the GUI's tree view: rectangles
+# for statements, ovals for expressions, sibling pointers between the statements of a StmtSeq) written
+# straight to an SVG file, without Qt. Many files are exported in worker processes, like batch parsing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from scanner import TinyLexer, OUTPUT_BUFFER
+from tiny_parser import PARSER_ENGINES, read_token_file, WRITE_BATCH
+from tiny_pipeline import detect_input_kind, parse_cached_file
+from tiny_layout import TreeLayout
+from tiny_optimize import fold_constants
+
+
+### Colors and font of TreeVisualizer
+SVG_STYLE = (
+    '<style>'
+    'path{fill:none;stroke:#646464;stroke-width:2}'
+    'rect,ellipse{fill:#add8e6;fill-opacity:0.706;stroke:#464646;stroke-width:2}'
+    'text{font:bold 12px Arial,sans-serif;text-anchor:middle;dominant-baseline:central;fill:#000}'
+    '</style>\n'
+)
+### line segments per <path> element
+PATH_SEGMENTS = 4096
+
+
+##### a coordinate as short SVG text: 400 rather than 400.0
+def svg_number(value):
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+##### write the layout as an SVG document to the text file object out, in batches of WRITE_BATCH
+##### elements: all lines (as <path> elements), then the shapes, then their labels on top.
+##### margin is the blank border around the tree. Returns the number of shapes
+def write_svg(layout, out, margin=20):
+    bounds = layout.bounds() or (0, 0, 0, 0)
+    left, top = bounds[0] - margin, bounds[1] - margin
+    width, height = bounds[2] - bounds[0] + 2 * margin, bounds[3] - bounds[1] + 2 * margin
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+              f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_number(width)}" height="{svg_number(height)}" '
+              f'viewBox="{svg_number(left)} {svg_number(top)} {svg_number(width)} {svg_number(height)}">\n')
+    out.write(SVG_STYLE)
+
+    number = svg_number
+    parts = []
+    append = parts.append
+
+    def flush():
+        out.writelines(parts)
+        parts.clear()
+
+    segments = 0
+    for x1, y1, x2, y2, _ in layout.segments():
+        if segments % PATH_SEGMENTS == 0:
+            if segments:
+                append('"/>\n')
+            append('<path d="')
+        append(f"M{number(x1)} {number(y1)}L{number(x2)} {number(y2)}")
+        segments += 1
+        if len(parts) >= WRITE_BATCH:
+            flush()
+    if segments:
+        append('"/>\n')
+
+    for x, y, is_statement, _ in layout.shapes():
+        shape_width, shape_height = layout.size_of(is_statement)
+        if is_statement:
+            append(f'<rect x="{number(x - shape_width / 2)}" y="{number(y)}" '
+                   f'width="{number(shape_width)}" height="{number(shape_height)}"/>\n')
+        else:
+            append(f'<ellipse cx="{number(x)}" cy="{number(y + shape_height / 2)}" '
+                   f'rx="{number(shape_width / 2)}" ry="{number(shape_height / 2)}"/>\n')
+        if len(parts) >= WRITE_BATCH:
+            flush()
+
+    # one line of text per label line, centered on the shape like the QGraphicsTextItem of the GUI
+    label_lines = {}
+    for x, y, is_statement, label in layout.shapes():
+        lines = label_lines.get(label)
+        if lines is None:
+            lines = label_lines[label] = [escape(line) for line in label.split('\n')]
+        center_x = number(x)
+        center_y = y + layout.size_of(is_statement)[1] / 2
+        if len(lines) == 1:
+            append(f'<text x="{center_x}" y="{number(center_y)}">{lines[0]}</text>\n')
+        else:
+            append(f'<text x="{center_x}" y="{number(center_y)}">')
+            for i, line in enumerate(lines):
+                dy = f"{-0.6 * (len(lines) - 1):.1f}em" if i == 0 else "1.2em"
+                append(f'<tspan x="{center_x}" dy="{dy}">{line}</tspan>')
+            append('</text>\n')
+        if len(parts) >= WRITE_BATCH:
+            flush()
+
+    append('</svg>\n')
+    flush()
+    return len(layout)
+
+
+##### parse a token or source file ('auto': detected) and return its Program ASTNode
+def load_ast(path, kind='auto', engine='iterative', cache_dir=None):
+    if kind == 'auto':
+        kind = detect_input_kind(path)
+    if cache_dir is not None:
+        _, ast, error = parse_cached_file(path, kind, engine, cache_dir)
+        if error is not None:
+            raise Exception(error)
+        return ast
+    if kind == 'tokens':
+        tokens = read_token_file(path)
+    else:
+        with open(path) as f:
+            tokens = TinyLexer(f.read(), engine='regex').tokenize()
+    return PARSER_ENGINES[engine](tokens).parse_program()
+
+
+##### parse path and write the SVG of its tree (with folded expressions if fold) to svg_path, returns the
+##### number of shapes
+def export_file(path, svg_path, kind='auto', engine='iterative', cache_dir=None, fold=False):
+    ast = load_ast(path, kind, engine, cache_dir)
+    layout = TreeLayout().layout(fold_constants(ast) if fold else ast)
+    with open(svg_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+        return write_svg(layout, f)
+
+
+##### worker side of export_batch: (input, svg file, shapes or None, seconds, error message or None)
+def export_batch_job(job):
+    path, svg_path, kind, engine, cache_dir, fold = job
+    start = time.perf_counter()
+    try:
+        Path(svg_path).parent.mkdir(parents=True, exist_ok=True)
+        shapes = export_file(path, svg_path, kind, engine, cache_dir, fold)
+        return (path, svg_path, shapes, time.perf_counter() - start, None)
+    except Exception as e:
+        return (path, svg_path, None, time.perf_counter() - start, str(e))
+
+
+##### export every path to out_dir/<name>.svg (next to the input without out_dir) with `workers`
+##### processes, workers=1 exports in this process. Yields the export_batch_job results in input order
+def export_batch(paths, out_dir=None, workers=None, kind='auto', engine='iterative', cache_dir=None,
+                 fold=False):
+    jobs = []
+    for path in paths:
+        path = Path(path)
+        svg_path = (Path(out_dir) if out_dir is not None else path.parent) / (path.name + '.svg')
+        jobs.append((str(path), str(svg_path), kind, engine, cache_dir and str(cache_dir), fold))
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(export_batch_job, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        yield from pool.map(export_batch_job, jobs, chunksize=chunksize)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export the syntax trees of TINY programs as SVG files")
+    arg_parser.add_argument('inputs', nargs='+', metavar='FILE_OR_GLOB',
+                            help="source or token files")
+    arg_parser.add_argument('--out-dir', default=None, metavar='DIR',
+                            help="directory for the <name>.svg files (default: next to the inputs)")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the input files (default: auto, detected per file)")
+    arg_parser.add_argument('--engine', choices=sorted(PARSER_ENGINES), default='iterative',
+                            help="parser engine (default: iterative)")
+    arg_parser.add_argument('--workers', type=int, default=None, metavar='N',
+                            help="worker processes (default: one per CPU, 1: no pool)")
+    arg_parser.add_argument('--cache', default=None, metavar='DIR',
+                            help="look the inputs up in the parse cache in DIR (see tiny_cache.py)")
+    arg_parser.add_argument('--fold', action='store_true',
+                            help="draw the trees with constant expressions folded (see tiny_optimize.py)")
+    args = arg_parser.parse_args()
+
+    paths = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern, recursive=True)) if not Path(pattern).is_file() else [pattern]
+        paths.extend(path for path in matches if Path(path).is_file())
+    if not paths:
+        print("Error: no input files.")
+        return
+
+    start = time.perf_counter()
+    files = failed = shapes = 0
+    for path, svg_path, count, seconds, error in export_batch(
+            paths, args.out_dir, workers=args.workers, kind=args.input, engine=args.engine, cache_dir=args.cache,
+            fold=args.fold):
+        files += 1
+        if error is not None:
+            failed += 1
+            print(f"FAILED  {path}: {error}")
+            continue
+        shapes += count
+        print(f"{seconds * 1000:9.2f} ms  {count:>9} shapes  {path} -> {svg_path}")
+    wall = time.perf_counter() - start
+    print(f"Export complete. {files - failed}/{files} files, {shapes} shapes in {wall:.3f} s")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,203 @@
+# tiny_incremental.py
+# Incremental parsing: after an edit of the token list only the statements around the edit are parsed
+# again and spliced into the previous AST, every other subtree is reused as it is
+from tiny_parser import TinyParser, IterativeTinyParser, ASTNode, STMT_SEQ
+
+
+##### token extent of the statements of one StmtSeq node, kept next to the AST (ASTNode has no room for it).
+##### lengths[i]: tokens of statement i including the ';' after it,
+##### nested[i]: [offset from the start of statement i, StmtSeqSpans] of the StmtSeqs inside statement i
+class StmtSeqSpans:
+    __slots__ = ('lengths', 'nested')
+
+    def __init__(self):
+        self.lengths = []
+        self.nested = []
+
+
+##### TinyParser that also records the StmtSeqSpans of every StmtSeq it builds
+class SpanTinyParser(TinyParser):
+    STMT_START = IterativeTinyParser.STMT_START
+
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self._nested = []  # nested list of the statement being parsed, StmtSeqs append themselves to it
+
+##### parse one statement and the ';' after it: (node, token count, nested spans, another statement follows)
+    def parse_stmt_spans(self):
+        start = self.pos
+        self._nested = nested = []
+        node = self.parse_stmt()
+        for entry in nested:
+            entry[0] -= start
+        more = False
+        if self.peek_type() == 'SEMICOLON':
+            self.match_lexeme('SEMICOLON')
+            more = self.peek_type() in self.STMT_START
+        return node, self.pos - start, nested, more
+
+    # stmt_seq -> stmt { ; stmt }, same tree and errors as TinyParser.parse_stmt_seq
+    def parse_stmt_seq(self):
+        start = self.pos
+        enclosing = self._nested
+        node = ASTNode(STMT_SEQ)
+        spans = StmtSeqSpans()
+        more = True
+        while more:
+            stmt, length, nested, more = self.parse_stmt_spans()
+            node.children.append(stmt)
+            spans.lengths.append(length)
+            spans.nested.append(nested)
+        self._nested = enclosing
+        enclosing.append([start, spans])
+        return node
+
+
+##### merge two consecutive edits (first, removed, added), as returned by scanner.IncrementalLexer.edit,
+##### into one edit of the original token list
+def merge_edits(earlier, later):
+    first1, removed1, added1 = earlier
+    first2, removed2, added2 = later
+    first = min(first1, first2)
+    end = max(first1 + added1, first2 + removed2)  # end of the union, in the tokens between the two edits
+    removed = end - (added1 - removed1) - first
+    return first, removed, end + (added2 - removed2) - first
+
+
+##### the edit (first, removed, added) that turns the token list old into new: everything outside the
+##### common prefix and suffix of the two lists
+def diff_tokens(old, new):
+    count = min(len(old), len(new))
+    first = 0
+    while first < count and old[first] == new[first]:
+        first += 1
+    tail = 0
+    while tail < count - first and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    return first, len(old) - first - tail, len(new) - first - tail
+
+
+##### Keeps the AST of a token list together with the StmtSeqSpans of its StmtSeqs.
+##### reparse() takes an edit of the token list and re-parses, in the innermost StmtSeq around the edit,
+##### the statements from the one touching the edit up to the first statement boundary past the edit
+##### where the old statements line up again; those are spliced into the StmtSeq, everything else is
+##### reused. A re-parse that fails or does not line up within its StmtSeq moves to the enclosing
+##### StmtSeq, up to a full parse, so the result (tree or error) is always that of TinyParser
+class IncrementalParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.tree = None
+        self.spans = None
+
+##### parse the whole token list, return the Program ASTNode
+    def parse(self, tokens=None):
+        if tokens is not None:
+            self.tokens = tokens
+        self.tree = self.spans = None
+        parser = SpanTinyParser(self.tokens)
+        tree = parser.parse_program()
+        self.tree, self.spans = tree, parser._nested[0][1]
+        return tree
+
+##### tokens[first:first + added] replaced the old tokens[first:first + removed]; tokens is the new token
+##### list (default: the same, edited in place). Returns the updated Program ASTNode
+    def reparse(self, first, removed, added, tokens=None):
+        if tokens is not None:
+            self.tokens = tokens
+        if self.tree is None:
+            return self.parse()
+
+        # from the root StmtSeq down: (node, spans, start, statement index, nested index) of every
+        # StmtSeq whose statement range contains the edit
+        path = []
+        node, spans, start = self.tree.children[0], self.spans, 0
+        end = first + removed
+        while True:
+            index, stmt_start = self._statement_at(spans, start, first)
+            entry = [node, spans, start, index, None]
+            path.append(entry)
+            if index is None:
+                break
+            for nested_index, (offset, nested) in enumerate(spans.nested[index]):
+                nested_start = stmt_start + offset
+                if nested_start <= first and end <= nested_start + sum(nested.lengths):
+                    entry[4] = nested_index
+                    node = self._nested_node(node.children[index], nested_index)
+                    spans, start = nested, nested_start
+                    break
+            else:
+                break
+
+        delta = added - removed
+        for depth in range(len(path) - 1, -1, -1):
+            node, spans, start, _, _ = path[depth]
+            if self._reparse_seq(node, spans, start, first, end, delta):
+                break
+        else:
+            return self.parse()
+
+        # the StmtSeqs around the re-parsed one grew or shrank by delta tokens
+        for node, spans, start, index, nested_index in path[:depth]:
+            spans.lengths[index] += delta
+            for entry in spans.nested[index][nested_index + 1:]:
+                entry[0] += delta
+        return self.tree
+
+##### (index, start) of the first statement of the StmtSeq at `start` that ends at or after token `first`
+    @staticmethod
+    def _statement_at(spans, start, first):
+        for index, length in enumerate(spans.lengths):
+            if start + length >= first:
+                return index, start
+            start += length
+        return None, start
+
+##### the nested_index-th StmtSeq child of a statement node (IfStmt: then / else, RepeatStmt: body)
+    @staticmethod
+    def _nested_node(stmt, nested_index):
+        return [child for child in stmt.children if child.kind == STMT_SEQ][nested_index]
+
+##### re-parse the statements of one StmtSeq around the edit [first, end) (old token indexes, delta:
+##### change in length). Returns False when the new statements do not line up with the old ones
+    def _reparse_seq(self, node, spans, start, first, end, delta):
+        lengths = spans.lengths
+        index, stmt_start = self._statement_at(spans, start, first)
+        if index is None:
+            return False
+        new_end = end + delta
+
+        # old statement boundaries (token after each statement, old indexes) from `index` on
+        boundary = stmt_start
+        boundaries = []
+        for length in lengths[index:]:
+            boundary += length
+            boundaries.append(boundary)
+        seq_end = boundary + delta
+
+        parser = SpanTinyParser(self.tokens)
+        parser.pos = stmt_start
+        new_nodes, new_lengths, new_nested = [], [], []
+        old = 0
+        try:
+            while True:
+                stmt, length, nested, more = parser.parse_stmt_spans()
+                new_nodes.append(stmt)
+                new_lengths.append(length)
+                new_nested.append(nested)
+                pos = parser.pos
+                if pos >= new_end:
+                    while old < len(boundaries) and boundaries[old] + delta < pos:
+                        old += 1
+                    if old < len(boundaries) and boundaries[old] + delta == pos \
+                            and more == (old < len(boundaries) - 1):
+                        break
+                if not more or pos > seq_end:
+                    return False
+        except Exception:
+            return False
+
+        stop = index + old + 1
+        node.children[index:stop] = new_nodes
+        lengths[index:stop] = new_lengths
+        spans.nested[index:stop] = new_nested
+        return True
@@ -0,0 +1,260 @@
+# tiny_interpreter.py
+# Runs TINY programs. The AST is walked once to give every variable a slot in a list and to turn every
+# node into a Python closure specialized for its operands; running the program is then calling closures,
+# with no label strings, no name lookups and no dispatch on node kinds left in the loop.
+# Integers only: comparisons give 1 or 0, '/' truncates toward zero, variables start at 0
+from pathlib import Path
+import argparse
+import operator
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from scanner import TinyLexer
+from tiny_parser import (PARSER_ENGINES, read_token_file, STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT,
+                         READ_STMT, WRITE_STMT, OP_EXPR, NUMBER, IDENTIFIER, NODE_KIND_NAMES)
+from tiny_pipeline import detect_input_kind
+
+
+##### integer division truncating toward zero, like TINY's C implementation
+def tiny_div(a, b):
+    if b == 0:
+        raise Exception("Runtime Error: division by zero")
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return q
+
+
+def tiny_less(a, b):
+    return 1 if a < b else 0
+
+
+def tiny_equal(a, b):
+    return 1 if a == b else 0
+
+
+### Operator lexeme -> function of the two operand values
+OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': tiny_div,
+             '<': tiny_less, '=': tiny_equal}
+
+
+##### (name -> slot index) of every variable of the program, in order of first appearance
+def resolve_slots(program):
+    slots = {}
+    pending = [program]
+    while pending:
+        node = pending.pop()
+        if node.kind == IDENTIFIER and node.value not in slots:
+            slots[node.value] = len(slots)
+        pending.extend(reversed(node.children))
+    return slots
+
+
+class TinyInterpreter:
+    """
+    A compiled TINY program: TinyInterpreter(program AST).run(inputs) returns the list of written values.
+    Every expression becomes a function of the variable list, every statement a function that updates
+    it. read takes the next value of the input buffer, write appends to the output list; both are
+    plain lists handed over whole, there is no I/O per statement.
+    """
+
+    def __init__(self, program):
+        self.slots = resolve_slots(program)
+        self.variables = {}  # name -> value after the last run
+        self._inputs = None
+        self._outputs = None
+        root = program.children[0] if program.children else program
+        self._body = self._statement(root)
+
+    ##### run the program with the given input values, returns the written values
+    def run(self, inputs=()):
+        self._inputs = iter(inputs)
+        self._outputs = []
+        variables = [0] * len(self.slots)
+        try:
+            self._body(variables)
+            return self._outputs
+        finally:
+            self.variables = dict(zip(self.slots, variables))
+            self._inputs = None
+
+    # ---------------------------
+    # Statements
+    # ---------------------------
+
+    def _statement(self, node):
+        kind = node.kind
+        if kind == STMT_SEQ:
+            statements = tuple(self._statement(child) for child in node.children)
+            if len(statements) == 1:
+                return statements[0]
+
+            def run_seq(v):
+                for statement in statements:
+                    statement(v)
+            return run_seq
+
+        if kind == ASSIGN_STMT:
+            return self._assign(self.slots[node.children[0].value], node.children[1])
+
+        if kind == READ_STMT:
+            name = node.children[0].value
+            slot = self.slots[name]
+            interpreter = self
+
+            def run_read(v):
+                for value in interpreter._inputs:
+                    v[slot] = value
+                    return
+                raise Exception(f"Runtime Error: no input left for 'read {name}'")
+            return run_read
+
+        if kind == WRITE_STMT:
+            expr = self._expr(node.children[0])
+            interpreter = self
+
+            def run_write(v):
+                interpreter._outputs.append(expr(v))
+            return run_write
+
+        if kind == IF_STMT:
+            cond = self._expr(node.children[0])
+            then_branch = self._statement(node.children[1])
+            if len(node.children) > 2:
+                else_branch = self._statement(node.children[2])
+
+                def run_if_else(v):
+                    if cond(v):
+                        then_branch(v)
+                    else:
+                        else_branch(v)
+                return run_if_else
+
+            def run_if(v):
+                if cond(v):
+                    then_branch(v)
+            return run_if
+
+        if kind == REPEAT_STMT:
+            body = self._statement(node.children[0])
+            cond = self._expr(node.children[1])
+
+            def run_repeat(v):
+                body(v)
+                while not cond(v):
+                    body(v)
+            return run_repeat
+
+        raise Exception(f"Runtime Error: cannot run a {NODE_KIND_NAMES[kind]} node")
+
+    ##### x := expr, specialized for the common x := y op z shapes
+    def _assign(self, slot, expr_node):
+        if expr_node.kind == OP_EXPR:
+            op_node, left, right = expr_node.children
+            op = OPERATORS[op_node.value]
+            if left.kind == IDENTIFIER and right.kind == NUMBER:
+                left_slot, constant = self.slots[left.value], int(right.value)
+
+                def run_assign_var_const(v):
+                    v[slot] = op(v[left_slot], constant)
+                return run_assign_var_const
+            if left.kind == IDENTIFIER and right.kind == IDENTIFIER:
+                left_slot, right_slot = self.slots[left.value], self.slots[right.value]
+
+                def run_assign_var_var(v):
+                    v[slot] = op(v[left_slot], v[right_slot])
+                return run_assign_var_var
+
+        expr = self._expr(expr_node)
+
+        def run_assign(v):
+            v[slot] = expr(v)
+        return run_assign
+
+    # ---------------------------
+    # Expressions
+    # ---------------------------
+
+    def _expr(self, node):
+        kind = node.kind
+        if kind == NUMBER:
+            constant = int(node.value)
+            return lambda v: constant
+        if kind == IDENTIFIER:
+            return operator.itemgetter(self.slots[node.value])
+        if kind != OP_EXPR:
+            raise Exception(f"Runtime Error: cannot evaluate a {NODE_KIND_NAMES[kind]} node")
+
+        op_node, left, right = node.children
+        op = OPERATORS[op_node.value]
+        if left.kind == IDENTIFIER and right.kind == NUMBER:
+            left_slot, constant = self.slots[left.value], int(right.value)
+            return lambda v: op(v[left_slot], constant)
+        if left.kind == NUMBER and right.kind == IDENTIFIER:
+            constant, right_slot = int(left.value), self.slots[right.value]
+            return lambda v: op(constant, v[right_slot])
+        if left.kind == IDENTIFIER and right.kind == IDENTIFIER:
+            left_slot, right_slot = self.slots[left.value], self.slots[right.value]
+            return lambda v: op(v[left_slot], v[right_slot])
+        left_expr = self._expr(left)
+        right_expr = self._expr(right)
+        return lambda v: op(left_expr(v), right_expr(v))
+
+
+##### parse a source or token file ('auto': detected) into its Program ASTNode
+def load_program(path, kind='auto'):
+    if kind == 'auto':
+        kind = detect_input_kind(path)
+    if kind == 'tokens':
+        tokens = read_token_file(path)
+    else:
+        with open(path) as f:
+            tokens = TinyLexer(f.read(), engine='regex').tokenize()
+    return PARSER_ENGINES['iterative'](tokens).parse_program()
+
+
+##### integers separated by whitespace (or commas) in text
+def parse_inputs(text):
+    try:
+        return [int(value) for value in text.replace(',', ' ').split()]
+    except ValueError as e:
+        raise Exception(f"Invalid input value: {e}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run a TINY program")
+    arg_parser.add_argument('program', help="TINY source or token file")
+    arg_parser.add_argument('values', nargs='*', type=int,
+                            help="input values for the program's read statements")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the program file (default: auto, detected)")
+    arg_parser.add_argument('--inputs', default=None, metavar='FILE',
+                            help="read the input values from FILE ('-': standard input) instead")
+    args = arg_parser.parse_args()
+
+    program_file = Path(args.program)
+    if not program_file.exists():
+        print(f"Error: Input file '{program_file}' does not exist.")
+        return
+
+    try:
+        program = load_program(program_file, args.input)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+
+    inputs = args.values
+    if args.inputs is not None:
+        text = sys.stdin.read() if args.inputs == '-' else Path(args.inputs).read_text()
+        inputs = parse_inputs(text)
+
+    try:
+        outputs = TinyInterpreter(program).run(inputs)
+    except Exception as e:
+        print(e)
+        return
+    sys.stdout.write("".join(f"{value}\n" for value in outputs))
+
+
+if __name__ == "__main__":
+    main()
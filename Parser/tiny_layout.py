@@ -0,0 +1,227 @@
+# tiny_layout.py
+# Syntax tree layout without any drawing: the position of every shape (rectangles for statements, ovals
+# for expressions) and of every line (parent edges, sibling pointers between the statements of a StmtSeq),
+# computed without recursion into arrays. Used by the GUI's TreeVisualizer and the headless exporters
+from array import array
+
+from tiny_parser import (PROGRAM, STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT,
+                         OP_EXPR, NUMBER, IDENTIFIER, OP)
+
+
+STATEMENT_KINDS = frozenset((IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT))
+
+### Line kinds in TreeLayout.line_kinds
+EDGE, SIBLING = 0, 1
+
+
+##### text shown in the shape of a node, e.g. 'if', 'assign\n(x)', 'Const \n(3)' or 'Op\n(+)'
+def format_label(node):
+    kind = node.kind
+    if kind == IF_STMT:
+        return 'if'
+    elif kind == REPEAT_STMT:
+        return 'repeat'
+    elif kind in (ASSIGN_STMT, READ_STMT):
+        name = 'assign' if kind == ASSIGN_STMT else 'read'
+        if node.children and node.children[0].kind == IDENTIFIER and node.children[0].value is not None:
+            return f'{name}\n({node.children[0].value})'
+        return name
+    elif kind == WRITE_STMT:
+        return 'write'
+    elif node.value is not None:
+        if kind == IDENTIFIER:
+            return f'id\n({node.value})'
+        elif kind == NUMBER:
+            return f'Const \n({node.value})'
+        elif kind == OP:
+            return f'Op\n({node.value})'
+    return node.label
+
+
+##### positions in node.children of the children drawn below the node: a ReadStmt shows its identifier in
+##### its own label, an AssignStmt only its expression, an OpExpr its operands (its operator is its label)
+def drawn_children(node):
+    children = node.children
+    if node.kind == READ_STMT:
+        return [k for k, child in enumerate(children) if child.kind != IDENTIFIER]
+    elif node.kind == ASSIGN_STMT:
+        return range(1, len(children))
+    elif node.kind == OP_EXPR and len(children) >= 3:
+        return range(1, 3)
+    return range(len(children))
+
+
+class TreeLayout:
+    """
+    Coordinates of a syntax tree, one entry per shape: xs (center), ys (top), statements (1: rectangle,
+    0: oval) and labels; lines holds x1, y1, x2, y2 of every line, line_kinds EDGE or SIBLING.
+    The tree itself is not modified.
+
+    Every node takes `width` columns of horizontal_spacing: one for a leaf, the sum of its children
+    for a StmtSeq or a statement, left + 1 + right for an OpExpr, which is drawn as an oval with its
+    operator. The statements of a StmtSeq sit side by side on one row, only the first is connected
+    to the parent, the others by sibling pointers.
+    layout() numbers the nodes breadth first, so the children of a node have consecutive numbers:
+    widths are summed from the last node back to the first, positions handed from the first node on.
+    """
+
+    def __init__(self, horizontal_spacing=160, vertical_spacing=100, rect_width=100, rect_height=40,
+                 oval_width=90, oval_height=50, origin=(400, 50)):
+        self.horizontal_spacing = horizontal_spacing
+        self.vertical_spacing = vertical_spacing
+        self.rect_width = rect_width
+        self.rect_height = rect_height
+        self.oval_width = oval_width
+        self.oval_height = oval_height
+        self.origin = origin
+        self.clear()
+
+    def clear(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.statements = array('B')
+        self.labels = []
+        self.lines = array('d')
+        self.line_kinds = array('B')
+
+    def __len__(self):
+        return len(self.statements)
+
+    def size_of(self, is_statement):
+        if is_statement:
+            return self.rect_width, self.rect_height
+        return self.oval_width, self.oval_height
+
+##### (center x, top y, is statement, label) of every shape
+    def shapes(self):
+        return zip(self.xs, self.ys, map(bool, self.statements), self.labels)
+
+##### (x1, y1, x2, y2, line kind) of every line
+    def segments(self):
+        lines = self.lines
+        for i, kind in enumerate(self.line_kinds):
+            yield lines[4 * i], lines[4 * i + 1], lines[4 * i + 2], lines[4 * i + 3], kind
+
+##### (left, top, right, bottom) around every shape and line, None for an empty layout
+    def bounds(self):
+        if not len(self):
+            return None
+        half = max(self.rect_width, self.oval_width) / 2
+        left, right = min(self.xs) - half, max(self.xs) + half
+        top, bottom = min(self.ys), max(self.ys) + max(self.rect_height, self.oval_height)
+        if self.lines:
+            line_xs, line_ys = self.lines[0::2], self.lines[1::2]
+            left, right = min(left, min(line_xs)), max(right, max(line_xs))
+            top, bottom = min(top, min(line_ys)), max(bottom, max(line_ys))
+        return left, top, right, bottom
+
+##### lay out the tree of ast_root (a Program is drawn from its StmtSeq on), returns self
+    def layout(self, ast_root):
+        self.clear()
+        if not ast_root:
+            return self
+        root = ast_root
+        if root.kind == PROGRAM and root.children:
+            root = root.children[0]
+
+        # breadth-first numbering: nodes[i], its children are nodes[first[i]:first[i] + len(children)]
+        nodes = [root]
+        first = array('Q')
+        for node in nodes:
+            first.append(len(nodes))
+            nodes.extend(node.children)
+        count = len(nodes)
+
+        widths = array('d', bytes(8 * count))
+        for i in range(count - 1, -1, -1):
+            node = nodes[i]
+            children = node.children
+            start = first[i]
+            if not children:
+                widths[i] = 1
+            elif node.kind == OP_EXPR and len(children) >= 3:
+                widths[i] = widths[start + 1] + 1 + widths[start + 2]
+            else:
+                widths[i] = max(1, sum(widths[start:start + len(children)]))
+
+        xs, ys, statements, labels = self.xs, self.ys, self.statements, self.labels
+        lines, line_kinds = self.lines, self.line_kinds
+        spacing = self.horizontal_spacing
+        # where each drawn node goes: x, top y and the point its parent edge starts from
+        placed = array('B', bytes(count))
+        place_x = array('d', bytes(8 * count))
+        place_y = array('d', bytes(8 * count))
+        has_edge = array('B', bytes(count))
+        edge_x = array('d', bytes(8 * count))
+        edge_y = array('d', bytes(8 * count))
+        shape_of = array('q', [-1]) * count  # index of the node's shape, -1: none (StmtSeq, not drawn)
+        placed[0] = 1
+        place_x[0], place_y[0] = self.origin
+
+        for i in range(count):
+            if not placed[i]:
+                continue
+            node = nodes[i]
+            x, y = place_x[i], place_y[i]
+            start = first[i]
+
+            if node.kind == STMT_SEQ:
+                # statements side by side, the first one takes the StmtSeq's parent edge
+                current_x = x - (sum(widths[start:start + len(node.children)]) - 1) * spacing / 2
+                for j in range(start, start + len(node.children)):
+                    placed[j] = 1
+                    place_x[j] = current_x + (widths[j] - 1) * spacing / 2
+                    place_y[j] = y
+                    current_x += widths[j] * spacing
+                if node.children and has_edge[i]:
+                    has_edge[start] = 1
+                    edge_x[start], edge_y[start] = edge_x[i], edge_y[i]
+                continue
+
+            is_opexpr = node.kind == OP_EXPR and len(node.children) >= 3
+            is_statement = node.kind in STATEMENT_KINDS
+            height = self.size_of(is_statement)[1]
+            shape_of[i] = len(statements)
+            xs.append(x)
+            ys.append(y)
+            statements.append(is_statement)
+            labels.append(format_label(node.children[0] if is_opexpr else node))
+            if has_edge[i]:
+                lines.extend((edge_x[i], edge_y[i], x, y))
+                line_kinds.append(EDGE)
+
+            drawn = [start + k for k in drawn_children(node)]
+            if not drawn:
+                continue
+            total = sum(widths[j] for j in drawn)
+            if is_opexpr:
+                # the operands are placed as if the operator column were not there
+                place_x[drawn[0]] = x - (total - 1) * spacing / 2
+                place_x[drawn[1]] = x + (total - 1) * spacing / 2
+            else:
+                current_x = x - (total - 1) * spacing / 2
+                for j in drawn:
+                    place_x[j] = current_x + (widths[j] - 1) * spacing / 2
+                    current_x += widths[j] * spacing
+            child_y = y + height + self.vertical_spacing
+            for j in drawn:
+                placed[j] = 1
+                place_y[j] = child_y
+                has_edge[j] = 1
+                edge_x[j], edge_y[j] = x, y + height
+
+        # sibling pointers from the right of each statement of a StmtSeq to the left of the next one
+        for i in range(count):
+            if nodes[i].kind != STMT_SEQ or not placed[i]:
+                continue
+            previous = -1
+            for j in range(first[i], first[i] + len(nodes[i].children)):
+                shape = shape_of[j]
+                if previous >= 0 and shape >= 0:
+                    from_width, from_height = self.size_of(statements[previous])
+                    to_width, to_height = self.size_of(statements[shape])
+                    lines.extend((xs[previous] + from_width / 2, ys[previous] + from_height / 2,
+                                  xs[shape] - to_width / 2, ys[shape] + to_height / 2))
+                    line_kinds.append(SIBLING)
+                previous = shape
+        return self
@@ -0,0 +1,123 @@
+# tiny_optimize.py
+# Constant folding and algebraic simplification of the expressions of a TINY syntax tree. The parser builds
+# a left-associative OpExpr chain for every expression, constant or not; fold_constants() returns a copy
+# of the tree in which constant subexpressions are single Number nodes, constants at the end of + - and
+# * chains are combined and identities such as x + 0 or x * 1 are gone. Statements are left as they are.
+# Same semantics as TinyInterpreter: comparisons give 1 or 0, '/' truncates toward zero; a division by a
+# constant 0 is kept so it still fails at run time. A folded negative constant is a Number like "-3"
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from tiny_parser import ASTNode, OP_EXPR, OP, NUMBER, IDENTIFIER, print_ast
+from tiny_interpreter import OPERATORS, load_program
+
+
+##### number of nodes in the tree of root
+def count_nodes(root):
+    count = 0
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(node.children)
+    return count
+
+
+def number_node(value):
+    return ASTNode(NUMBER, value=str(value))
+
+
+def op_expr(op, left, right):
+    return ASTNode(OP_EXPR, [ASTNode(OP, value=op), left, right])
+
+
+##### the simplified form of `left op right`, both operands already folded
+def simplify(op, left, right):
+    left_constant = left.kind == NUMBER
+    right_constant = right.kind == NUMBER
+    if left_constant and right_constant:
+        a, b = int(left.value), int(right.value)
+        if op == '/' and b == 0:
+            return op_expr(op, left, right)
+        return number_node(OPERATORS[op](a, b))
+
+    if right_constant:
+        c = int(right.value)
+        # (e + c1) - c2 and the like: one constant at the end of the chain
+        if left.kind == OP_EXPR and left.children[2].kind == NUMBER:
+            inner, e, c1 = left.children[0].value, left.children[1], int(left.children[2].value)
+            if op in '+-' and inner in '+-':
+                total = (c1 if inner == '+' else -c1) + (c if op == '+' else -c)
+                return simplify('+' if total >= 0 else '-', e, number_node(abs(total)))
+            if op == '*' and inner == '*':
+                return simplify('*', e, number_node(c1 * c))
+        if (c == 0 and op in '+-') or (c == 1 and op in '*/'):
+            return left
+        if c == 0 and op == '*' and left.kind == IDENTIFIER:
+            return number_node(0)
+
+    if left_constant:
+        c = int(left.value)
+        if (c == 0 and op == '+') or (c == 1 and op == '*'):
+            return right
+        if c == 0 and op == '*' and right.kind == IDENTIFIER:
+            return number_node(0)
+
+    if op in '-=' and left.kind == IDENTIFIER and right.kind == IDENTIFIER and left.value == right.value:
+        return number_node(0 if op == '-' else 1)
+    return op_expr(op, left, right)
+
+
+##### a copy of the tree of root with its expressions folded and simplified; the tree itself is not modified.
+##### Walks the tree with an explicit stack, so deep trees do not hit the recursion limit
+def fold_constants(root):
+    results = []
+    pending = [(root, False)]
+    while pending:
+        node, done = pending.pop()
+        if not done:
+            pending.append((node, True))
+            pending.extend((child, False) for child in reversed(node.children))
+            continue
+        count = len(node.children)
+        children = results[len(results) - count:] if count else []
+        del results[len(results) - count:]
+        if node.kind == OP_EXPR and count == 3:
+            results.append(simplify(children[0].value, children[1], children[2]))
+        else:
+            results.append(ASTNode(node.kind, children, node.value))
+    return results[0]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Fold the constant expressions of a TINY program")
+    arg_parser.add_argument('program', help="TINY source or token file")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the program file (default: auto, detected)")
+    arg_parser.add_argument('--format', choices=('tree', 'jsonl'), default='tree',
+                            help="AST output: indented tree or one JSON array per node (default: tree)")
+    arg_parser.add_argument('--output', default=None, metavar='FILE',
+                            help="write the folded AST to FILE instead of the console")
+    args = arg_parser.parse_args()
+
+    program_file = Path(args.program)
+    if not program_file.exists():
+        print(f"Error: Input file '{program_file}' does not exist.")
+        return
+
+    try:
+        program = load_program(program_file, args.input)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+
+    folded = fold_constants(program)
+    print_ast(folded, args.format, args.output)
+    before, after = count_nodes(program), count_nodes(folded)
+    print(f"Folding complete. {before} -> {after} nodes ({(before - after) / before:.1%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,80 @@
 # tiny_parser.py
 from pathlib import Path
+from array import array
+import argparse
+import io
+import json
+import re
+import struct
 import sys
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from scanner import TokenStream, is_binary_token_file, read_binary_tokens
+
+
+### Binary operators by token type -> precedence: term (*,/) > simple_expr (+,-) > expr (<,=).
+### All are left associative, except that an expr holds at most one comparison
+BINARY_PRECEDENCE = {'MULT': 3, 'DIV': 3, 'PLUS': 2, 'MINUS': 2, 'LESSTHAN': 1, 'EQUAL': 1}
+COMPARISON_PRECEDENCE = 1
+
+### Opening bracket type -> closing bracket type (token files use LPAREN, scanner.py OPENBRACKET)
+BRACKETS = {'LPAREN': 'RPAREN', 'OPENBRACKET': 'CLOSEDBRACKET'}
+
+
+### Node kinds: the integer stored in ASTNode.kind and the name used in its label
+(PROGRAM, STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT,
+ OP_EXPR, OP, NUMBER, IDENTIFIER) = range(11)
+NODE_KIND_NAMES = ('Program', 'StmtSeq', 'IfStmt', 'RepeatStmt', 'AssignStmt', 'ReadStmt', 'WriteStmt',
+                   'OpExpr', 'Op', 'Number', 'Identifier')
+NODE_KINDS = {name: kind for kind, name in enumerate(NODE_KIND_NAMES)}
+
 
 ##Abstract Syntax Tree Node class
+##kind is one of the node kinds above, value the lexeme of Identifier / Number / Op nodes (None otherwise).
+##A label string is still accepted: ASTNode("Identifier(x)") has kind IDENTIFIER and value 'x'
 class ASTNode:
-    def __init__(self, label, children=None):
-        self.label = label
+    __slots__ = ('kind', 'value', 'children')
+
+    def __init__(self, label, children=None, value=None):
+        if isinstance(label, str):
+            name, _, label_value = label.partition('(')
+            if name not in NODE_KINDS:
+                raise ValueError(f"Unknown AST node label: {label}")
+            label = NODE_KINDS[name]
+            if label_value:
+                value = label_value[:-1]
+        self.kind = label
+        self.value = value
         self.children = children or []
 
-#####Print the tree to the console
+##### label in the original string form, e.g. "StmtSeq", "Identifier(x)" or "Op(+)"
+    @property
+    def label(self):
+        name = NODE_KIND_NAMES[self.kind]
+        if self.value is None:
+            return name
+        return f"{name}({self.value})"
+
+#####Print the tree to the console (see write_tree)
     def __repr__(self, level=0):
-        ret = "  " * level + repr(self.label) + "\n"
-        for child in self.children:
-            ret += child.__repr__(level + 1)
-        return ret
+        out = io.StringIO()
+        write_tree(self, out, level)
+        return out.getvalue()
+
+
+##### (type of token i, lexeme of token i) functions for a list of (value, type) tokens or a TokenStream.
+##### The parsers read tokens through them: a TokenStream answers from its arrays, with no tuple per access
+def token_accessors(tokens):
+    if isinstance(tokens, TokenStream):
+        return tokens.accessors()
+    return (lambda i: tokens[i][1]), (lambda i: tokens[i][0])
 
 
 class TinyParser:
     def __init__(self, tokens):
         self.tokens = tokens
         self.pos = 0
+        self.type_at, self.lexeme_at = token_accessors(tokens)
 
 
 
@@ -49,6 +103,32 @@ class TinyParser:
         else:
             raise Exception(f"Syntax Error: Expected {expected_type} but got {tok}")
 
+##### The parse methods below use these three instead: same as peek()[1], advance()[0] and match()[0],
+##### but they build no (value, type) tuple, which a TokenStream would make on every call
+
+##### return the type of the current token without advancing
+    def peek_type(self):
+        try:
+            return self.type_at(self.pos)
+        except IndexError:
+            return 'EOF'
+
+##### return the lexeme of the current token and move one step forward
+    def advance_lexeme(self):
+        pos = self.pos
+        self.pos += 1
+        try:
+            return self.lexeme_at(pos)
+        except IndexError:
+            return 'EOF'
+
+##### match the current token with expected type , advance and return its lexeme if match else raise error
+    def match_lexeme(self, expected_type):
+        if self.peek_type() == expected_type:
+            return self.advance_lexeme()
+        else:
+            raise Exception(f"Syntax Error: Expected {expected_type} but got {self.peek()}")
+
 
 
 
@@ -60,11 +140,11 @@ class TinyParser:
 
     # Program -> stmt_seq
     def parse_program(self):
-        node = ASTNode("Program")
+        node = ASTNode(PROGRAM)
         node.children.append(self.parse_stmt_seq())
 
         ### Check for extra tokens after a valid program and ensure input ends exactly at EOF
-        if self.peek()[1] != "EOF":
+        if self.peek_type() != "EOF":
             lexeme, tok = self.peek()
             raise Exception(f"Unexpected token after valid program: '{lexeme}' ({tok})")
         return node
@@ -72,13 +152,13 @@ class TinyParser:
 
     # stmt_seq -> stmt { ; stmt }
     def parse_stmt_seq(self):
-        node = ASTNode("StmtSeq")
+        node = ASTNode(STMT_SEQ)
         node.children.append(self.parse_stmt())
 
-        while self.peek()[1] == 'SEMICOLON': 
-            self.match('SEMICOLON')
+        while self.peek_type() == 'SEMICOLON': 
+            self.match_lexeme('SEMICOLON')
             # Stop if the next token is NOT the start of a statement
-            if self.peek()[1] not in ('IF', 'REPEAT', 'READ', 'WRITE', 'IDENTIFIER'):
+            if self.peek_type() not in ('IF', 'REPEAT', 'READ', 'WRITE', 'IDENTIFIER'):
                 break
             node.children.append(self.parse_stmt())
 
@@ -91,8 +171,7 @@ class TinyParser:
 
     # stmt -> if | repeat | assign | read | write
     def parse_stmt(self):
-        tok = self.peek()
-        token_type = tok[1]
+        token_type = self.peek_type()
     
         if token_type == 'IF':
             return self.parse_if()
@@ -112,19 +191,19 @@ class TinyParser:
 
     # if_stmt -> IF expr THEN stmt_seq [ELSE stmt_seq] END
     def parse_if(self):
-        node = ASTNode("IfStmt")
-        self.match('IF')
+        node = ASTNode(IF_STMT)
+        self.match_lexeme('IF')
         node.children.append(self.parse_expr())
-        self.match('THEN')
+        self.match_lexeme('THEN')
         then_branch = self.parse_stmt_seq()
         node.children.append(then_branch)
         
-        if self.peek()[1] == 'ELSE':
-            self.match('ELSE')
+        if self.peek_type() == 'ELSE':
+            self.match_lexeme('ELSE')
             else_branch = self.parse_stmt_seq()
             node.children.append(else_branch)
         
-        self.match('END')
+        self.match_lexeme('END')
         return node
 
 
@@ -132,12 +211,12 @@ class TinyParser:
 
     # repeat_stmt -> REPEAT stmt_seq UNTIL expr
     def parse_repeat(self):
-        node = ASTNode("RepeatStmt")
-        self.match('REPEAT')
+        node = ASTNode(REPEAT_STMT)
+        self.match_lexeme('REPEAT')
         body = self.parse_stmt_seq()
         node.children.append(body)
         
-        self.match('UNTIL')
+        self.match_lexeme('UNTIL')
         condition = self.parse_expr()
         node.children.append(condition)
         return node
@@ -147,12 +226,12 @@ class TinyParser:
 
     # assign_stmt -> IDENTIFIER := expr
     def parse_assign(self):
-        node = ASTNode("AssignStmt")
-        identifier_tok = self.match('IDENTIFIER')
-        identifier_node = ASTNode(f"Identifier({identifier_tok[0]})")
+        node = ASTNode(ASSIGN_STMT)
+        identifier = self.match_lexeme('IDENTIFIER')
+        identifier_node = ASTNode(IDENTIFIER, value=identifier)
         node.children.append(identifier_node)
         
-        self.match('ASSIGN')
+        self.match_lexeme('ASSIGN')
         expr_node = self.parse_expr()
         node.children.append(expr_node)
         return node
@@ -161,10 +240,10 @@ class TinyParser:
 
     # read_stmt -> READ IDENTIFIER
     def parse_read(self):
-        node = ASTNode("ReadStmt")   
-        self.match('READ')
-        identifier_tok = self.match('IDENTIFIER')
-        identifier_node = ASTNode(f"Identifier({identifier_tok[0]})")
+        node = ASTNode(READ_STMT)   
+        self.match_lexeme('READ')
+        identifier = self.match_lexeme('IDENTIFIER')
+        identifier_node = ASTNode(IDENTIFIER, value=identifier)
         node.children.append(identifier_node)
         return node
 
@@ -173,8 +252,8 @@ class TinyParser:
 
     # write_stmt -> WRITE exp
     def parse_write(self):
-        node = ASTNode("WriteStmt")
-        self.match('WRITE')
+        node = ASTNode(WRITE_STMT)
+        self.match_lexeme('WRITE')
         expr_node = self.parse_expr()   
         node.children.append(expr_node)
         return node
@@ -184,11 +263,10 @@ class TinyParser:
     # expr -> simple_expr [ ( < | = ) simple_expr ]
     def parse_expr(self):
         left = self.parse_simple_expr()
-        if self.peek()[1] in ('LESSTHAN', 'EQUAL'):  
-            op_tok = self.advance()
-            op_node = ASTNode(f"Op({op_tok[0]})")
+        if self.peek_type() in ('LESSTHAN', 'EQUAL'):  
+            op_node = ASTNode(OP, value=self.advance_lexeme())
             right = self.parse_simple_expr()
-            return ASTNode("OpExpr", [op_node, left, right])
+            return ASTNode(OP_EXPR, [op_node, left, right])
         return left
 
 
@@ -197,11 +275,10 @@ class TinyParser:
     # simple_expr -> term { (+|-) term }
     def parse_simple_expr(self):
         left = self.parse_term()
-        while self.peek()[1] in ('PLUS', 'MINUS'):
-            op_tok = self.advance()       
-            op_node = ASTNode(f"Op({op_tok[0]})")
+        while self.peek_type() in ('PLUS', 'MINUS'):
+            op_node = ASTNode(OP, value=self.advance_lexeme())
             right = self.parse_term()
-            left = ASTNode("OpExpr", [op_node, left, right])
+            left = ASTNode(OP_EXPR, [op_node, left, right])
         return left
 
 
@@ -210,11 +287,10 @@ class TinyParser:
     # term -> factor { (*|/) factor }
     def parse_term(self):
         left = self.parse_factor()
-        while self.peek()[1] in ('MULT', 'DIV'):
-            op_tok = self.advance()             
-            op_node = ASTNode(f"Op({op_tok[0]})")
+        while self.peek_type() in ('MULT', 'DIV'):
+            op_node = ASTNode(OP, value=self.advance_lexeme())
             right = self.parse_factor()
-            left = ASTNode("OpExpr", [op_node, left, right])
+            left = ASTNode(OP_EXPR, [op_node, left, right])
         return left
 
 
@@ -223,27 +299,25 @@ class TinyParser:
 
     # factor -> NUMBER | IDENTIFIER | ( expr )
     def parse_factor(self):
-        tok = self.peek()
+        token_type = self.peek_type()
 
         # NUMBER
-        if tok[1] == 'NUMBER':
-            number_tok = self.advance()
-            return ASTNode(f"Number({number_tok[0]})")
+        if token_type == 'NUMBER':
+            return ASTNode(NUMBER, value=self.advance_lexeme())
 
         # IDENTIFIER
-        elif tok[1] == 'IDENTIFIER':
-            ident_tok = self.advance()
-            return ASTNode(f"Identifier({ident_tok[0]})")
+        elif token_type == 'IDENTIFIER':
+            return ASTNode(IDENTIFIER, value=self.advance_lexeme())
 
         # ( expr )
-        elif tok[1] == 'LPAREN':   # ( 
-            self.match('LPAREN')
+        elif token_type in BRACKETS:   # ( 
+            self.advance_lexeme()
             expr_node = self.parse_expr()
-            self.match('RPAREN')   # )
+            self.match_lexeme(BRACKETS[token_type])   # )
             return expr_node
 
         else:
-            raise Exception(f"Syntax Error in factor: unexpected token {tok}")
+            raise Exception(f"Syntax Error in factor: unexpected token {self.peek()}")
 
 
 
@@ -251,31 +325,508 @@ class TinyParser:
 
 
 
+##### Same grammar and ASTNode output as TinyParser, but statement sequences and expressions are parsed
+##### with explicit stacks instead of recursion, so nesting depth is limited only by memory.
+##### The loops keep the position in a local variable and store it back in self.pos
+class IterativeTinyParser(TinyParser):
 
+    STMT_START = ('IF', 'REPEAT', 'READ', 'WRITE', 'IDENTIFIER')
 
+    PRECEDENCE = BINARY_PRECEDENCE
+    CLOSING = BRACKETS
 
 
-def read_token_file(file_path):
+    ##### token at pos, ('EOF','EOF') past the end like peek()
+    def _token(self, pos):
+        if pos < len(self.tokens):
+            return self.tokens[pos]
+        return ('EOF','EOF')
+
+    ##### like match() at pos: return the position after the token or raise the same error
+    def _expect(self, pos, expected_type):
+        try:
+            token_type = self.type_at(pos)
+        except IndexError:
+            token_type = 'EOF'
+        if token_type != expected_type:
+            self.pos = pos
+            raise Exception(f"Syntax Error: Expected {expected_type} but got {self._token(pos)}")
+        return pos + 1
+
+
+    # stmt_seq -> stmt { ; stmt }
+    # Each open if/repeat is a (parent StmtSeq, statement node) frame on the stack
+    def parse_stmt_seq(self):
+        type_at, lexeme_at = self.type_at, self.lexeme_at
+        count = len(self.tokens)
+        pos = self.pos
+        stack = []
+        # root stays referenced from this frame: otherwise, inside an if/repeat, only a stack frame tuple
+        # newer than the whole tree refers to it, and each full collection of the cyclic garbage collector
+        # first takes the tree for unreachable and then walks all of it a second time
+        root = seq = ASTNode(STMT_SEQ)
+
+        while True:
+            # parse the next statement of seq, an if/repeat opens a nested StmtSeq
+            token_type = type_at(pos) if pos < count else 'EOF'
+            if token_type == 'IDENTIFIER':
+                node = ASTNode(ASSIGN_STMT, [ASTNode(IDENTIFIER, value=lexeme_at(pos))])
+                pos = self._expect(pos + 1, 'ASSIGN')
+                expr_node, pos = self._expr(pos)
+                node.children.append(expr_node)
+                seq.children.append(node)
+            elif token_type == 'READ':
+                node = ASTNode(READ_STMT)
+                pos = self._expect(pos + 1, 'IDENTIFIER')
+                node.children.append(ASTNode(IDENTIFIER, value=lexeme_at(pos - 1)))
+                seq.children.append(node)
+            elif token_type == 'WRITE':
+                node = ASTNode(WRITE_STMT)
+                expr_node, pos = self._expr(pos + 1)
+                node.children.append(expr_node)
+                seq.children.append(node)
+            else:
+                if token_type == 'IF':
+                    node = ASTNode(IF_STMT)
+                    expr_node, pos = self._expr(pos + 1)
+                    pos = self._expect(pos, 'THEN')
+                    node.children.append(expr_node)
+                elif token_type == 'REPEAT':
+                    pos += 1
+                    node = ASTNode(REPEAT_STMT)
+                else:
+                    self.pos = pos
+                    raise Exception("Syntax Error")
+                seq.children.append(node)
+                stack.append((seq, node))
+                seq = ASTNode(STMT_SEQ)
+                node.children.append(seq)
+                continue
+
+            # the statement is complete: continue its sequence or close the enclosing if/repeat
+            while True:
+                if (type_at(pos) if pos < count else 'EOF') == 'SEMICOLON':
+                    pos += 1
+                    if (type_at(pos) if pos < count else 'EOF') in self.STMT_START:
+                        break
+
+                if not stack:
+                    self.pos = pos
+                    return root
+                seq, node = stack.pop()
+
+                if node.kind == IF_STMT:
+                    if len(node.children) == 2 and (type_at(pos) if pos < count else 'EOF') == 'ELSE':
+                        pos += 1
+                        stack.append((seq, node))
+                        seq = ASTNode(STMT_SEQ)
+                        node.children.append(seq)
+                        break
+                    pos = self._expect(pos, 'END')
+                else:
+                    expr_node, pos = self._expr(self._expect(pos, 'UNTIL'))
+                    node.children.append(expr_node)
+
+
+    # expr -> simple_expr [ ( < | = ) simple_expr ]
+    def parse_expr(self):
+        node, self.pos = self._expr(self.pos)
+        return node
+
+    # Operator-precedence parsing of the expression starting at pos, returns (node, position after it).
+    # Operands and operators are kept on explicit stacks, an opening bracket starts a new level.
+    # Each level allows one comparison, like the recursive parse_expr
+    def _expr(self, pos):
+        type_at, lexeme_at = self.type_at, self.lexeme_at
+        count = len(self.tokens)
+        precedence_of = self.PRECEDENCE
+        closing_of = self.CLOSING
+        operands = []
+        operators = []      # (precedence, operator lexeme), None marks an open bracket
+        levels = []         # per open bracket: (closing type, comparison seen outside it)
+        compared = False
+
+        while True:
+            # factor -> NUMBER | IDENTIFIER | ( expr )
+            token_type = type_at(pos) if pos < count else 'EOF'
+            if token_type == 'IDENTIFIER':
+                operands.append(ASTNode(IDENTIFIER, value=lexeme_at(pos)))
+            elif token_type == 'NUMBER':
+                operands.append(ASTNode(NUMBER, value=lexeme_at(pos)))
+            elif token_type in closing_of:
+                pos += 1
+                operators.append(None)
+                levels.append((closing_of[token_type], compared))
+                compared = False
+                continue
+            else:
+                self.pos = pos
+                raise Exception(f"Syntax Error in factor: unexpected token {self._token(pos)}")
+            pos += 1
+
+            # binary operator, closing bracket or end of the expression
+            while True:
+                precedence = precedence_of.get(type_at(pos) if pos < count else 'EOF')
+                if precedence is not None and not (precedence == COMPARISON_PRECEDENCE and compared):
+                    while operators and operators[-1] is not None and operators[-1][0] >= precedence:
+                        _, op = operators.pop()
+                        right = operands.pop()
+                        operands[-1] = ASTNode(OP_EXPR, [ASTNode(OP, value=op), operands[-1], right])
+                    operators.append((precedence, lexeme_at(pos)))
+                    compared = compared or precedence == COMPARISON_PRECEDENCE
+                    pos += 1
+                    break
+
+                while operators and operators[-1] is not None:
+                    _, op = operators.pop()
+                    right = operands.pop()
+                    operands[-1] = ASTNode(OP_EXPR, [ASTNode(OP, value=op), operands[-1], right])
+                if not levels:
+                    return operands.pop(), pos
+                closing, compared = levels.pop()
+                operators.pop()
+                pos = self._expect(pos, closing)
+
+
+##### TinyParser with a precedence-climbing parse_expr driven by BINARY_PRECEDENCE: one call per
+##### operand instead of parse_expr -> parse_simple_expr -> parse_term -> parse_factor.
+##### Builds the same OpExpr trees and raises the same errors
+class PrattTinyParser(TinyParser):
+
+    # expr -> operand { op expr' }, where expr' only takes operators binding tighter than op.
+    # Runs once per operand: the position is kept in a local and the tables are read once per call
+    OPERAND_KINDS = {'IDENTIFIER': IDENTIFIER, 'NUMBER': NUMBER}
+    PRECEDENCE = BINARY_PRECEDENCE
+    CLOSING = BRACKETS
+
+    def parse_expr(self, min_precedence=COMPARISON_PRECEDENCE):
+        type_at = self.type_at
+        pos = self.pos
+
+        # factor -> NUMBER | IDENTIFIER | ( expr )
+        try:
+            token_type = type_at(pos)
+        except IndexError:
+            token_type = 'EOF'
+        kind = self.OPERAND_KINDS.get(token_type)
+        if kind is not None:
+            left = ASTNode(kind, None, self.lexeme_at(pos))
+            pos += 1
+        elif token_type in self.CLOSING:
+            self.pos = pos + 1
+            left = self.parse_expr()
+            self.match_lexeme(self.CLOSING[token_type])
+            pos = self.pos
+        else:
+            raise Exception(f"Syntax Error in factor: unexpected token {self.peek()}")
+
+        precedence_of = self.PRECEDENCE
+        while True:
+            try:
+                precedence = precedence_of.get(type_at(pos))
+            except IndexError:
+                precedence = None
+            if precedence is None or precedence < min_precedence:
+                self.pos = pos
+                return left
+            op = ASTNode(OP, None, self.lexeme_at(pos))
+            self.pos = pos + 1
+            right = self.parse_expr(precedence + 1)
+            pos = self.pos
+            left = ASTNode(OP_EXPR, [op, left, right])
+            if precedence == COMPARISON_PRECEDENCE:
+                return left
+
+
+PARSER_ENGINES = {
+    'recursive': TinyParser,
+    'iterative': IterativeTinyParser,
+    'pratt': PrattTinyParser,
+}
+
+
+
+
+
+# ---------------------------
+# Tree output
+# ---------------------------
+
+WRITE_BATCH = 16384
+
+##### write the tree to out in the ASTNode.__repr__ format, one "  " * level + repr(label) line per node.
+##### The walk keeps a stack of child iterators instead of recursing, lines are built from cached
+##### indents and labels and handed to out.writelines() in batches, so the time is linear in the
+##### number of nodes and deep trees do not hit the recursion limit
+def write_tree(root, out, level=0):
+    labels = {}
+    indents = []
+    lines = []
+    append = lines.append
+    stack = [iter((root,))]
+    while stack:
+        for node in stack[-1]:
+            depth = len(stack) - 1
+            while depth >= len(indents):
+                indents.append("  " * (level + len(indents)))
+            append(indents[depth])
+            key = (node.kind, node.value)
+            label = labels.get(key)
+            if label is None:
+                label = labels[key] = repr(node.label) + "\n"
+            append(label)
+            if node.children:
+                stack.append(iter(node.children))
+                break
+            if len(lines) >= WRITE_BATCH:
+                out.writelines(lines)
+                lines.clear()
+        else:
+            stack.pop()
+    out.writelines(lines)
+
+
+##### Compact dump: one JSON array per node in pre-order, [kind name, value or null, number of children]
+##### e.g. ["AssignStmt", null, 2] ["Identifier", "x", 0] ["Number", "1", 0]
+def write_tree_dump(root, out):
+    prefixes = {}
+    lines = []
+    append = lines.append
+    stack = [iter((root,))]
+    while stack:
+        for node in stack[-1]:
+            key = (node.kind, node.value)
+            prefix = prefixes.get(key)
+            if prefix is None:
+                prefix = prefixes[key] = f'["{NODE_KIND_NAMES[node.kind]}", {json.dumps(node.value)}, '
+            append(prefix)
+            if node.children:
+                append(f"{len(node.children)}]\n")
+                stack.append(iter(node.children))
+                break
+            append("0]\n")
+            if len(lines) >= WRITE_BATCH:
+                out.writelines(lines)
+                lines.clear()
+        else:
+            stack.pop()
+    out.writelines(lines)
+
+
+##### print the AST in the 'tree' (write_tree) or 'jsonl' (write_tree_dump) format to the console,
+##### or to output_file when one is given
+def print_ast(ast, output_format='tree', output_file=None):
+    write = write_tree_dump if output_format == 'jsonl' else write_tree
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            write(ast, f)
+        print(f"AST written to {Path(output_file).resolve()}")
+    else:
+        print("--- AST ---")
+        write(ast, sys.stdout)
+        print()
+
+
+##### rebuild the tree written by write_tree_dump from an iterable of lines
+def read_tree_dump(lines):
+    root = None
+    open_nodes = []     # [node, children still to read]
+    for line in lines:
+        if not line.strip():
+            continue
+        name, value, child_count = json.loads(line)
+        node = ASTNode(NODE_KINDS[name], value=value)
+        if open_nodes:
+            parent = open_nodes[-1]
+            parent[0].children.append(node)
+            parent[1] -= 1
+            if parent[1] == 0:
+                open_nodes.pop()
+        elif root is None:
+            root = node
+        else:
+            raise Exception("Invalid tree dump: more than one root node")
+        if child_count:
+            open_nodes.append([node, child_count])
+
+    if root is None or open_nodes:
+        raise Exception("Invalid tree dump: truncated")
+    return root
+
+
+### Binary tree: header (magic, node count, size of the values), the kind of every node in pre-order as a
+### byte (BINARY_TREE_VALUE set when the node has a value), its number of children as a little-endian
+### uint32, then the values of those nodes as UTF-8 text, each followed by '\n' (lexemes hold no whitespace).
+### Loading walks the arrays backwards and builds every node once its children are built, no per-node parsing
+BINARY_TREE_MAGIC = b'TINYAST1'
+BINARY_TREE_HEADER = struct.Struct('<8sQQ')
+BINARY_TREE_VALUE = 0x80
+
+
+##### write the tree to the binary file object out, returns the number of nodes
+def write_binary_tree(root, out):
+    kinds = array('B')
+    counts = array('I')
+    values = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        counts.append(len(node.children))
+        if node.value is None:
+            kinds.append(node.kind)
+        else:
+            kinds.append(node.kind | BINARY_TREE_VALUE)
+            values.append(node.value + '\n')
+        stack.extend(reversed(node.children))
+
+    text = ''.join(values).encode('utf-8')
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    out.write(BINARY_TREE_HEADER.pack(BINARY_TREE_MAGIC, len(kinds), len(text)))
+    kinds.tofile(out)
+    counts.tofile(out)
+    out.write(text)
+    return len(kinds)
+
+
+##### rebuild the tree written by write_binary_tree from the binary file object f
+def read_binary_tree(f):
+    header = f.read(BINARY_TREE_HEADER.size)
+    if len(header) != BINARY_TREE_HEADER.size or header[:len(BINARY_TREE_MAGIC)] != BINARY_TREE_MAGIC:
+        raise Exception("Invalid binary tree: bad header")
+    _, count, text_size = BINARY_TREE_HEADER.unpack(header)
+    kinds = array('B')
+    counts = array('I')
+    try:
+        kinds.fromfile(f, count)
+        counts.fromfile(f, count)
+    except EOFError:
+        raise Exception("Invalid binary tree: truncated")
+    text = f.read(text_size)
+    if len(text) != text_size:
+        raise Exception("Invalid binary tree: truncated")
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    values = text.decode('utf-8').split('\n')
+    values.pop()  # after the last '\n'
+
+    # nodes are made with ASTNode.__new__ and their slots set here, without the label handling of __init__
+    new_node = ASTNode.__new__
+    pop_value = values.pop
+    built = []  # roots of the subtrees built so far, the next sibling on top
+    append = built.append
+    try:
+        for kind, child_count in zip(reversed(kinds), reversed(counts)):
+            node = new_node(ASTNode)
+            if kind & BINARY_TREE_VALUE:
+                node.kind = kind ^ BINARY_TREE_VALUE
+                node.value = pop_value()
+            else:
+                node.kind = kind
+                node.value = None
+            if child_count:
+                if child_count > len(built):
+                    raise Exception("Invalid binary tree: missing children")
+                node.children = built[:-child_count - 1:-1]
+                del built[-child_count:]
+            else:
+                node.children = []
+            append(node)
+    except IndexError:
+        raise Exception("Invalid binary tree: missing values")
+
+    if len(built) != 1 or values:
+        raise Exception("Invalid binary tree: not a single tree")
+    return built[0]
+
+
+##### a copy of the tree of root that shares no node (nor children list) with it, built without recursion
+def copy_tree(root):
+    copy = ASTNode(root.kind, None, root.value)
+    pending = [(root, copy)]
+    while pending:
+        node, node_copy = pending.pop()
+        for child in node.children:
+            child_copy = ASTNode(child.kind, None, child.value)
+            node_copy.children.append(child_copy)
+            if child.children:
+                pending.append((child, child_copy))
+    return copy
+
+
+
+
+### One match per line: (value, TYPE) for a line exactly as scanner.py writes it, "value , TYPE"
+### (lexemes never contain whitespace, the only one starting with '#' is '#' itself),
+### and ('', '') for any other line
+TOKEN_LINE = re.compile(r'^(?:([^#\s]\S*|#) , (\w+)|.*)$', re.M)
+
+
+def parse_token_text(text):
     """
-    Reads a token file where each line is:
+    Parses token file text where each line is:
     tokenvalue , tokentype
+    The type is whatever follows the last comma, so lexemes may contain commas (", , UNKNOWN").
+    Empty lines and lines starting with '#' are skipped, except "# , TYPE": the '#' token itself.
     Returns a list of (TokenValue, TokenType) .
     """
+    # One findall over the whole text; only lines not in the scanner's exact format are looked at one by one
+    matches = TOKEN_LINE.findall(text)
+    if text.endswith('\n'):
+        matches.pop()  # the empty "line" after the final newline
+    if ('', '') not in matches:
+        return matches
+
+    lines = text.split('\n')
     tokens = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):  # skip empty or comment lines
-                continue
-            parts = line.split(',')
-            if len(parts) != 2:
-                raise Exception(f"Invalid token line: {line}")
-            tokenValue = parts[0].strip()
-            tokenType = parts[1].strip()
-            tokens.append((tokenValue, tokenType))
-
-        # Ensure EOF exists as the last token
-    if not tokens or tokens[-1][1] != 'EOF':
+    for line_num, token in enumerate(matches, 1):
+        if token[1]:
+            tokens.append(token)
+            continue
+        token = parse_token_line(lines[line_num - 1], line_num)
+        if token is not None:
+            tokens.append(token)
+    return tokens
+
+
+def parse_token_line(line, line_num):
+    """
+    Parses one line of token text (see parse_token_text).
+    Returns the (TokenValue, TokenType) token, or None for an empty or comment line.
+    """
+    line = line.strip()
+    if not line or (line.startswith('#') and not line.startswith('# ,')):  # skip empty or comment lines
+        return None
+    tokenValue, comma, tokenType = line.rpartition(',')
+    if not comma:
+        raise Exception(f"Invalid token format on line {line_num}: '{line}' "
+                        f"(expected: tokenValue , tokenType)")
+    return (tokenValue.strip(), tokenType.strip())
+
+
+def read_token_file(file_path):
+    """
+    Reads a token file: a text file of "tokenvalue , tokentype" lines (see parse_token_text)
+    or a binary token file written by scanner.py --binary, which loads as a TokenStream.
+    Returns a list of (TokenValue, TokenType) ending with EOF.
+    """
+    if is_binary_token_file(file_path):
+        tokens = read_binary_tokens(file_path)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            tokens = parse_token_text(f.read())
+
+    return with_eof(tokens)
+
+
+def with_eof(tokens):
+    """
+    Ensures EOF exists as the last token: returns tokens, with ("EOF", "EOF") appended
+    (as a list) when it does not end with EOF.
+    """
+    if not len(tokens) or tokens[-1][1] != 'EOF':
+        if not isinstance(tokens, list):
+            tokens = list(tokens)
         tokens.append(("EOF", "EOF"))
 
     return tokens
@@ -285,11 +836,18 @@ def read_token_file(file_path):
 
 
 def main():
+    arg_parser = argparse.ArgumentParser(description="Parse a TINY token file and print its AST")
+    arg_parser.add_argument('token_file', nargs='?', default="tokens.txt")  # default filename
+    arg_parser.add_argument('--engine', choices=sorted(PARSER_ENGINES), default='recursive',
+                            help="parser engine (default: recursive)")
+    arg_parser.add_argument('--format', choices=('tree', 'jsonl'), default='tree',
+                            help="AST output: indented tree or one JSON array per node (default: tree)")
+    arg_parser.add_argument('--output', default=None, metavar='FILE',
+                            help="write the AST to FILE instead of the console")
+    args = arg_parser.parse_args()
+
     # Determine input file path
-    if len(sys.argv) == 2:
-        input_file = Path(sys.argv[1])
-    else:
-        input_file = Path("tokens.txt")  # default filename
+    input_file = Path(args.token_file)
 
     if not input_file.exists():
         print(f"Error: Input file '{input_file}' does not exist.")
@@ -303,14 +861,15 @@ def main():
         tokens.append(('EOF','EOF'))
 
     # Parse
-    parser = TinyParser(tokens)
+    parser = PARSER_ENGINES[args.engine](tokens)
     try:
         ast = parser.parse_program()
-        print("--- AST ---")
-        print(ast)
-        print("Parsing successful ")
     except Exception as e:
         print(f"Parsing failed : {e}")
+        return
+
+    print_ast(ast, args.format, args.output)
+    print("Parsing successful ")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,23 @@
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QTextEdit, QLabel, QFileDialog, QMessageBox,
+    QPushButton, QTextEdit, QLabel, QFileDialog, QMessageBox, QComboBox,
     QSplitter, QGraphicsView, QGraphicsScene, QGraphicsEllipseItem,
-    QGraphicsTextItem, QGraphicsLineItem, QGraphicsRectItem
+    QGraphicsTextItem, QGraphicsLineItem, QGraphicsRectItem, QGraphicsItem, QStyleOptionGraphicsItem
 )
-from PySide6.QtCore import Qt, QPointF, QRectF
-from PySide6.QtGui import QPen, QBrush, QColor, QFont, QWheelEvent, QPainter
+from PySide6.QtCore import Qt, QRectF, QLineF, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QPen, QBrush, QColor, QFont, QWheelEvent, QPainter, QTextCursor
+import io
+import os
 import sys
+import threading
 from pathlib import Path
 
-from tiny_parser import TinyParser
+from tiny_parser import parse_token_line, write_tree, copy_tree
+from tiny_pipeline import detect_text_kind
+from tiny_incremental import IncrementalParser, merge_edits, diff_tokens
+from tiny_cache import ParseCache
+from tiny_layout import TreeLayout
+from scanner import IncrementalLexer, is_binary_token_file, read_binary_tokens
 
 
 class ZoomableGraphicsView(QGraphicsView):
@@ -27,251 +35,212 @@ class ZoomableGraphicsView(QGraphicsView):
             self.scale(1 / self.zoom_factor, 1 / self.zoom_factor)
 
 
+### Trees with more drawn nodes than this are rendered by one TreeSceneItem instead of an item per shape
+VIRTUAL_RENDERING_NODES = 2000
+
+
 class TreeVisualizer:
-    def __init__(self, scene):
+    """
+    Puts the TreeLayout of a tree on the scene: small trees as one QGraphicsItem per shape, line and
+    label, large ones (see VIRTUAL_RENDERING_NODES, or virtual=True) as a single TreeSceneItem that
+    paints only what is visible.
+    Pens, brushes and the font are made once and shared by every shape.
+    """
+
+    def __init__(self, scene, virtual=None):
         self.scene = scene
-        self.horizontal_spacing = 160
-        self.vertical_spacing = 100
-        self.rect_width = 100
-        self.rect_height = 40
-        self.oval_width = 90
-        self.oval_height = 50
-
-    def draw_tree(self, ast_root):
+        self.virtual = virtual
+        self.layout = self.create_layout()
+
+        self.line_pen = QPen(QColor(100, 100, 100))
+        self.line_pen.setWidth(2)
+        self.shape_pen = QPen(QColor(70, 70, 70), 2)
+        self.shape_brush = QBrush(QColor(173, 216, 230, 180))
+        self.text_color = QColor(0, 0, 0)
+        self.font = QFont("Arial", 9, QFont.Bold)
+
+    ### an empty TreeLayout with the spacing and shape sizes of the tree view; needs no Qt, so a worker
+    ### thread can lay a tree out for draw_tree()
+    @staticmethod
+    def create_layout():
+        return TreeLayout(horizontal_spacing=160, vertical_spacing=100, rect_width=100, rect_height=40,
+                          oval_width=90, oval_height=50)
+
+    def draw_tree(self, ast_root, layout=None):
+        """Draws ast_root, or a TreeLayout already computed for it (e.g. by a worker thread)."""
         self.scene.clear()
-        if ast_root:
-            if str(ast_root.label).startswith('Program') and ast_root.children:
-                root = ast_root.children[0]
-            else:
-                root = ast_root
-            self._calculate_width(root)
-            self._draw_node_or_siblings(root, 400, 50, None)
-
-    def _calculate_width(self, node):
-        if node is None:
-            return 0
-        
-        label = str(node.label)
-        
-        if label.startswith('StmtSeq'):
-            total_width = 0
-            for child in node.children:
-                total_width += self._calculate_width(child)
-            node._width = max(1, total_width)
-            return node._width
-        
-        if label.startswith('OpExpr') and len(node.children) >= 3:
-            op_node = node.children[0]
-            left_node = node.children[1]
-            right_node = node.children[2]
-            
-            width = self._calculate_width(left_node) + 1 + self._calculate_width(right_node)
-            node._width = width
-            return width
-        
-        if not node.children:
-            node._width = 1
-            return 1
-        
-        total_width = 0
-        for child in node.children:
-            total_width += self._calculate_width(child)
-        
-        node._width = max(1, total_width)
-        return node._width
-
-    def _draw_node_or_siblings(self, node, x, y, parent_pos):
-        if node is None:
-            return 0
-        
-        label = str(node.label)
-        
-        if label.startswith('StmtSeq'):
-            if not node.children:
-                return 0
-            
-            total_width = sum(getattr(child, '_width', 1) for child in node.children)
-            current_x = x - (total_width - 1) * self.horizontal_spacing / 2
-            
-            prev_sibling_pos = None
-            for i, child in enumerate(node.children):
-                child_width = getattr(child, '_width', 1)
-                child_x = current_x + (child_width - 1) * self.horizontal_spacing / 2
-                
-                if i == 0:
-                    prev_sibling_pos = self._draw_node_or_siblings(child, child_x, y, parent_pos)
-                else:
-                    current_pos = self._draw_node_or_siblings(child, child_x, y, None)
-                    
-                    if prev_sibling_pos and current_pos:
-                        self._draw_sibling_pointer(prev_sibling_pos, current_pos, node.children[i-1], child)
-                    prev_sibling_pos = current_pos
-                
-                current_x += child_width * self.horizontal_spacing
-            return prev_sibling_pos
-        
-        if label.startswith('OpExpr') and len(node.children) >= 3:
-            op_node = node.children[0]
-            left_node = node.children[1]
-            right_node = node.children[2]
-            
-            op_label = self._format_label(str(op_node.label), op_node)
-            center_x = x
-            center_y = y + self.oval_height / 2
-            
-            self._draw_shape(x, y, op_label, False, parent_pos, center_y)
-            
-            left_width = getattr(left_node, '_width', 1)
-            right_width = getattr(right_node, '_width', 1)
-            total_width = left_width + right_width
-            
-            left_x = x - (total_width - 1) * self.horizontal_spacing / 2
-            right_x = x + (total_width - 1) * self.horizontal_spacing / 2
-            child_y = y + self.oval_height + self.vertical_spacing
-            
-            self._draw_node_or_siblings(left_node, left_x, child_y, QPointF(center_x, y + self.oval_height))
-            self._draw_node_or_siblings(right_node, right_x, child_y, QPointF(center_x, y + self.oval_height))
-            return {'pos': QPointF(center_x, center_y), 'node': node, 'is_statement': False}
-        
-        is_statement = self._is_statement(label)
-        display_label = self._format_label(label, node)
-        
-        if is_statement:
-            height = self.rect_height
-            width = self.rect_width
+        if layout is None:
+            layout = self.layout.layout(ast_root)
+        self.layout = layout
+
+        virtual = self.virtual
+        if virtual is None:
+            virtual = len(layout) > VIRTUAL_RENDERING_NODES
+        if virtual:
+            self.scene.addItem(TreeSceneItem(self))
         else:
-            height = self.oval_height
-            width = self.oval_width
-        
-        center_x = x
-        center_y = y + height / 2
-        
-        self._draw_shape(x, y, display_label, is_statement, parent_pos, center_y)
-        
-        children_to_draw = self._get_children_to_draw(node, label)
-        
-        if children_to_draw:
-            total_width = sum(getattr(child, '_width', 1) for child in children_to_draw)
-            current_x = x - (total_width - 1) * self.horizontal_spacing / 2
-            child_y = y + height + self.vertical_spacing
-            
-            for child in children_to_draw:
-                child_width = getattr(child, '_width', 1)
-                child_x = current_x + (child_width - 1) * self.horizontal_spacing / 2
-                self._draw_node_or_siblings(child, child_x, child_y, QPointF(center_x, y + height))
-                current_x += child_width * self.horizontal_spacing
-        
-        return {'pos': QPointF(center_x, center_y), 'node': node, 'is_statement': is_statement}
+            self._add_items()
 
-    def _draw_sibling_pointer(self, from_info, to_info, from_node, to_node):
-        from_pos = from_info['pos']
-        to_pos = to_info['pos']
-        from_is_statement = from_info['is_statement']
-        to_is_statement = to_info['is_statement']
-        
-        from_width = self.rect_width if from_is_statement else self.oval_width
-        from_edge_x = from_pos.x() + from_width / 2
-        
-        to_width = self.rect_width if to_is_statement else self.oval_width
-        to_edge_x = to_pos.x() - to_width / 2
-        
-        line = QGraphicsLineItem(from_edge_x, from_pos.y(), to_edge_x, to_pos.y())
-        pen = QPen(QColor(100, 100, 100))
-        pen.setWidth(2)
-        line.setPen(pen)
-        line.setZValue(-1)
-        self.scene.addItem(line)
-
-    def _draw_shape(self, x, y, display_label, is_statement, parent_pos, center_y):
-        if is_statement:
-            width = self.rect_width
-            height = self.rect_height
-        else:
-            width = self.oval_width
-            height = self.oval_height
-        
-        center_x = x
-        
-        if parent_pos:
-            line = QGraphicsLineItem(parent_pos.x(), parent_pos.y(), center_x, y)
-            pen = QPen(QColor(100, 100, 100))
-            pen.setWidth(2)
-            line.setPen(pen)
+    def _add_items(self):
+        for x1, y1, x2, y2, _ in self.layout.segments():
+            line = QGraphicsLineItem(x1, y1, x2, y2)
+            line.setPen(self.line_pen)
             line.setZValue(-1)
             self.scene.addItem(line)
-        
-        color = QColor(173, 216, 230, 180)
-        
-        if is_statement:
-            rect = QGraphicsRectItem(x - width/2, y, width, height)
-            rect.setBrush(QBrush(color))
-            rect.setPen(QPen(QColor(70, 70, 70), 2))
-            rect.setZValue(0)
-            self.scene.addItem(rect)
-        else:
-            ellipse = QGraphicsEllipseItem(x - width/2, y, width, height)
-            ellipse.setBrush(QBrush(color))
-            ellipse.setPen(QPen(QColor(70, 70, 70), 2))
-            ellipse.setZValue(0)
-            self.scene.addItem(ellipse)
-        
-        text = QGraphicsTextItem(display_label)
-        text.setDefaultTextColor(QColor(0, 0, 0))
-        font = QFont("Arial", 9, QFont.Bold)
-        text.setFont(font)
-        
-        text_rect = text.boundingRect()
-        text.setPos(
-            center_x - text_rect.width() / 2,
-            center_y - text_rect.height() / 2
-        )
-        text.setZValue(1)
-        self.scene.addItem(text)
-
-    def _get_children_to_draw(self, node, label):
-        if label.startswith('ReadStmt'):
-            return [child for child in node.children if not str(child.label).startswith('Identifier')]
-        elif label.startswith('AssignStmt'):
-            return node.children[1:] if len(node.children) > 1 else []
-        return node.children
-
-    def _format_label(self, label, node):
-        if label.startswith('IfStmt'):
-            return 'if'
-        elif label.startswith('RepeatStmt'):
-            return 'repeat'
-        elif label.startswith('AssignStmt'):
-            if node.children and str(node.children[0].label).startswith('Identifier('):
-                var_name = str(node.children[0].label).split('(')[1].rstrip(')')
-                return f'assign\n({var_name})'
-            return 'assign'
-        elif label.startswith('ReadStmt'):
-            if node.children and str(node.children[0].label).startswith('Identifier('):
-                var_name = str(node.children[0].label).split('(')[1].rstrip(')')
-                return f'read\n({var_name})'
-            return 'read'
-        elif label.startswith('WriteStmt'):
-            return 'write'
-        elif label.startswith('Identifier('):
-            var_name = label.split('(')[1].rstrip(')')
-            return f'id\n({var_name})'
-        elif label.startswith('Number('):
-            num = label.split('(')[1].rstrip(')')
-            return f'Const \n({num})'
-        elif label.startswith('Op('):
-            op = label.split('(')[1].rstrip(')')
-            return f'Op\n({op})'
-        return label
-
-    def _is_statement(self, label):
-        statement_types = ['IfStmt', 'RepeatStmt', 'AssignStmt', 'ReadStmt', 'WriteStmt']
-        return any(label.startswith(stmt) for stmt in statement_types)
+
+        for x, y, is_statement, display_label in self.layout.shapes():
+            width, height = self.layout.size_of(is_statement)
+            if is_statement:
+                shape = QGraphicsRectItem(x - width/2, y, width, height)
+            else:
+                shape = QGraphicsEllipseItem(x - width/2, y, width, height)
+            shape.setBrush(self.shape_brush)
+            shape.setPen(self.shape_pen)
+            shape.setZValue(0)
+            self.scene.addItem(shape)
+
+            text = QGraphicsTextItem(display_label)
+            text.setDefaultTextColor(self.text_color)
+            text.setFont(self.font)
+            text_rect = text.boundingRect()
+            text.setPos(
+                x - text_rect.width() / 2,
+                y + height / 2 - text_rect.height() / 2
+            )
+            text.setZValue(1)
+            self.scene.addItem(text)
+
+
+class TreeSceneItem(QGraphicsItem):
+    """
+    The whole layout of a TreeVisualizer as one scene item. paint() looks up the shapes and lines
+    of the exposed rectangle in a grid of CELL x CELL scene units and draws only those, with the
+    visualizer's shared pens, brush and font. The level of detail follows the zoom: below TEXT_LOD
+    the labels are left out, below PLACEHOLDER_LOD every grid cell is one box around its shapes.
+    """
+
+    CELL = 2048
+    MAX_LINE_CELLS = 64   # lines over more cells are kept apart and checked on every paint
+    TEXT_LOD = 0.35
+    PLACEHOLDER_LOD = 0.08
+
+    def __init__(self, visualizer):
+        super().__init__()
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        layout = self.layout = visualizer.layout
+        self.sizes = {True: layout.size_of(True), False: layout.size_of(False)}
+        self.line_pen = visualizer.line_pen
+        self.shape_pen = visualizer.shape_pen
+        self.shape_brush = visualizer.shape_brush
+        self.text_pen = QPen(visualizer.text_color)
+        self.font = visualizer.font
+        self.margin = max(layout.rect_width, layout.oval_width, layout.rect_height, layout.oval_height)
+
+        cell = self.CELL
+        self.node_cells = {}  # (column, row) -> indexes of the shapes whose center is in the cell
+        boxes = {}            # (column, row) -> [left, top, right, bottom] of those shapes
+        for index, (x, y, is_statement, _) in enumerate(layout.shapes()):
+            width, height = self.sizes[is_statement]
+            key = (int(x // cell), int((y + height / 2) // cell))
+            self.node_cells.setdefault(key, []).append(index)
+            box = boxes.get(key)
+            if box is None:
+                boxes[key] = [x - width / 2, y, x + width / 2, y + height]
+            else:
+                box[0] = min(box[0], x - width / 2)
+                box[1] = min(box[1], y)
+                box[2] = max(box[2], x + width / 2)
+                box[3] = max(box[3], y + height)
+        self.placeholders = {key: QRectF(left, top, right - left, bottom - top)
+                             for key, (left, top, right, bottom) in boxes.items()}
+
+        self.line_cells = {}  # (column, row) -> indexes of the lines whose bounding box touches the cell
+        self.long_lines = []
+        for index, (x1, y1, x2, y2, _) in enumerate(layout.segments()):
+            columns = range(int(min(x1, x2) // cell), int(max(x1, x2) // cell) + 1)
+            rows = range(int(min(y1, y2) // cell), int(max(y1, y2) // cell) + 1)
+            if len(columns) * len(rows) > self.MAX_LINE_CELLS:
+                self.long_lines.append(index)
+                continue
+            for column in columns:
+                for row in rows:
+                    self.line_cells.setdefault((column, row), []).append(index)
+
+        bounds = layout.bounds()
+        self.bounds = QRectF()
+        if bounds is not None:
+            left, top, right, bottom = bounds
+            self.bounds = QRectF(left, top, right - left, bottom - top).adjusted(
+                -self.margin, -self.margin, self.margin, self.margin)
+
+    def boundingRect(self):
+        return self.bounds
+
+    ### the grid cells of `cells` that overlap rect
+    def _cells_in(self, rect, cells):
+        cell = self.CELL
+        columns = range(int(rect.left() // cell), int(rect.right() // cell) + 1)
+        rows = range(int(rect.top() // cell), int(rect.bottom() // cell) + 1)
+        if len(columns) * len(rows) > len(cells):
+            return [key for key in cells if key[0] in columns and key[1] in rows]
+        return [(column, row) for column in columns for row in rows if (column, row) in cells]
+
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+
+        if lod < self.PLACEHOLDER_LOD:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(self.shape_brush)
+            for key in self._cells_in(exposed, self.placeholders):
+                painter.drawRect(self.placeholders[key])
+            return
+
+        visible_lines = {index for key in self._cells_in(exposed, self.line_cells)
+                         for index in self.line_cells[key]}
+        visible_lines.update(self.long_lines)
+        painter.setPen(self.line_pen)
+        lines = self.layout.lines
+        for index in visible_lines:
+            x1, y1, x2, y2 = lines[4 * index:4 * index + 4]
+            if min(x1, x2) <= exposed.right() and max(x1, x2) >= exposed.left() \
+                    and min(y1, y2) <= exposed.bottom() and max(y1, y2) >= exposed.top():
+                painter.drawLine(QLineF(x1, y1, x2, y2))
+
+        # node centers within half a shape of the exposed rectangle
+        area = exposed.adjusted(-self.margin, -self.margin, self.margin, self.margin)
+        layout = self.layout
+        shapes = []
+        for key in self._cells_in(area, self.node_cells):
+            for index in self.node_cells[key]:
+                x, y = layout.xs[index], layout.ys[index]
+                is_statement = bool(layout.statements[index])
+                label = layout.labels[index]
+                width, height = self.sizes[is_statement]
+                rect = QRectF(x - width / 2, y, width, height)
+                if rect.intersects(exposed):
+                    shapes.append((rect, is_statement, label))
+
+        painter.setPen(self.shape_pen)
+        painter.setBrush(self.shape_brush)
+        for rect, is_statement, _ in shapes:
+            if is_statement:
+                painter.drawRect(rect)
+            else:
+                painter.drawEllipse(rect)
+
+        if lod >= self.TEXT_LOD:
+            painter.setPen(self.text_pen)
+            painter.setFont(self.font)
+            for rect, _, label in shapes:
+                painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, label)
 
 
 class FullScreenTreeWindow(QMainWindow):
-    def __init__(self, ast_root, parent=None):
+    def __init__(self, ast_root, parent=None, layout=None):
         super().__init__(parent)
         self.ast_root = ast_root
+        self.layout = layout
         self.init_ui()
 
     def init_ui(self):
@@ -307,7 +276,7 @@ class FullScreenTreeWindow(QMainWindow):
 
     def draw_tree(self):
         visualizer = TreeVisualizer(self.tree_scene)
-        visualizer.draw_tree(self.ast_root)
+        visualizer.draw_tree(self.ast_root, self.layout)
         self.zoom_to_fit()
 
     def reset_view(self):
@@ -325,12 +294,254 @@ class FullScreenTreeWindow(QMainWindow):
             self.close()
 
 
+# what QTextDocument.toPlainText() does to the raw document text
+PLAIN_TEXT = str.maketrans({'\u2029': '\n', '\u2028': '\n', '\u00a0': ' '})
+
+
+class TokenEditorBuffer:
+    """
+    Tokens of the token editor, kept up to date edit by edit from QTextDocument.contentsChange,
+    so that a keystroke in a large program only re-reads what it touched.
+    Token text ("value , TYPE" lines) is kept as one entry per line (a token, None for an empty or
+    comment line, or the text of an invalid line); TINY source goes through scanner.IncrementalLexer.
+    mode is 'tokens' or 'source' to read the text as that kind, or 'auto' to detect it (detect_text_kind).
+    Whatever cannot be applied incrementally (the kind of text changes, positions that do not
+    map onto the text) rebuilds everything with reset().
+    parse() goes through an IncrementalParser, so only the statements around the edits made since
+    the previous parse are parsed again. A full parse first looks the editor text up in the
+    ParseCache, if one is given.
+    take_parse() splits a parse in two for a worker thread: what depends on the editor is taken on
+    the UI thread, the parse itself runs later on the worker.
+    The IncrementalParser edits its tree in place at the next reparse, so parses return a copy of it
+    that the caller owns (the UI keeps and draws it while the worker parses again).
+    """
+
+    def __init__(self, document, cache=None, mode='auto'):
+        self.document = document
+        self.parser = IncrementalParser(None)
+        self.cache = cache
+        self.mode = mode
+        self.reset()
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        text = self.document.toPlainText()
+        self.pending = None  # source edits since the last parse, as one (first, removed, added) token edit
+        self.reparse_all = True
+        self.kind = detect_text_kind(text.split('\n')) if self.mode == 'auto' else self.mode
+        self.length = self.document.characterCount() - 1
+        self.block_count = self.document.blockCount()
+        if self.kind == 'tokens':
+            self.lexer = None
+            self.lines = [self._parse_line(line) for line in text.split('\n')]
+            self.line_count = sum(1 for line in self.lines if line is not None)
+            # a line separator (Shift+Enter) makes more text lines than blocks
+            self.exact = text.count('\n') + 1 == self.block_count
+        else:
+            self.lines = None
+            self.lexer = IncrementalLexer(text)
+            # positions count UTF-16 units, characters outside the BMP would shift the str indexes
+            self.exact = len(text) == self.length
+
+    def _parse_line(self, line):
+        try:
+            return parse_token_line(line.translate(PLAIN_TEXT), 0)
+        except Exception:
+            return line
+
+    def _block_texts(self):
+        block = self.document.begin()
+        while block.isValid():
+            yield block.text()
+            block = block.next()
+
+    def on_contents_change(self, position, removed, added):
+        new_length = self.document.characterCount() - 1
+        if (not self.exact or position + removed > self.length
+                or new_length != self.length - removed + added
+                or (self.mode == 'auto' and detect_text_kind(self._block_texts()) != self.kind)):
+            self.reset()
+            return
+
+        if self.kind == 'tokens':
+            first = self.document.findBlock(position)
+            last = self.document.findBlock(position + added)
+            block_count = self.document.blockCount()
+            changed = last.blockNumber() - first.blockNumber() + 1
+            replaced = changed - (block_count - self.block_count)
+            new_lines = []
+            block = first
+            for _ in range(changed):
+                if '\u2028' in block.text():
+                    self.reset()
+                    return
+                new_lines.append(self._parse_line(block.text()))
+                block = block.next()
+            start = first.blockNumber()
+            self.line_count += sum(1 for line in new_lines if line is not None) \
+                - sum(1 for line in self.lines[start:start + replaced] if line is not None)
+            self.lines[start:start + replaced] = new_lines
+            self.block_count = block_count
+        else:
+            cursor = QTextCursor(self.document)
+            cursor.setPosition(position)
+            cursor.setPosition(position + added, QTextCursor.MoveMode.KeepAnchor)
+            new_text = cursor.selectedText().translate(PLAIN_TEXT)
+            if len(new_text) != added:
+                self.reset()
+                return
+            edit = self.lexer.edit(position, position + removed, new_text)
+            self.pending = edit if self.pending is None else merge_edits(self.pending, edit)
+        self.length = new_length
+
+    def has_tokens(self):
+        if self.kind == 'tokens':
+            return self.line_count > 0
+        return len(self.lexer.tokens) > 1
+
+    def tokens(self):
+        if self.kind == 'source':
+            return self.lexer.tokens
+        tokens = []
+        for line_num, token in enumerate(self.lines, 1):
+            if isinstance(token, str):
+                parse_token_line(token, line_num)  # raises the "Invalid token format" error
+            elif token is not None:
+                tokens.append(token)
+        return tokens
+
+    def parse(self, tokens):
+        return self.take_parse(tokens)()
+
+    def take_parse(self, tokens):
+        """
+        Takes the tokens, the edits since the previous parse and the editor text (for the cache key),
+        and returns a function that parses them, for calling on another thread while editing goes on.
+        The functions must be called one at a time, in the order they were taken; calling one with
+        skip=True instead drops its edits, so the next parse is a full one.
+        """
+        if self.kind == 'source':
+            tokens = tokens.copy()  # the lexer keeps editing its TokenStream in place
+        kind = self.kind
+        text = self.document.toPlainText() if self.cache is not None else None
+        pending, reparse_all = self.pending, self.reparse_all
+        self.pending = None
+        self.reparse_all = False
+
+        def parse(skip=False):
+            parser = self.parser
+            if skip:
+                parser.tree = None
+                return None
+            if reparse_all or parser.tree is None:
+                tree = self._parse_all(tokens, kind, text)
+            elif kind == 'source':
+                tree = parser.reparse(*pending, tokens) if pending else parser.tree
+            else:
+                tree = parser.reparse(*diff_tokens(parser.tokens, tokens), tokens)
+            # a tree from the cache is not the parser's, only the parser's own tree changes later
+            return copy_tree(tree) if tree is parser.tree else tree
+        return parse
+
+    def _parse_all(self, tokens, kind, text):
+        if self.cache is None:
+            return self.parser.parse(tokens)
+        key = self.cache.key(kind, text)
+        entry = self.cache.get(key)
+        if entry is not None:
+            # a cached tree has no statement extents: the parse after the next edit is a full one
+            self.parser.tokens, self.parser.tree = tokens, None
+            _, tree, error = entry
+            if error is not None:
+                raise Exception(error)
+            return tree
+        try:
+            tree = self.parser.parse(tokens)
+        except RecursionError:
+            raise
+        except Exception as e:
+            self.cache.put(key, tokens, error=str(e))
+            raise
+        self.cache.put(key, tokens, tree)
+        return tree
+
+
+##### parse cache of the GUI: in $TINY_PARSE_CACHE or ~/.cache/tiny_parser, in memory only when neither works
+def open_parse_cache():
+    directory = os.environ.get('TINY_PARSE_CACHE') or Path.home() / '.cache' / 'tiny_parser'
+    try:
+        return ParseCache(directory)
+    except OSError:
+        return ParseCache()
+
+
+class ParseSignals(QObject):
+    progress = Signal(int, str)       # generation, stage
+    finished = Signal(int, object)    # generation, (AST, tree text, TreeLayout)
+    failed = Signal(int, str)         # generation, error message
+
+
+class ParseJob(QRunnable):
+    """
+    Parses, prints and lays out the tree on a QThreadPool thread: parse is a function from
+    TokenEditorBuffer.take_parse. Reports each stage and the result through signals, which Qt
+    delivers on the UI thread; only drawing the scene is left to it.
+    cancel() stops the job at its next stage; a job cancelled before it parsed still calls
+    parse(skip=True), so the buffer knows its edits were not applied.
+    """
+
+    def __init__(self, generation, parse):
+        super().__init__()
+        self.generation = generation
+        self.parse = parse
+        self.signals = ParseSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        if self.cancelled.is_set():
+            self.parse(skip=True)
+            return
+        try:
+            self.signals.progress.emit(self.generation, "Parsing...")
+            ast = self.parse()
+            if self.cancelled.is_set():
+                return
+
+            self.signals.progress.emit(self.generation, "Printing the tree...")
+            out = io.StringIO()
+            write_tree(ast, out)
+            if self.cancelled.is_set():
+                return
+
+            self.signals.progress.emit(self.generation, "Laying out the tree...")
+            layout = TreeVisualizer.create_layout().layout(ast)
+            if self.cancelled.is_set():
+                return
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.progress.emit(self.generation, "Drawing the tree...")
+        self.signals.finished.emit(self.generation, (ast, out.getvalue(), layout))
+
+
 class TinyParserGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.current_file = None
         self.ast_root = None
+        self.tree_layout = None
         self.fullscreen_window = None
+        # one worker thread: parses run in the order they were started (see TokenEditorBuffer.take_parse)
+        self.parse_pool = QThreadPool()
+        self.parse_pool.setMaxThreadCount(1)
+        self.parse_generation = 0  # a result is shown only if no edit or parse came after its start
+        self.current_job = None
         self.init_ui()
 
     def init_ui(self):
@@ -351,10 +562,18 @@ class TinyParserGUI(QMainWindow):
         
         self.clear_btn = QPushButton("Clear")
         self.clear_btn.clicked.connect(self.clear_all)
+
+        # how the editor text is read: detected from its first line, or forced to tokens / source
+        self.input_mode = QComboBox()
+        for label, mode in (("Auto-detect", 'auto'), ("Token lines", 'tokens'), ("TINY source", 'source')):
+            self.input_mode.addItem(label, mode)
+        self.input_mode.currentIndexChanged.connect(self.on_input_mode_changed)
         
         button_layout.addWidget(self.load_btn)
         button_layout.addWidget(self.parse_btn)
         button_layout.addWidget(self.clear_btn)
+        button_layout.addWidget(QLabel("Input:"))
+        button_layout.addWidget(self.input_mode)
         button_layout.addStretch()
         
         main_layout.addLayout(button_layout)
@@ -367,14 +586,15 @@ class TinyParserGUI(QMainWindow):
         left_layout.addWidget(QLabel("Token Input:"))
         self.token_input = QTextEdit()
         self.token_input.setPlaceholderText(
-            "Load a token file or paste tokens here...\n"
+            "Load a token file, paste tokens or type TINY source code here...\n"
             "Format: tokenValue , tokenType\n"
             "Example:\n"
             "read , READ\n"
             "x , IDENTIFIER\n"
             ":= , ASSIGN"
         )
-        self.token_input.textChanged.connect(self.on_token_input_changed)
+        self.token_buffer = TokenEditorBuffer(self.token_input.document(), open_parse_cache())
+        self.token_input.document().contentsChange.connect(self.on_token_input_changed)
         left_layout.addWidget(self.token_input)
         
         main_splitter.addWidget(left_widget)
@@ -434,9 +654,15 @@ class TinyParserGUI(QMainWindow):
         
         main_layout.addWidget(main_splitter)
 
-    def on_token_input_changed(self):
-        has_text = bool(self.token_input.toPlainText().strip())
-        self.parse_btn.setEnabled(has_text)
+    def on_token_input_changed(self, position, removed, added):
+        self.cancel_parse()
+        self.token_buffer.on_contents_change(position, removed, added)
+        self.parse_btn.setEnabled(self.token_buffer.has_tokens())
+
+    def on_input_mode_changed(self):
+        self.cancel_parse()
+        self.token_buffer.set_mode(self.input_mode.currentData())
+        self.parse_btn.setEnabled(self.token_buffer.has_tokens())
 
     def load_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -459,8 +685,11 @@ class TinyParserGUI(QMainWindow):
                 )
                 return
 
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if is_binary_token_file(path):
+                content = "".join(f"{value} , {ttype}\n" for value, ttype in read_binary_tokens(path))
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
 
             if not content.strip():
                 QMessageBox.warning(
@@ -493,9 +722,7 @@ class TinyParserGUI(QMainWindow):
             )
 
     def parse_tokens(self):
-        token_text = self.token_input.toPlainText().strip()
-
-        if not token_text:
+        if not self.token_buffer.has_tokens():
             QMessageBox.warning(
                 self,
                 "No Input",
@@ -504,7 +731,7 @@ class TinyParserGUI(QMainWindow):
             return
 
         try:
-            tokens = self.read_tokens_from_text(token_text)
+            tokens = self.token_buffer.tokens()
             
             if not tokens:
                 QMessageBox.warning(
@@ -516,73 +743,86 @@ class TinyParserGUI(QMainWindow):
 
             if tokens[-1][1] != 'EOF':
                 tokens.append(('EOF', 'EOF'))
+        except Exception as e:
+            self.on_parse_failed(self.parse_generation, str(e))
+            return
 
-            parser = TinyParser(tokens)
-            self.ast_root = parser.parse_program()
-
-            self.status_label.setText("✅ Status: ACCEPTED - Valid TINY program")
-            self.status_label.setStyleSheet(
-                "color: white; background-color: #4caf50; font-weight: bold; "
-                "padding: 8px; border-radius: 5px;"
-            )
-                
-            output = " The input is ACCEPTED by the TINY language.\n\n"
-            output += "Abstract Syntax Tree \n"
-            output += str(self.ast_root)
-            
-            self.output_text.setText(output)
+        # parsing, the tree text and the layout run on the worker, on_parse_finished draws the result
+        self.cancel_parse()
+        self.current_job = ParseJob(self.parse_generation, self.token_buffer.take_parse(tokens))
+        self.current_job.signals.progress.connect(self.on_parse_progress)
+        self.current_job.signals.finished.connect(self.on_parse_finished)
+        self.current_job.signals.failed.connect(self.on_parse_failed)
+        self.parse_pool.start(self.current_job)
+
+    def cancel_parse(self):
+        self.parse_generation += 1
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.current_job = None
+
+    def on_parse_progress(self, generation, message):
+        if generation != self.parse_generation:
+            return
+        self.status_label.setText(f"⏳ Status: {message}")
+        self.status_label.setStyleSheet(
+            "color: black; font-weight: bold; padding: 8px; background-color: #fff3cd; "
+            "border-radius: 5px;"
+        )
 
-            visualizer = TreeVisualizer(self.tree_scene)
-            visualizer.draw_tree(self.ast_root)
-            self.tree_view.fitInView(self.tree_scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
-            
-            self.fullscreen_btn.setEnabled(True)
+    def on_parse_finished(self, generation, result):
+        if generation != self.parse_generation:
+            return
+        self.current_job = None
+        self.ast_root, tree_text, self.tree_layout = result
 
-        except Exception as e:
-            self.status_label.setText("❌ Status: REJECTED - Syntax error")
-            self.status_label.setStyleSheet(
-                "color: white; background-color: #f44336; font-weight: bold; "
-                "padding: 8px; border-radius: 5px;"
-            )
-            
-            error_output = "The input is REJECTED by the TINY language.\n\n"
-            error_output += f"Error: {str(e)}\n"
-            
-            self.output_text.setText(error_output)
-            self.tree_scene.clear()
-            self.fullscreen_btn.setEnabled(False)
+        self.status_label.setText("✅ Status: ACCEPTED - Valid TINY program")
+        self.status_label.setStyleSheet(
+            "color: white; background-color: #4caf50; font-weight: bold; "
+            "padding: 8px; border-radius: 5px;"
+        )
             
-            QMessageBox.critical(
-                self,
-                "Parse Error",
-                f"Syntax Error:\n{str(e)}"
-            )
+        output = " The input is ACCEPTED by the TINY language.\n\n"
+        output += "Abstract Syntax Tree \n"
+        output += tree_text
+        
+        self.output_text.setText(output)
 
-    def read_tokens_from_text(self, text):
-        tokens = []
-        lines = text.strip().split('\n')
+        visualizer = TreeVisualizer(self.tree_scene)
+        visualizer.draw_tree(self.ast_root, self.tree_layout)
+        self.tree_view.fitInView(self.tree_scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
         
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            parts = line.split(',')
-            if len(parts) != 2:
-                raise Exception(
-                    f"Invalid token format on line {line_num}:\n'{line}'\n"
-                    f"Expected format: tokenValue , tokenType"
-                )
-            
-            token_value = parts[0].strip()
-            token_type = parts[1].strip()
-            tokens.append((token_value, token_type))
+        self.fullscreen_btn.setEnabled(True)
 
-        return tokens
+    def on_parse_failed(self, generation, message):
+        if generation != self.parse_generation:
+            return
+        self.current_job = None
+        self.ast_root = None
+        self.tree_layout = None
+
+        self.status_label.setText("❌ Status: REJECTED - Syntax error")
+        self.status_label.setStyleSheet(
+            "color: white; background-color: #f44336; font-weight: bold; "
+            "padding: 8px; border-radius: 5px;"
+        )
+        
+        error_output = "The input is REJECTED by the TINY language.\n\n"
+        error_output += f"Error: {message}\n"
+        
+        self.output_text.setText(error_output)
+        self.tree_scene.clear()
+        self.fullscreen_btn.setEnabled(False)
+        
+        QMessageBox.critical(
+            self,
+            "Parse Error",
+            f"Syntax Error:\n{message}"
+        )
 
     def open_fullscreen_tree(self):
         if self.ast_root:
-            self.fullscreen_window = FullScreenTreeWindow(self.ast_root, self)
+            self.fullscreen_window = FullScreenTreeWindow(self.ast_root, self, self.tree_layout)
             self.fullscreen_window.show()
 
     def clear_all(self):
@@ -596,6 +836,7 @@ class TinyParserGUI(QMainWindow):
         )
         self.current_file = None
         self.ast_root = None
+        self.tree_layout = None
         self.parse_btn.setEnabled(False)
         self.fullscreen_btn.setEnabled(False)
 
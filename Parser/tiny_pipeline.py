@@ -0,0 +1,300 @@
+# tiny_pipeline.py
+# Source file -> AST in one process: the scanner's tokens are pulled straight into the parser,
+# without writing and re-reading a "value , TYPE" token file in between
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from scanner import TinyLexer, iter_tokens, is_binary_token_file, write_tokens, WRITE_BATCH, OUTPUT_BUFFER
+from tiny_parser import TinyParser, PARSER_ENGINES, print_ast, read_token_file, write_tree_dump
+from tiny_cache import ParseCache
+
+
+##### TinyParser over any iterable of (value, type) tokens, e.g. iter_tokens(file).
+##### Tokens are pulled one at a time: only the current token (one token of lookahead) is kept
+class StreamingTinyParser(TinyParser):
+    def __init__(self, tokens):
+        super().__init__(iter(tokens))
+        self.current = next(self.tokens, ('EOF','EOF'))
+
+##### return the current token without advancing
+    def peek(self):
+        return self.current
+
+##### return the current token and pull the next one
+    def advance(self):
+        tok = self.current
+        self.current = next(self.tokens, ('EOF','EOF'))
+        self.pos += 1
+        return tok
+
+##### return the type of the current token without advancing
+    def peek_type(self):
+        return self.current[1]
+
+##### return the lexeme of the current token and pull the next one
+    def advance_lexeme(self):
+        return self.advance()[0]
+
+
+##### pass tokens through unchanged while writing them to out as "value , TYPE" lines (token file for debugging)
+def tee_token_file(tokens, out):
+    lines = []
+    try:
+        for token in tokens:
+            lines.append(f"{token[0]} , {token[1]}\n")
+            if len(lines) == WRITE_BATCH:
+                out.writelines(lines)
+                lines = []
+            yield token
+    finally:
+        out.writelines(lines)
+
+
+##### scan and parse a TINY source file, return the Program ASTNode.
+##### engine=None streams the file through StreamingTinyParser; an engine name from PARSER_ENGINES
+##### scans the whole file first (needed for nesting deeper than the recursion limit with 'iterative').
+##### token_file, if given, receives every token of the source even when parsing fails.
+##### With a ParseCache the whole file is read and looked up first (engine None parses with 'iterative')
+def parse_source_file(path, engine=None, token_file=None, cache=None):
+    if cache is not None:
+        with open(path) as source:
+            tokens, ast, error = cache.parse(source.read(), 'source', engine or 'iterative')
+        if token_file:
+            with open(token_file, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER) as out:
+                write_tokens(tokens, out)
+        if error is not None:
+            raise Exception(error)
+        return ast
+
+    with open(path) as source:
+        if engine is None:
+            tokens = iter_tokens(source)
+        else:
+            tokens = TinyLexer(source.read(), engine='regex').tokenize()
+
+        out = open(token_file, 'w', encoding='utf-8') if token_file else None
+        try:
+            if out is not None:
+                tokens = tee_token_file(tokens, out)
+            parser_class = StreamingTinyParser if engine is None else PARSER_ENGINES[engine]
+            return parser_class(tokens).parse_program()
+        finally:
+            if out is not None:
+                for _ in tokens:  # write the tokens the parser did not get to
+                    pass
+                out.close()
+
+
+# ---------------------------
+# Batch parsing
+# ---------------------------
+
+##### first line of a text token file: "value , TYPE" (any spacing around the comma, a type in any case).
+##### TINY source has no commas, so a near miss such as "x , identifier" is still read as tokens and
+##### reported by the token reader or the parser, not scanned as source
+TOKEN_FILE_LINE = re.compile(r'\S*\s*,\s*\w+')
+
+
+##### 'tokens' when the first line that is not empty or a '#' comment looks like a token line, else 'source'.
+##### Callers that know the kind (--input, the GUI's input switch) do not call it
+def detect_text_kind(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not (line.startswith('#') and not line.startswith('# ,')):
+            return 'tokens' if TOKEN_FILE_LINE.fullmatch(line) else 'source'
+    return 'source'
+
+
+##### 'tokens' for a binary token file or a token text file (see detect_text_kind), else 'source'
+def detect_input_kind(path):
+    if is_binary_token_file(path):
+        return 'tokens'
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return detect_text_kind(f)
+
+
+##### nodes and depth of a tree, without recursion
+def tree_stats(root):
+    nodes = 0
+    depth = 0
+    pending = [(root, 1)]
+    while pending:
+        node, level = pending.pop()
+        nodes += 1
+        depth = max(depth, level)
+        pending.extend((child, level + 1) for child in node.children)
+    return nodes, depth
+
+
+##### ParseCache of each cache directory used by parse_batch_job in this process
+BATCH_CACHES = {}
+
+
+##### (tokens, tree, error) of one batch input through the ParseCache in cache_dir
+def parse_cached_file(path, kind, engine, cache_dir):
+    cache = BATCH_CACHES.get(cache_dir)
+    if cache is None:
+        cache = BATCH_CACHES[cache_dir] = ParseCache(cache_dir)
+    if kind == 'tokens' and is_binary_token_file(path):
+        content = Path(path).read_bytes()
+    else:
+        with open(path, encoding='utf-8' if kind == 'tokens' else None) as f:
+            content = f.read()
+    return cache.parse(content, kind, engine)
+
+
+##### worker side of parse_batch: parse one file and summarize it in a dict. The AST itself only
+##### travels back (as a write_tree_dump text) when keep_ast is set
+def parse_batch_job(job):
+    path, kind, engine, keep_ast, cache_dir = job
+    result = {'path': path, 'kind': kind, 'accepted': False, 'error': None,
+              'tokens': None, 'nodes': None, 'depth': None, 'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        if kind == 'auto':
+            kind = result['kind'] = detect_input_kind(path)
+        if cache_dir is not None:
+            hits = BATCH_CACHES[cache_dir].hits if cache_dir in BATCH_CACHES else 0
+            tokens, ast, error = parse_cached_file(path, kind, engine, cache_dir)
+            result['cached'] = BATCH_CACHES[cache_dir].hits > hits
+            result['tokens'] = len(tokens)
+            if error is not None:
+                raise Exception(error)
+        else:
+            if kind == 'tokens':
+                tokens = read_token_file(path)
+            else:
+                with open(path) as f:
+                    tokens = TinyLexer(f.read(), engine='regex').tokenize()
+            result['tokens'] = len(tokens)
+            ast = PARSER_ENGINES[engine](tokens).parse_program()
+    except Exception as e:
+        result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    result['seconds'] = time.perf_counter() - start
+    result['accepted'] = True
+    result['nodes'], result['depth'] = tree_stats(ast)
+    if keep_ast:
+        out = io.StringIO()
+        write_tree_dump(ast, out)
+        result['ast'] = out.getvalue()
+    return result
+
+
+##### parse every path (token or source files, kind 'auto' detects which) with `workers` processes,
+##### workers=1 parses in this process. Yields the parse_batch_job summaries in input order.
+##### With a cache_dir every worker looks the files up in a ParseCache there first
+def parse_batch(paths, workers=None, kind='auto', engine='iterative', keep_ast=False, cache_dir=None):
+    jobs = [(str(path), kind, engine, keep_ast, cache_dir and str(cache_dir)) for path in paths]
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(parse_batch_job, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        yield from pool.map(parse_batch_job, jobs, chunksize=chunksize)
+
+
+def run_batch(args):
+    paths = []
+    for pattern in args.batch:
+        matches = sorted(glob.glob(pattern, recursive=True)) if not Path(pattern).is_file() else [pattern]
+        paths.extend(path for path in matches if Path(path).is_file())
+    if not paths:
+        print("Error: no input files.")
+        return
+
+    keep_ast = args.ast_dir is not None
+    if keep_ast:
+        Path(args.ast_dir).mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    summary = []
+    for result in parse_batch(paths, workers=args.workers, kind=args.input, engine=args.engine or 'iterative',
+                              keep_ast=keep_ast, cache_dir=args.cache):
+        ast_text = result.pop('ast', None)
+        if ast_text is not None:
+            ast_path = Path(args.ast_dir) / (Path(result['path']).name + '.ast.jsonl')
+            ast_path.write_text(ast_text, encoding='utf-8')
+            result['ast_file'] = str(ast_path)
+        summary.append(result)
+        cached = " (cached)" if result.get('cached') else ""
+        if result['accepted']:
+            print(f"ACCEPTED {result['seconds'] * 1000:9.2f} ms  {result['nodes']:>9} nodes  "
+                  f"depth {result['depth']:>6}  {result['path']}{cached}")
+        else:
+            print(f"REJECTED {result['seconds'] * 1000:9.2f} ms  {result['path']}{cached}: {result['error']}")
+    wall = time.perf_counter() - start
+
+    accepted = sum(1 for result in summary if result['accepted'])
+    print(f"Batch complete. {accepted} accepted, {len(summary) - accepted} rejected, "
+          f"{sum(result['nodes'] or 0 for result in summary)} nodes in {wall:.3f} s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {Path(args.json).resolve()}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Scan and parse a TINY source file and print its AST")
+    arg_parser.add_argument('source_file', nargs='?')
+    arg_parser.add_argument('--engine', choices=sorted(PARSER_ENGINES), default=None,
+                            help="scan the whole file, then parse with this engine (default: stream tokens "
+                                 "into the parser)")
+    arg_parser.add_argument('--tokens', default=None, metavar='FILE',
+                            help="also write the token file, for debugging")
+    arg_parser.add_argument('--format', choices=('tree', 'jsonl'), default='tree',
+                            help="AST output: indented tree or one JSON array per node (default: tree)")
+    arg_parser.add_argument('--output', default=None, metavar='FILE',
+                            help="write the AST to FILE instead of the console")
+    arg_parser.add_argument('--batch', nargs='+', default=None, metavar='FILE_OR_GLOB',
+                            help="parse many token or source files in worker processes and print a summary")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="with --batch: kind of the input files (default: auto, detected per file)")
+    arg_parser.add_argument('--workers', type=int, default=None, metavar='N',
+                            help="with --batch: worker processes (default: one per CPU, 1: no pool)")
+    arg_parser.add_argument('--json', default=None, metavar='FILE',
+                            help="with --batch: also write the summary as JSON")
+    arg_parser.add_argument('--ast-dir', default=None, metavar='DIR',
+                            help="with --batch: send the ASTs back and write them as <name>.ast.jsonl")
+    arg_parser.add_argument('--cache', default=None, metavar='DIR',
+                            help="keep the tokens and ASTs of the inputs in a parse cache in DIR and reuse "
+                                 "them while a file is unchanged")
+    args = arg_parser.parse_args()
+
+    if args.batch:
+        run_batch(args)
+        return
+    if args.source_file is None:
+        arg_parser.error("a source file or --batch is required")
+
+    source_file = Path(args.source_file)
+    if not source_file.exists():
+        print(f"Error: Input file '{source_file}' does not exist.")
+        return
+
+    try:
+        cache = ParseCache(args.cache) if args.cache else None
+        ast = parse_source_file(source_file, engine=args.engine, token_file=args.tokens, cache=cache)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+
+    print_ast(ast, args.format, args.output)
+    print("Parsing successful ")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
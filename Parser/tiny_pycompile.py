@@ -0,0 +1,229 @@
+# tiny_pycompile.py
+# Compiles TINY programs to Python: the AST becomes the source of one Python function (variables are its
+# locals, a repeat ... until is a `while True` loop ending in `if cond: break`) and compile() turns that
+# into a code object, so a run executes at the speed of CPython's own bytecode. Compiled programs are kept
+# per hash of their tree, so a program parsed again from the same text (or from an equivalent token file)
+# is compiled only once. Same semantics as TinyInterpreter
+from collections import OrderedDict
+from pathlib import Path
+import argparse
+import hashlib
+import io
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from tiny_parser import (STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT, OP_EXPR,
+                         NUMBER, IDENTIFIER, NODE_KIND_NAMES, write_binary_tree)
+from tiny_interpreter import tiny_div, resolve_slots, load_program, parse_inputs
+from tiny_optimize import fold_constants
+
+
+### Precedence of the generated Python expressions: a name, a number or a call; * ; + - ; a comparison
+ATOM, PRODUCT, SUM, COMPARISON = 4, 3, 2, 1
+PYTHON_OPERATORS = {'+': ('+', SUM), '-': ('-', SUM), '*': ('*', PRODUCT), '<': ('<', COMPARISON),
+                    '=': ('==', COMPARISON)}
+INDENT = '    '
+
+### compiled programs kept by compile_program, least recently used first
+COMPILED_PROGRAMS = OrderedDict()
+COMPILED_PROGRAMS_LIMIT = 256
+
+
+def no_input(name):
+    raise Exception(f"Runtime Error: no input left for 'read {name}'")
+
+
+##### SHA-256 of the binary tree format of program: equal for equal trees, whatever they were parsed from
+def program_digest(program):
+    out = io.BytesIO()
+    write_binary_tree(program, out)
+    return hashlib.sha256(out.getvalue()).hexdigest()
+
+
+class PythonProgram:
+    """
+    A TINY program compiled to a Python function: source is the generated Python text, code its code
+    object. run(inputs) returns the list of written values, like TinyInterpreter.run.
+    Python limits how deeply blocks and parentheses may nest, programs beyond that raise a Compile Error.
+    """
+
+    def __init__(self, program, digest=None):
+        self.slots = resolve_slots(program)
+        self.digest = digest or program_digest(program)
+        self.variables = {}
+        self.names = {name: f"v_{name}" if name.isidentifier() and name.isascii() else f"v{slot}"
+                      for name, slot in self.slots.items()}
+        self.source = self._generate(program.children[0] if program.children else program)
+        try:
+            self.code = compile(self.source, f"<tiny {self.digest[:12]}>", 'exec')
+        except (SyntaxError, RecursionError, MemoryError) as e:
+            raise Exception(f"Compile Error: the program nests too deeply for Python ({e})")
+        namespace = {}
+        exec(self.code, namespace)
+        self._function = namespace['tiny_program']
+
+    ##### run the program with the given input values, returns the written values
+    def run(self, inputs=()):
+        outputs = []
+        values = self._function(iter(inputs), outputs.append, no_input, tiny_div)
+        self.variables = dict(zip(self.slots, values))
+        return outputs
+
+    # ---------------------------
+    # Code generation
+    # ---------------------------
+
+    ##### Python source of the tiny_program function for the statements of root
+    def _generate(self, root):
+        names = list(self.names.values())
+        lines = ["def tiny_program(inputs, write, no_input, tiny_div):"]
+        if names:
+            lines.append(f"{INDENT}{' = '.join(names)} = 0")
+
+        # (node, depth) still to generate, or a finished line; lines are appended as they are popped
+        work = [(root, 1)]
+        while work:
+            item = work.pop()
+            if isinstance(item, str):
+                lines.append(item)
+                continue
+            node, depth = item
+            indent = INDENT * depth
+            kind = node.kind
+            children = node.children
+
+            if kind == STMT_SEQ:
+                if not children:
+                    lines.append(f"{indent}pass")
+                work.extend((child, depth) for child in reversed(children))
+            elif kind == ASSIGN_STMT:
+                lines.append(f"{indent}{self.names[children[0].value]} = {self._expression(children[1])}")
+            elif kind == READ_STMT:
+                name = children[0].value
+                variable = self.names[name]
+                lines.append(f"{indent}{variable} = next(inputs, None)")
+                lines.append(f"{indent}if {variable} is None: no_input({name!r})")
+            elif kind == WRITE_STMT:
+                lines.append(f"{indent}write({self._expression(children[0])})")
+            elif kind == IF_STMT:
+                lines.append(f"{indent}if {self._expression(children[0], condition=True)}:")
+                if len(children) > 2:
+                    work.append((children[2], depth + 1))
+                    work.append(f"{indent}else:")
+                work.append((children[1], depth + 1))
+            elif kind == REPEAT_STMT:
+                lines.append(f"{indent}while True:")
+                work.append(f"{indent}{INDENT}if {self._expression(children[1], condition=True)}: break")
+                work.append((children[0], depth + 1))
+            else:
+                raise Exception(f"Compile Error: cannot compile a {NODE_KIND_NAMES[kind]} node")
+
+        lines.append(f"{INDENT}return ({''.join(name + ', ' for name in names)})")
+        return "\n".join(lines) + "\n"
+
+    ##### Python text of an expression, with only the parentheses Python needs. Comparisons give 1 or 0,
+    ##### except at the top of a condition (if, until), where the bool is used directly.
+    ##### Walks the expression with an explicit stack, left-associative chains can be very long
+    def _expression(self, root, condition=False):
+        results = []  # (text, precedence) of the operands done so far
+        pending = [(root, False)]
+        while pending:
+            node, done = pending.pop()
+            kind = node.kind
+            if kind == NUMBER:
+                value = int(node.value)
+                results.append((str(value), ATOM) if value >= 0 else (f"({value})", ATOM))
+                continue
+            if kind == IDENTIFIER:
+                results.append((self.names[node.value], ATOM))
+                continue
+            if kind != OP_EXPR:
+                raise Exception(f"Compile Error: cannot compile a {NODE_KIND_NAMES[kind]} node")
+            if not done:
+                pending.append((node, True))
+                pending.append((node.children[2], False))
+                pending.append((node.children[1], False))
+                continue
+
+            right_text, right_precedence = as_value(results.pop())
+            left_text, left_precedence = as_value(results.pop())
+            op = node.children[0].value
+            if op == '/':
+                results.append((f"tiny_div({left_text}, {right_text})", ATOM))
+                continue
+            python_op, precedence = PYTHON_OPERATORS[op]
+            if left_precedence < precedence:
+                left_text = f"({left_text})"
+            if right_precedence <= precedence:
+                right_text = f"({right_text})"
+            results.append((f"{left_text} {python_op} {right_text}", precedence))
+
+        return results[0][0] if condition else as_value(results[0])[0]
+
+
+##### (text, precedence) of a generated operand as an integer value: a comparison becomes 1 or 0
+def as_value(result):
+    text, precedence = result
+    if precedence == COMPARISON:
+        return f"(1 if {text} else 0)", ATOM
+    return result
+
+
+##### the PythonProgram of program, compiled once per program hash (see COMPILED_PROGRAMS)
+def compile_program(program):
+    digest = program_digest(program)
+    compiled = COMPILED_PROGRAMS.get(digest)
+    if compiled is not None:
+        COMPILED_PROGRAMS.move_to_end(digest)
+        return compiled
+    compiled = COMPILED_PROGRAMS[digest] = PythonProgram(program, digest)
+    while len(COMPILED_PROGRAMS) > COMPILED_PROGRAMS_LIMIT:
+        COMPILED_PROGRAMS.popitem(last=False)
+    return compiled
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compile a TINY program to Python and run it")
+    arg_parser.add_argument('program', help="TINY source or token file")
+    arg_parser.add_argument('values', nargs='*', type=int,
+                            help="input values for the program's read statements")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the program file (default: auto, detected)")
+    arg_parser.add_argument('--inputs', default=None, metavar='FILE',
+                            help="read the input values from FILE ('-': standard input) instead")
+    arg_parser.add_argument('--fold', action='store_true',
+                            help="fold constant expressions before compiling (see tiny_optimize.py)")
+    arg_parser.add_argument('--source', action='store_true',
+                            help="print the generated Python source instead of running it")
+    args = arg_parser.parse_args()
+
+    program_file = Path(args.program)
+    if not program_file.exists():
+        print(f"Error: Input file '{program_file}' does not exist.")
+        return
+
+    try:
+        program = load_program(program_file, args.input)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+
+    inputs = args.values
+    if args.inputs is not None:
+        text = sys.stdin.read() if args.inputs == '-' else Path(args.inputs).read_text()
+        inputs = parse_inputs(text)
+
+    try:
+        compiled = compile_program(fold_constants(program) if args.fold else program)
+        if args.source:
+            sys.stdout.write(compiled.source)
+            return
+        outputs = compiled.run(inputs)
+    except Exception as e:
+        print(e)
+        return
+    sys.stdout.write("".join(f"{value}\n" for value in outputs))
+
+
+if __name__ == "__main__":
+    main()
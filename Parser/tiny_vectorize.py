@@ -0,0 +1,356 @@
+# tiny_vectorize.py
+# Runs one TINY program over many input records at once with NumPy. Every variable is an array with one
+# lane per record and every statement runs on the index array of the lanes that reach it: an if splits
+# the lanes by its condition, a repeat keeps only the lanes whose until condition is still false, so
+# each record leaves its loop after its own number of iterations and the work per statement is
+# proportional to the lanes still running it. Values are 64-bit; a lane that would overflow, divide by zero
+# or run out of input leaves the batch and its record is run on its own by tiny_pycompile instead, with
+# Python's unbounded integers and the usual errors. NumPy is only needed for this module
+from pathlib import Path
+import argparse
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: only batch execution needs it
+    np = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from tiny_parser import (STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT, OP_EXPR,
+                         NUMBER, IDENTIFIER, NODE_KIND_NAMES)
+from tiny_interpreter import resolve_slots, load_program, parse_inputs
+from tiny_pycompile import compile_program
+
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+### products at or above this magnitude (as float64) leave the batch: exact below it, conservative above
+PRODUCT_LIMIT = 2.0 ** 62
+
+
+##### table of input records: a 2-D array (records x values), a 1-D array (one value per record) or a list of
+##### lists of any lengths. Returns (int64 table padded with zeros, number of values of each record)
+def input_table(inputs):
+    try:
+        table = np.asarray(inputs, dtype=np.int64)
+    except ValueError:  # records of different lengths
+        table = None
+    except OverflowError:
+        raise Exception("Runtime Error: batch input values must fit in 64-bit integers")
+    if table is not None and table.ndim in (1, 2):
+        if table.ndim == 1:
+            table = table.reshape(-1, 1)
+        return table, np.full(len(table), table.shape[1], dtype=np.int64)
+
+    counts = np.fromiter((len(record) for record in inputs), dtype=np.int64, count=len(inputs))
+    table = np.zeros((len(inputs), int(counts.max()) if len(inputs) else 0), dtype=np.int64)
+    for i, record in enumerate(inputs):
+        try:
+            table[i, :len(record)] = record
+        except OverflowError:
+            raise Exception("Runtime Error: batch input values must fit in 64-bit integers")
+    return table, counts
+
+
+class BatchOutputs:
+    """
+    The written values of every record of a batch: those of record i are values[offsets[i]:offsets[i + 1]].
+    values is an int64 array, or an object array when a record run on its own wrote a value beyond 64 bits.
+    errors maps the records that failed to their error message (their outputs are empty), scalar_records
+    is the number of records that left the batch and were run on their own.
+    """
+
+    def __init__(self, values, offsets, errors, scalar_records):
+        self.values = values
+        self.offsets = offsets
+        self.errors = errors
+        self.scalar_records = scalar_records
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    ##### written values of one record, as a list like TinyInterpreter.run returns
+    def outputs(self, record):
+        return self.values[self.offsets[record]:self.offsets[record + 1]].tolist()
+
+    ##### the outputs as a 2-D array (records x values) when every record wrote the same number of values
+    def table(self):
+        counts = np.diff(self.offsets)
+        if len(counts) and (counts != counts[0]).any():
+            raise Exception("records wrote different numbers of values, use outputs() per record")
+        return self.values.reshape(len(counts), int(counts[0]) if len(counts) else 0)
+
+
+class VectorizedProgram:
+    """
+    A TINY program run over a batch of input records: VectorizedProgram(program).run(inputs) returns the
+    BatchOutputs of all records, the same values TinyInterpreter gives for each record on its own.
+    """
+
+    def __init__(self, program):
+        if np is None:
+            raise Exception("Batch execution needs NumPy (pip install numpy)")
+        self.program = program
+        self.slots = resolve_slots(program)
+        self.root = program.children[0] if program.children else program
+        # constants beyond 64 bits cannot go into the lanes: every record then runs on its own
+        self.vectorizable = True
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            if node.kind == NUMBER and not INT64_MIN <= int(node.value) <= INT64_MAX:
+                self.vectorizable = False
+            pending.extend(node.children)
+
+    ##### run the program once per record of inputs (see input_table), returns BatchOutputs
+    def run(self, inputs):
+        table, counts = input_table(inputs)
+        records = len(table)
+        self._table = table
+        self._counts = counts
+        self._cursor = np.zeros(records, dtype=np.int64)
+        self._variables = [np.zeros(records, dtype=np.int64) for _ in self.slots]
+        self._scalar = np.zeros(records, dtype=bool)  # lanes that left the batch
+        self._scalar_count = 0
+        self._writes = []  # (lanes, values) of every write, in execution order
+        try:
+            if self.vectorizable:
+                self._run(self.root, np.arange(records))
+            else:
+                self._scalar[:] = True
+            return self._collect(records)
+        finally:
+            self._table = self._counts = self._cursor = self._variables = self._writes = None
+
+    # ---------------------------
+    # Lanes
+    # ---------------------------
+
+    ##### take the lanes of idx where bad is set out of the batch
+    def _leave(self, idx, bad):
+        if bad.any():
+            self._scalar[idx[bad]] = True
+            self._scalar_count += 1
+
+    ##### lanes of idx still in the batch
+    def _remaining(self, idx):
+        return idx[~self._scalar[idx]]
+
+    # ---------------------------
+    # Statements
+    # ---------------------------
+
+    def _run(self, node, idx):
+        kind = node.kind
+        children = node.children
+        if kind == STMT_SEQ:
+            for child in children:
+                left = self._scalar_count
+                self._run(child, idx)
+                if self._scalar_count != left:
+                    idx = self._remaining(idx)
+                    if not len(idx):
+                        return
+        elif kind == ASSIGN_STMT:
+            self._variables[self.slots[children[0].value]][idx] = self._value(children[1], idx)
+        elif kind == READ_STMT:
+            cursor = self._cursor[idx]
+            missing = cursor >= self._counts[idx]
+            self._leave(idx, missing)
+            values = self._table[idx, np.minimum(cursor, max(self._table.shape[1] - 1, 0))] \
+                if self._table.shape[1] else np.zeros(len(idx), dtype=np.int64)
+            self._variables[self.slots[children[0].value]][idx] = values
+            self._cursor[idx] = cursor + 1
+        elif kind == WRITE_STMT:
+            value = self._value(children[0], idx)
+            if not isinstance(value, np.ndarray):
+                value = np.full(len(idx), value, dtype=np.int64)
+            self._writes.append((idx, value))
+        elif kind == IF_STMT:
+            left = self._scalar_count
+            condition = self._condition(children[0], idx)
+            if self._scalar_count != left:
+                remaining = ~self._scalar[idx]
+                idx, condition = idx[remaining], condition[remaining]
+            then_idx = idx[condition]
+            if len(then_idx):
+                self._run(children[1], then_idx)
+            if len(children) > 2:
+                else_idx = idx[~condition]
+                if len(else_idx):
+                    self._run(children[2], else_idx)
+        elif kind == REPEAT_STMT:
+            while len(idx):
+                left = self._scalar_count
+                self._run(children[0], idx)
+                if self._scalar_count != left:
+                    idx = self._remaining(idx)
+                    if not len(idx):
+                        return
+                left = self._scalar_count
+                done = self._condition(children[1], idx)
+                if self._scalar_count != left:
+                    done |= self._scalar[idx]
+                idx = idx[~done]
+        else:
+            raise Exception(f"Runtime Error: cannot run a {NODE_KIND_NAMES[kind]} node")
+
+    # ---------------------------
+    # Expressions
+    # ---------------------------
+
+    ##### the lanes of idx where the expression is true, as a boolean array
+    def _condition(self, node, idx):
+        value = self._expression(node, idx)
+        if isinstance(value, np.ndarray):
+            return value if value.dtype == bool else value != 0
+        return np.full(len(idx), bool(value))
+
+    ##### integer value of the expression on the lanes of idx: an int64 array, or an int for a constant
+    def _value(self, node, idx):
+        value = self._expression(node, idx)
+        if isinstance(value, np.ndarray):
+            return value.astype(np.int64) if value.dtype == bool else value
+        return int(value)
+
+    ##### value of the expression on the lanes of idx; comparisons give boolean arrays
+    def _expression(self, node, idx):
+        kind = node.kind
+        if kind == NUMBER:
+            return int(node.value)
+        if kind == IDENTIFIER:
+            return self._variables[self.slots[node.value]][idx]
+        if kind != OP_EXPR:
+            raise Exception(f"Runtime Error: cannot evaluate a {NODE_KIND_NAMES[kind]} node")
+
+        op = node.children[0].value
+        a = self._value(node.children[1], idx)
+        b = self._value(node.children[2], idx)
+        if op == '<':
+            return a < b
+        if op == '=':
+            return a == b
+        if not isinstance(a, np.ndarray) and not isinstance(b, np.ndarray):
+            return self._constant(op, a, b, idx)
+
+        if op == '+':
+            result = a + b
+            self._leave(idx, ((a ^ result) & (b ^ result)) < 0)
+        elif op == '-':
+            result = a - b
+            self._leave(idx, ((a ^ b) & (a ^ result)) < 0)
+        elif op == '*':
+            result = a * b
+            self._leave(idx, np.abs(np.multiply(a, b, dtype=np.float64)) >= PRODUCT_LIMIT)
+        else:
+            # lanes that leave divide by 1 instead, so a // b neither fails nor overflows on them
+            zero = b == 0
+            if isinstance(b, np.ndarray):
+                bad = zero | ((a == INT64_MIN) & (b == -1))
+                self._leave(idx, bad)
+                b = np.where(bad, 1, b)
+            elif zero:
+                self._leave(idx, np.ones(len(idx), dtype=bool))
+                return np.zeros(len(idx), dtype=np.int64)
+            elif b == -1:
+                overflow = a == INT64_MIN
+                self._leave(idx, overflow)
+                b = np.where(overflow, 1, b)
+            result = a // b
+            result += (result < 0) & (result * b != a)  # floor to truncation toward zero
+        return result
+
+    ##### op on two constants, the same on every lane; lanes leave the batch when the result does not fit
+    def _constant(self, op, a, b, idx):
+        if op == '/' and b == 0:
+            self._leave(idx, np.ones(len(idx), dtype=bool))
+            return 0
+        result = {'+': a + b, '-': a - b, '*': a * b}.get(op)
+        if result is None:
+            quotient = abs(a) // abs(b)
+            result = quotient if (a < 0) == (b < 0) else -quotient
+        if not INT64_MIN <= result <= INT64_MAX:
+            self._leave(idx, np.ones(len(idx), dtype=bool))
+            return 0
+        return result
+
+    # ---------------------------
+    # Outputs
+    # ---------------------------
+
+    ##### BatchOutputs of the batch: the writes of the lanes still in it, grouped by record in execution
+    ##### order, and the outputs of the records that left it, run on their own
+    def _collect(self, records):
+        if self._writes:
+            lanes = np.concatenate([lanes for lanes, _ in self._writes])
+            values = np.concatenate([values for _, values in self._writes])
+            kept = ~self._scalar[lanes]
+            lanes, values = lanes[kept], values[kept]
+            order = np.argsort(lanes, kind='stable')
+            lanes, values = lanes[order], values[order]
+        else:
+            lanes = values = np.zeros(0, dtype=np.int64)
+        counts = np.bincount(lanes, minlength=records).astype(np.int64)
+
+        scalar_outputs = {}
+        errors = {}
+        if self._scalar.any():
+            compiled = compile_program(self.program)
+            for record in np.flatnonzero(self._scalar).tolist():
+                try:
+                    scalar_outputs[record] = compiled.run(self._table[record, :self._counts[record]].tolist())
+                except Exception as e:
+                    scalar_outputs[record] = []
+                    errors[record] = str(e)
+                counts[record] = len(scalar_outputs[record])
+
+        offsets = np.zeros(records + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        wide = any(not INT64_MIN <= value <= INT64_MAX for outputs in scalar_outputs.values() for value in outputs)
+        result = np.empty(int(offsets[-1]), dtype=object if wide else np.int64)
+        # position of each kept write within its record: its index minus the index of the record's first one
+        starts = np.searchsorted(lanes, lanes, side='left')
+        result[offsets[lanes] + np.arange(len(lanes)) - starts] = values
+        for record, outputs in scalar_outputs.items():
+            result[offsets[record]:offsets[record + 1]] = outputs
+        return BatchOutputs(result, offsets, errors, len(scalar_outputs))
+
+
+##### input records from text, one record per line (see tiny_interpreter.parse_inputs)
+def parse_records(text):
+    return [parse_inputs(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run a TINY program over many input records at once")
+    arg_parser.add_argument('program', help="TINY source or token file")
+    arg_parser.add_argument('records', help="input records, one per line ('-': standard input)")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the program file (default: auto, detected)")
+    args = arg_parser.parse_args()
+
+    program_file = Path(args.program)
+    if not program_file.exists():
+        print(f"Error: Input file '{program_file}' does not exist.")
+        return
+
+    try:
+        program = load_program(program_file, args.input)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+
+    try:
+        text = sys.stdin.read() if args.records == '-' else Path(args.records).read_text()
+        outputs = VectorizedProgram(program).run(parse_records(text))
+    except Exception as e:
+        print(e)
+        return
+    lines = []
+    for record in range(len(outputs)):
+        error = outputs.errors.get(record)
+        lines.append(error if error is not None else " ".join(map(str, outputs.outputs(record))))
+    sys.stdout.write("".join(line + "\n" for line in lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,551 @@
+# tiny_vm.py
+# Bytecode for TINY programs and the stack machine that runs it. The compiler walks the AST once (with
+# an explicit stack, like IterativeTinyParser) and emits instructions into one array of integers: an
+# opcode followed by its operands, which are variable slots, value indexes and jump offsets. Constants sit
+# in the value list after the variables, so one operand names either. The statement shapes that dominate
+# loops (x := a op b, x := a, if/until a < b or a = b, with a and b variables or constants) are single
+# instructions; the rest runs on the stack. Before running, every basic block of the code is linked into
+# one closure, so the VM dispatches once per block rather than once per instruction.
+# Same semantics as TinyInterpreter
+from array import array
+from pathlib import Path
+import argparse
+import operator
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # scanner.py is in the repository root
+from tiny_parser import (STMT_SEQ, IF_STMT, REPEAT_STMT, ASSIGN_STMT, READ_STMT, WRITE_STMT, OP_EXPR,
+                         NUMBER, IDENTIFIER, NODE_KIND_NAMES)
+from tiny_interpreter import tiny_div, resolve_slots, load_program, parse_inputs, OPERATORS
+from tiny_optimize import fold_constants
+
+
+### Opcodes, each instruction is the opcode and its operands in Bytecode.code. v, a, b: index in the value
+### list (variables, then constants), s: variable slot, d: jump offset in entries of code past the instruction.
+### LOAD v: push value v, STORE s: pop into slot s, READ s: next input into slot s, WRITE: pop to the outputs,
+### ADD..EQUAL: pop b, replace a with a op b, ADD_V..EQUAL_V v: replace the top a with a op value v,
+### ADD_TO..EQUAL_TO s a b: slot s = a op b, MOVE s v: slot s = value v,
+### JUMP d, JUMP_IF_FALSE d: jump (when the popped value is 0), JUMP_UNLESS_LESS / JUMP_UNLESS_EQUAL a b d:
+### jump unless a < b / a = b, HALT: stop
+(LOAD, STORE, READ, WRITE, ADD, SUB, MUL, DIV, LESS, EQUAL, ADD_V, SUB_V, MUL_V, DIV_V, LESS_V, EQUAL_V,
+ ADD_TO, SUB_TO, MUL_TO, DIV_TO, LESS_TO, EQUAL_TO, MOVE, JUMP, JUMP_IF_FALSE, JUMP_UNLESS_LESS,
+ JUMP_UNLESS_EQUAL, HALT) = range(28)
+OPCODE_NAMES = ('LOAD', 'STORE', 'READ', 'WRITE', 'ADD', 'SUB', 'MUL', 'DIV', 'LESS', 'EQUAL',
+                'ADD_V', 'SUB_V', 'MUL_V', 'DIV_V', 'LESS_V', 'EQUAL_V',
+                'ADD_TO', 'SUB_TO', 'MUL_TO', 'DIV_TO', 'LESS_TO', 'EQUAL_TO', 'MOVE',
+                'JUMP', 'JUMP_IF_FALSE', 'JUMP_UNLESS_LESS', 'JUMP_UNLESS_EQUAL', 'HALT')
+### operand kinds of each opcode: 'v' value index, 's' variable slot, 'd' jump offset
+OPERANDS = ('v', 's', 's', '', '', '', '', '', '', '', 'v', 'v', 'v', 'v', 'v', 'v',
+            'svv', 'svv', 'svv', 'svv', 'svv', 'svv', 'sv', 'd', 'd', 'vvd', 'vvd', '')
+### operator lexeme -> (stack opcode, opcode with a value operand, opcode storing into a slot)
+OPERATOR_OPCODES = {'+': (ADD, ADD_V, ADD_TO), '-': (SUB, SUB_V, SUB_TO), '*': (MUL, MUL_V, MUL_TO),
+                    '/': (DIV, DIV_V, DIV_TO), '<': (LESS, LESS_V, LESS_TO), '=': (EQUAL, EQUAL_V, EQUAL_TO)}
+COMPARE_JUMPS = {'<': JUMP_UNLESS_LESS, '=': JUMP_UNLESS_EQUAL}
+### stack opcode -> function of the two operand values
+OPCODE_FUNCTIONS = {opcodes[0]: OPERATORS[lexeme] for lexeme, opcodes in OPERATOR_OPCODES.items()}
+### stack opcode -> closure of `a op b` on two value indexes a and b, with the operator written out
+VALUE_CLOSURES = {
+    ADD: lambda a, b: lambda v: v[a] + v[b],
+    SUB: lambda a, b: lambda v: v[a] - v[b],
+    MUL: lambda a, b: lambda v: v[a] * v[b],
+    DIV: lambda a, b: lambda v: tiny_div(v[a], v[b]),
+    LESS: lambda a, b: lambda v: 1 if v[a] < v[b] else 0,
+    EQUAL: lambda a, b: lambda v: 1 if v[a] == v[b] else 0,
+}
+
+
+##### closure of slot s := a op b on two value indexes a and b, with the operator written out
+def store_operator(opcode, s, a, b):
+    if opcode == ADD:
+        def run_add(v):
+            v[s] = v[a] + v[b]
+        return run_add
+    if opcode == SUB:
+        def run_sub(v):
+            v[s] = v[a] - v[b]
+        return run_sub
+    if opcode == MUL:
+        def run_mul(v):
+            v[s] = v[a] * v[b]
+        return run_mul
+    if opcode == DIV:
+        def run_div(v):
+            v[s] = tiny_div(v[a], v[b])
+        return run_div
+    if opcode == LESS:
+        def run_less(v):
+            v[s] = 1 if v[a] < v[b] else 0
+        return run_less
+
+    def run_equal(v):
+        v[s] = 1 if v[a] == v[b] else 0
+    return run_equal
+
+
+class Bytecode:
+    """
+    A compiled TINY program: code is an array of instructions (opcode, operands), constants the values of
+    the Number nodes, slots maps variable names to their index in the value list.
+    run(inputs) executes it and returns the written values; steps is the number of instructions it executed.
+    """
+
+    def __init__(self, program):
+        self.slots = resolve_slots(program)
+        self.constants = []
+        self.code = array('q')
+        self.steps = 0
+        self._count = 0
+        self._constant_index = {}
+        self._compile(program.children[0] if program.children else program)
+        self._emit(HALT)
+        self._link()
+
+    def __len__(self):
+        return self._count
+
+    ##### append an instruction, returns the position of its last entry (the offset of a jump)
+    def _emit(self, opcode, *operands):
+        self.code.append(opcode)
+        self.code.extend(operands)
+        self._count += 1
+        return len(self.code) - 1
+
+    ##### value index of a Number or Identifier node, None for any other node
+    def _operand(self, node):
+        if node.kind == IDENTIFIER:
+            return self.slots[node.value]
+        if node.kind != NUMBER:
+            return None
+        value = int(node.value)
+        index = self._constant_index.get(value)
+        if index is None:
+            index = self._constant_index[value] = len(self.slots) + len(self.constants)
+            self.constants.append(value)
+        return index
+
+    ##### append a jump to the code position target, or one to _patch() later when target is None;
+    ##### returns the position of its offset
+    def _jump(self, opcode, *operands, target=None):
+        end = len(self.code) + 2 + len(operands)
+        return self._emit(opcode, *operands, 0 if target is None else target - end)
+
+    ##### point the jump whose offset is at position `at` to the current end of the code
+    def _patch(self, at):
+        self.code[at] = len(self.code) - (at + 1)
+
+    # ---------------------------
+    # Compiler
+    # ---------------------------
+
+    ##### emit the code of root. The work stack holds nodes still to compile and callables that emit the
+    ##### instructions due once the nodes pushed above them are done (operators, stores, jumps);
+    ##### their state is bound as default arguments, as nested statements rebind these locals
+    def _compile(self, root):
+        work = [root]
+        while work:
+            item = work.pop()
+            if callable(item):
+                item()
+                continue
+            node = item
+            kind = node.kind
+            children = node.children
+
+            if kind == STMT_SEQ:
+                work.extend(reversed(children))
+            elif kind == ASSIGN_STMT:
+                slot, expr = self.slots[children[0].value], children[1]
+                value = self._operand(expr)
+                if value is not None:
+                    self._emit(MOVE, slot, value)
+                    continue
+                if expr.kind == OP_EXPR:
+                    left, right = self._operand(expr.children[1]), self._operand(expr.children[2])
+                    if left is not None and right is not None:
+                        self._emit(OPERATOR_OPCODES[expr.children[0].value][2], slot, left, right)
+                        continue
+                work.append(lambda slot=slot: self._emit(STORE, slot))
+                work.append(expr)
+            elif kind == READ_STMT:
+                self._emit(READ, self.slots[children[0].value])
+            elif kind == WRITE_STMT:
+                work.append(lambda: self._emit(WRITE))
+                work.append(children[0])
+            elif kind == IF_STMT:
+                # cond; jump unless cond to else; then; (JUMP end; else:) else branch; end:
+                jumps = []
+                if len(children) > 2:
+                    work.append(lambda jumps=jumps: self._patch(jumps[1]))
+                    work.append(children[2])
+                    work.append(lambda jumps=jumps: (jumps.append(self._jump(JUMP)), self._patch(jumps[0])))
+                else:
+                    work.append(lambda jumps=jumps: self._patch(jumps[0]))
+                work.append(children[1])
+                self._condition(work, children[0], jumps.append)
+            elif kind == REPEAT_STMT:
+                # start: body; jump unless cond back to start
+                work.append(lambda cond=children[1], start=len(self.code): self._condition(work, cond, None, start))
+                work.append(children[0])
+            elif kind == OP_EXPR:
+                opcodes = OPERATOR_OPCODES[children[0].value]
+                right = self._operand(children[2])
+                if right is not None:
+                    work.append(lambda opcode=opcodes[1], right=right: self._emit(opcode, right))
+                else:
+                    work.append(lambda opcode=opcodes[0]: self._emit(opcode))
+                    work.append(children[2])
+                work.append(children[1])
+            elif kind in (NUMBER, IDENTIFIER):
+                self._emit(LOAD, self._operand(node))
+            else:
+                raise Exception(f"Runtime Error: cannot compile a {NODE_KIND_NAMES[kind]} node")
+
+    ##### the jump to target (None: patched later) taken when cond is 0, after the code of cond:
+    ##### JUMP_UNLESS_LESS / JUMP_UNLESS_EQUAL for a comparison of two operands, else cond is pushed onto
+    ##### work, followed by a JUMP_IF_FALSE. done(position of the offset) is called once it is emitted
+    def _condition(self, work, cond, done=None, target=None):
+        done = done or (lambda at: None)
+        if cond.kind == OP_EXPR and cond.children[0].value in COMPARE_JUMPS:
+            left, right = self._operand(cond.children[1]), self._operand(cond.children[2])
+            if left is not None and right is not None:
+                done(self._jump(COMPARE_JUMPS[cond.children[0].value], left, right, target=target))
+                return
+        work.append(lambda: done(self._jump(JUMP_IF_FALSE, target=target)))
+        work.append(cond)
+
+    # ---------------------------
+    # Virtual machine
+    # ---------------------------
+
+    ##### split the code into basic blocks and turn each one into a closure: blocks[position] runs the block
+    ##### that starts at that code position and returns the position of the next one (-1 after HALT),
+    ##### sizes[position] is its number of instructions. The stack instructions of a block are executed
+    ##### symbolically here: the stack holds value indexes and (opcode, a, b) expressions, which become
+    ##### nested closures when a statement or a jump consumes them, so running a block pushes nothing
+    def _link(self):
+        code = self.code.tolist()
+        self._names = list(self.slots)
+        positions = []
+        targets = {0}
+        at = 0
+        while at < len(code):
+            op = code[at]
+            end = at + 1 + len(OPERANDS[op])
+            positions.append(at)
+            if op >= JUMP:
+                targets.add(end)
+                if op != HALT:
+                    targets.add(end + code[end - 1])
+            at = end
+
+        linked = {}  # first position -> (steps, condition, following, taken, instructions, falls through)
+        stack = []
+        steps = []
+        first = 0
+        count = 0
+        for at in positions:
+            op = code[at]
+            end = at + 1 + len(OPERANDS[op])
+            count += 1
+            if op == LOAD:
+                stack.append(code[at + 1])
+            elif op == STORE:
+                steps.append(self._store(code[at + 1], stack.pop()))
+            elif op == MOVE:
+                steps.append(self._store(code[at + 1], code[at + 2]))
+            elif op >= ADD_TO and op <= EQUAL_TO:
+                steps.append(self._store(code[at + 1], (op - ADD_TO + ADD, code[at + 2], code[at + 3])))
+            elif op >= ADD_V and op <= EQUAL_V:
+                stack.append((op - ADD_V + ADD, stack.pop(), code[at + 1]))
+            elif op >= ADD and op <= EQUAL:
+                b = stack.pop()
+                stack.append((op, stack.pop(), b))
+            elif op == READ:
+                steps.append(self._read(code[at + 1]))
+            elif op == WRITE:
+                steps.append(self._write(stack.pop()))
+
+            if op >= JUMP or end in targets:
+                if op == HALT:
+                    condition, taken = None, -1
+                elif op == JUMP:
+                    condition, taken = None, end + code[end - 1]
+                elif op == JUMP_IF_FALSE:
+                    condition, taken = self._closure(stack.pop()), end + code[end - 1]
+                elif op >= JUMP_UNLESS_LESS:
+                    condition, taken = (op, code[at + 1], code[at + 2]), end + code[end - 1]
+                else:
+                    condition, taken = None, end
+                if stack:
+                    raise Exception(f"Runtime Error: block at {first} ends with a value on the stack")
+                linked[first] = (tuple(steps), condition, end, taken, count, op < JUMP)
+                steps = []
+                count = 0
+                first = end
+
+        # a block that falls through into a jump target also runs a copy of the next block, saving a dispatch
+        # at the start of every loop and after every if
+        self._blocks = [None] * (len(code) + 1)
+        self._sizes = [0] * (len(code) + 1)
+        for first, (steps, condition, following, taken, count, falls_through) in linked.items():
+            if falls_through:
+                next_steps, condition, following, taken, next_count, _ = linked[taken]
+                steps += next_steps
+                count += next_count
+            if taken == first and condition is not None:
+                self._blocks[first] = self._loop(steps, condition, following, count)
+            else:
+                self._blocks[first] = self._block(steps, condition, following, taken)
+            self._sizes[first] = count
+
+    ##### closure returning the value of a stack entry: a value index or an (opcode, a, b) expression
+    def _closure(self, entry):
+        if not isinstance(entry, tuple):
+            return operator.itemgetter(entry)
+        opcode, a, b = entry
+        if not isinstance(a, tuple) and not isinstance(b, tuple):
+            return VALUE_CLOSURES[opcode](a, b)
+        function = OPCODE_FUNCTIONS[opcode]
+        if not isinstance(b, tuple):
+            a = self._closure(a)
+            return lambda v: function(a(v), v[b])
+        b = self._closure(b)
+        if not isinstance(a, tuple):
+            return lambda v: function(v[a], b(v))
+        a = self._closure(a)
+        return lambda v: function(a(v), b(v))
+
+    ##### closure storing a stack entry into slot s, specialized for a value and for a op b on two values
+    def _store(self, s, entry):
+        if not isinstance(entry, tuple):
+            def run_move(v):
+                v[s] = v[entry]
+            return run_move
+        opcode, a, b = entry
+        if not isinstance(a, tuple) and not isinstance(b, tuple):
+            return store_operator(opcode, s, a, b)
+        value = self._closure(entry)
+
+        def run_store(v):
+            v[s] = value(v)
+        return run_store
+
+    def _read(self, s):
+        bytecode = self
+        name = self._names[s]
+
+        def run_read(v):
+            for value in bytecode._inputs:
+                v[s] = value
+                return
+            raise Exception(f"Runtime Error: no input left for 'read {name}'")
+        return run_read
+
+    def _write(self, entry):
+        bytecode = self
+        value = self._closure(entry)
+
+        def run_write(v):
+            bytecode._outputs.append(value(v))
+        return run_write
+
+    ##### closure running the steps of a block, then returning the position of the next block: taken, or
+    ##### following when there is a condition and it holds. The condition is a closure, or
+    ##### (JUMP_UNLESS_LESS / JUMP_UNLESS_EQUAL, a, b) for a comparison of two values written out in the block
+    @staticmethod
+    def _block(steps, condition, following, taken):
+        step = steps[0] if len(steps) == 1 else None
+        if condition is None:
+            if not steps:
+                return lambda v: taken
+            if step is not None:
+                def run_step(v):
+                    step(v)
+                    return taken
+                return run_step
+
+            def run_steps(v):
+                for step in steps:
+                    step(v)
+                return taken
+            return run_steps
+
+        if isinstance(condition, tuple):
+            op, a, b = condition
+            if op == JUMP_UNLESS_LESS:
+                if step is not None:
+                    def run_step_unless_less(v):
+                        step(v)
+                        return following if v[a] < v[b] else taken
+                    return run_step_unless_less
+
+                def run_steps_unless_less(v):
+                    for step in steps:
+                        step(v)
+                    return following if v[a] < v[b] else taken
+                return run_steps_unless_less
+
+            if step is not None:
+                def run_step_unless_equal(v):
+                    step(v)
+                    return following if v[a] == v[b] else taken
+                return run_step_unless_equal
+
+            def run_steps_unless_equal(v):
+                for step in steps:
+                    step(v)
+                return following if v[a] == v[b] else taken
+            return run_steps_unless_equal
+
+        if not steps:
+            return lambda v: following if condition(v) else taken
+        if step is not None:
+            def run_step_and_branch(v):
+                step(v)
+                return following if condition(v) else taken
+            return run_step_and_branch
+
+        def run_steps_and_branch(v):
+            for step in steps:
+                step(v)
+            return following if condition(v) else taken
+        return run_steps_and_branch
+
+    ##### closure for a block that jumps back to its own start (the body of a repeat): it runs the steps
+    ##### until the condition holds and returns following. The instructions of the runs after the first are
+    ##### added to self._repeated, the dispatch loop in run() only counts the first
+    def _loop(self, steps, condition, following, count):
+        bytecode = self
+        if isinstance(condition, tuple) and condition[0] == JUMP_UNLESS_LESS:
+            _, a, b = condition
+
+            def run_loop_unless_less(v):
+                repeated = 0
+                try:
+                    for step in steps:
+                        step(v)
+                    while not v[a] < v[b]:
+                        repeated += count
+                        for step in steps:
+                            step(v)
+                    return following
+                finally:
+                    bytecode._repeated += repeated
+            return run_loop_unless_less
+
+        if isinstance(condition, tuple):
+            _, a, b = condition
+
+            def run_loop_unless_equal(v):
+                repeated = 0
+                try:
+                    for step in steps:
+                        step(v)
+                    while v[a] != v[b]:
+                        repeated += count
+                        for step in steps:
+                            step(v)
+                    return following
+                finally:
+                    bytecode._repeated += repeated
+            return run_loop_unless_equal
+
+        def run_loop(v):
+            repeated = 0
+            try:
+                for step in steps:
+                    step(v)
+                while not condition(v):
+                    repeated += count
+                    for step in steps:
+                        step(v)
+                return following
+            finally:
+                bytecode._repeated += repeated
+        return run_loop
+
+    ##### run the program with the given input values, returns the written values. After an error steps
+    ##### counts the whole block that failed
+    def run(self, inputs=()):
+        blocks = self._blocks
+        sizes = self._sizes
+        values = [0] * len(self.slots) + self.constants
+        self._inputs = iter(inputs)
+        self._outputs = []
+        self._repeated = 0
+        pc = 0
+        steps = 0
+        try:
+            while pc >= 0:
+                steps += sizes[pc]
+                pc = blocks[pc](values)
+            return self._outputs
+        finally:
+            self.steps = steps + self._repeated
+            self.variables = dict(zip(self.slots, values))
+            self._inputs = None
+
+    ##### one "address  OPCODE  operands" line per instruction, the address being its position in code;
+    ##### operands show the variable or constant they name, jumps their target address
+    def disassemble(self):
+        lines = []
+        code = self.code
+        names = list(self.slots) + [str(value) for value in self.constants]
+        at = 0
+        while at < len(code):
+            op = code[at]
+            kinds = OPERANDS[op]
+            end = at + 1 + len(kinds)
+            operands = []
+            for kind, arg in zip(kinds, code[at + 1:end]):
+                operands.append(f"{arg:+d} (-> {end + arg})" if kind == 'd' else f"{arg} ({names[arg]})")
+            lines.append(f"{at:6}  {OPCODE_NAMES[op]:<18}{', '.join(operands)}".rstrip())
+            at = end
+        return "\n".join(lines)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compile a TINY program to bytecode and run it")
+    arg_parser.add_argument('program', help="TINY source or token file")
+    arg_parser.add_argument('values', nargs='*', type=int,
+                            help="input values for the program's read statements")
+    arg_parser.add_argument('--input', choices=('auto', 'source', 'tokens'), default='auto',
+                            help="kind of the program file (default: auto, detected)")
+    arg_parser.add_argument('--inputs', default=None, metavar='FILE',
+                            help="read the input values from FILE ('-': standard input) instead")
+    arg_parser.add_argument('--fold', action='store_true',
+                            help="fold constant expressions before compiling (see tiny_optimize.py)")
+    arg_parser.add_argument('--disassemble', action='store_true',
+                            help="print the bytecode instead of running it")
+    args = arg_parser.parse_args()
+
+    program_file = Path(args.program)
+    if not program_file.exists():
+        print(f"Error: Input file '{program_file}' does not exist.")
+        return
+
+    try:
+        program = load_program(program_file, args.input)
+    except Exception as e:
+        print(f"Parsing failed : {e}")
+        return
+    bytecode = Bytecode(fold_constants(program) if args.fold else program)
+    if args.disassemble:
+        print(bytecode.disassemble())
+        return
+
+    inputs = args.values
+    if args.inputs is not None:
+        text = sys.stdin.read() if args.inputs == '-' else Path(args.inputs).read_text()
+        inputs = parse_inputs(text)
+
+    try:
+        outputs = bytecode.run(inputs)
+    except Exception as e:
+        print(e)
+        return
+    sys.stdout.write("".join(f"{value}\n" for value in outputs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,892 @@
+# benchmark.py
+# Timing harness for the TINY scanner and parser.
+# Usage: python benchmark.py <benchmark> [--size N] [--repeat R]
+from pathlib import Path
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import sys
+import tracemalloc
+from xml.etree import ElementTree
+
+from scanner import (TinyLexer, ENGINES, IncrementalLexer, OUTPUT_BUFFER, iter_tokens, scan_mapped_file, write_tokens,
+                     write_binary_tokens, read_binary_tokens, collect_batch_inputs, scan_batch)
+from sample_programs import (generate_source, generate_nested_source, generate_expression_source,
+                             generate_loop_source, generate_constant_source, same_tree, labelled_evaluate)
+
+sys.path.insert(0, str(Path(__file__).parent / "Parser"))
+from tiny_parser import (TinyParser, PARSER_ENGINES, IDENTIFIER, NUMBER,
+                         write_tree, write_tree_dump, read_tree_dump, read_token_file)
+from tiny_pipeline import parse_source_file, parse_batch
+from tiny_incremental import IncrementalParser
+from tiny_cache import ParseCache
+from tiny_layout import TreeLayout, format_label, EDGE, SIBLING
+from tiny_export import write_svg, export_batch
+from tiny_interpreter import TinyInterpreter
+from tiny_vm import Bytecode
+from tiny_optimize import fold_constants, count_nodes
+from tiny_pycompile import PythonProgram, compile_program, COMPILED_PROGRAMS
+from tiny_vectorize import VectorizedProgram, np
+
+
+### run func `repeat` times and return (best wall time in seconds, last result). Each run starts after a
+### full garbage collection, so it does not pay for the garbage of the run before it
+def best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+### run func once under tracemalloc and return (peak traced bytes, result)
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+### run func under tracemalloc and return (bytes still allocated when it returns, result)
+def retained_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, seconds, count, unit):
+    rate = count / seconds if seconds else float('inf')
+    print(f"{name:<24} {seconds * 1000:10.2f} ms {rate:14,.0f} {unit}/s")
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+
+### tokens/sec of every scanning engine; all engines must produce the same token list
+def bench_scanner(args):
+    text = generate_source(args.size)
+    print(f"scanner: {len(text):,} chars")
+
+    reference = None
+    for engine in ENGINES:
+        seconds, tokens = best_time(lambda: TinyLexer(text, engine=engine).tokenize(), args.repeat)
+        if reference is None:
+            reference = tokens
+        elif tokens != reference:
+            raise Exception(f"Engine '{engine}' produced different tokens than '{ENGINES[0]}'")
+        report(f"engine={engine}", seconds, len(tokens), "tokens")
+
+
+### whole-file tokenize() versus chunked iter_tokens() over a file on disk: time and peak memory
+def bench_stream(args):
+    text = generate_source(args.size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "program.tiny"
+        path.write_text(text)
+        print(f"stream: {len(text):,} chars")
+
+        def read_and_tokenize():
+            return len(TinyLexer(path.read_text(), engine='regex').tokenize())
+
+        def stream():
+            with path.open() as f:
+                return sum(1 for _ in iter_tokens(f))
+
+        for name, func in (("tokenize(read_text())", read_and_tokenize), ("iter_tokens(file)", stream)):
+            seconds, count = best_time(func, args.repeat)
+            peak, _ = peak_memory(func)
+            report(name, seconds, count, "tokens")
+            print(f"{'':<24} peak memory {peak / 1024 / 1024:8.2f} MiB")
+
+
+### output path of scanner.main: per-token write() + print() echo versus batched write_tokens()
+def bench_write(args):
+    tokens = TinyLexer(generate_source(args.size), engine='regex').tokenize()
+    print(f"write: {len(tokens):,} tokens")
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as console:
+        path = Path(tmp) / "tokens.txt"
+
+        def per_token():
+            with path.open('w', encoding='utf-8') as f:
+                for value, ttype in tokens:
+                    f.write(f"{value} , {ttype}\n")
+            for value, ttype in tokens:
+                print(f"{value} , {ttype}", file=console)
+            return len(tokens)
+
+        def batched(echo, echo_limit=None):
+            with path.open('w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+                return write_tokens(tokens, f, echo=echo, echo_limit=echo_limit)
+
+        cases = (
+            ("write()+print()", per_token),
+            ("write_tokens echo", lambda: batched(console)),
+            ("write_tokens echo<=100", lambda: batched(console, 100)),
+            ("write_tokens no echo", lambda: batched(None)),
+        )
+        for name, func in cases:
+            seconds, count = best_time(func, args.repeat)
+            report(name, seconds, count, "tokens")
+
+
+### memory of the token list of tuples versus TokenStream, and parse time over each
+def bench_tokens(args):
+    text = generate_source(args.size)
+    print(f"tokens: {len(text):,} chars")
+
+    list_bytes, tokens = peak_memory(lambda: TinyLexer(text).tokenize())
+    stream_bytes, stream = peak_memory(lambda: TinyLexer(text).tokenize_stream())
+    if list(stream) != tokens:
+        raise Exception("TokenStream does not match tokenize()")
+    print(f"{'list of tuples':<24} {list_bytes / len(tokens):10.1f} bytes/token (peak while scanning)")
+    print(f"{'TokenStream':<24} {stream_bytes / len(stream):10.1f} bytes/token (peak while scanning), "
+          f"{stream.nbytes() / len(stream):.1f} in arrays")
+
+    for name, toks in (("parse list", tokens), ("parse TokenStream", stream)):
+        seconds, _ = best_time(lambda: TinyParser(toks).parse_program(), args.repeat)
+        report(name, seconds, len(toks), "tokens")
+
+
+### read_text() + tokenize_stream() versus scan_mapped_file() on a file on disk
+def bench_mmap(args):
+    text = generate_source(args.size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "program.tiny"
+        path.write_text(text)
+        print(f"mmap: {len(text):,} chars")
+
+        def read_and_scan():
+            return TinyLexer(path.read_text()).tokenize_stream()
+
+        def mapped():
+            with scan_mapped_file(path) as stream:
+                return len(stream)
+
+        with scan_mapped_file(path) as stream:
+            if list(stream) != list(read_and_scan()):
+                raise Exception("scan_mapped_file does not match tokenize_stream()")
+
+        for name, func in (("read_text()+scan", lambda: len(read_and_scan())),
+                           ("scan_mapped_file", mapped)):
+            seconds, count = best_time(func, args.repeat)
+            peak, _ = peak_memory(func)
+            report(name, seconds, count, "tokens")
+            print(f"{'':<24} peak memory {peak / 1024 / 1024:8.2f} MiB")
+
+
+### every parser engine on the generated program, an expression-heavy one and a deeply nested one
+def bench_parse(args):
+    programs = (
+        ("flat", TinyLexer(generate_source(args.size), engine='regex').tokenize()),
+        ("expressions", TinyLexer(generate_expression_source(args.size), engine='regex').tokenize()),
+        ("nested", TinyLexer(generate_nested_source(args.depth), engine='regex').tokenize()),
+    )
+    for program, tokens in programs:
+        print(f"parse {program}: {len(tokens):,} tokens")
+        # one untimed parse per engine first: it checks the trees, and the first engine timed does not
+        # pay alone for growing the process heap
+        reference = None
+        parsed = {}
+        for engine, parser_class in sorted(PARSER_ENGINES.items()):
+            try:
+                ast = parser_class(tokens).parse_program()
+            except RecursionError:
+                continue
+            if reference is None:
+                reference = ast
+            elif not same_tree(ast, reference):
+                raise Exception(f"Parser engine '{engine}' built a different tree")
+            parsed[engine] = parser_class
+        ast = None
+        for engine in sorted(PARSER_ENGINES):
+            if engine not in parsed:
+                print(f"{'engine=' + engine:<24} RecursionError")
+                continue
+            seconds, _ = best_time(lambda: parsed[engine](tokens).parse_program(), args.repeat)
+            report(f"engine={engine}", seconds, len(tokens), "tokens")
+
+
+### the ASTNode layout before node kinds: a string label and a per-instance __dict__
+class LabelledNode:
+    def __init__(self, label, children=None):
+        self.label = label
+        self.children = children or []
+
+
+def to_labelled_tree(root):
+    labelled_root = LabelledNode(root.label)
+    pending = [(root, labelled_root)]
+    while pending:
+        node, labelled = pending.pop()
+        for child in node.children:
+            labelled_child = LabelledNode(child.label)
+            labelled.children.append(labelled_child)
+            pending.append((child, labelled_child))
+    return labelled_root
+
+
+### memory and traversal speed of the slotted ASTNode versus string-labelled nodes
+def bench_ast(args):
+    tokens = TinyLexer(generate_source(args.size), engine='regex').tokenize()
+    parser_class = PARSER_ENGINES['iterative']
+    slotted_bytes, tree = retained_memory(lambda: parser_class(tokens).parse_program())
+    labelled_bytes, labelled_tree = retained_memory(lambda: to_labelled_tree(tree))
+
+    def count_nodes(root):
+        count = 0
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            count += 1
+            pending.extend(node.children)
+        return count
+
+    nodes = count_nodes(tree)
+    print(f"ast: {nodes:,} nodes")
+    print(f"{'labelled nodes':<24} {labelled_bytes / nodes:10.1f} bytes/node")
+    print(f"{'slotted ASTNode':<24} {slotted_bytes / nodes:10.1f} bytes/node")
+
+    # count the operands the way TreeVisualizer used to (label prefixes) and with node kinds
+    def count_operands_by_label(root):
+        count = 0
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            label = str(node.label)
+            if label.startswith('Identifier') or label.startswith('Number'):
+                count += 1
+            pending.extend(node.children)
+        return count
+
+    def count_operands_by_kind(root):
+        count = 0
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node.kind == IDENTIFIER or node.kind == NUMBER:
+                count += 1
+            pending.extend(node.children)
+        return count
+
+    for name, func in (("traverse by label", lambda: count_operands_by_label(labelled_tree)),
+                       ("traverse by kind", lambda: count_operands_by_kind(tree))):
+        seconds, _ = best_time(func, args.repeat)
+        report(name, seconds, nodes, "nodes")
+
+
+### the recursive string-concatenating printer ASTNode.__repr__ used before write_tree
+def concatenating_repr(node, level=0):
+    ret = "  " * level + repr(node.label) + "\n"
+    for child in node.children:
+        ret += concatenating_repr(child, level + 1)
+    return ret
+
+
+### printing the AST: recursive concatenation versus write_tree and the JSON-lines dump
+def bench_print(args):
+    for program, source in (("flat", generate_source(args.size)),
+                            ("nested", generate_nested_source(min(args.depth, 250)))):
+        tokens = TinyLexer(source, engine='regex').tokenize()
+        print_tree_benchmark(program, PARSER_ENGINES['iterative'](tokens).parse_program(), args)
+
+
+def print_tree_benchmark(program, tree, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "ast.txt"
+
+        def to_file(write):
+            with path.open('w', encoding='utf-8') as f:
+                write(tree, f)
+            return path.stat().st_size
+
+        text = concatenating_repr(tree)
+        if to_file(write_tree) != len(text) or path.read_text() != text:
+            raise Exception("write_tree does not match the recursive printer")
+        to_file(write_tree_dump)
+        with path.open(encoding='utf-8') as f:
+            if not same_tree(read_tree_dump(f), tree):
+                raise Exception("read_tree_dump does not give back the dumped tree")
+
+        print(f"print {program}: {len(text):,} chars of tree text")
+        cases = (
+            ("recursive concatenation", lambda: len(concatenating_repr(tree))),
+            ("write_tree", lambda: to_file(write_tree)),
+            ("write_tree_dump", lambda: to_file(write_tree_dump)),
+        )
+        for name, func in cases:
+            seconds, size = best_time(func, args.repeat)
+            report(name, seconds, size, "chars")
+
+
+### source file to AST: scanner -> token file -> read_token_file -> parser versus the fused pipeline
+def bench_pipeline(args):
+    text = generate_source(args.size)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = Path(tmp) / "program.tiny"
+        token_path = Path(tmp) / "tokens.txt"
+        source_path.write_text(text)
+        token_count = len(TinyLexer(text, engine='regex').tokenize())
+        print(f"pipeline: {len(text):,} chars, {token_count:,} tokens")
+
+        def via_token_file():
+            tokens = TinyLexer(source_path.read_text()).tokenize()
+            with token_path.open('w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+                write_tokens(tokens, f)
+            return TinyParser(read_token_file(token_path)).parse_program()
+
+        cases = (
+            ("via token file", via_token_file),
+            ("fused, streamed", lambda: parse_source_file(source_path)),
+            ("fused, iterative", lambda: parse_source_file(source_path, engine='iterative')),
+            ("fused + token file", lambda: parse_source_file(source_path, token_file=token_path)),
+        )
+        reference = None
+        for name, func in cases:
+            seconds, ast = best_time(func, args.repeat)
+            if reference is None:
+                reference = ast
+            elif not same_tree(ast, reference):
+                raise Exception(f"'{name}' built a different tree")
+            report(name, seconds, token_count, "tokens")
+
+
+### the line-by-line strip()/split(',') reader used before parse_token_text
+def split_token_file(file_path):
+    tokens = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(',')
+            if len(parts) != 2:
+                raise Exception(f"Invalid token line: {line}")
+            tokens.append((parts[0].strip(), parts[1].strip()))
+    if not tokens or tokens[-1][1] != 'EOF':
+        tokens.append(("EOF", "EOF"))
+    return tokens
+
+
+### loading token files: old text reader, read_token_file on text (fast path and hand-edited
+### fallback) and on the binary format. Round trips are checked first, including comma lexemes
+def bench_tokenfile(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = Path(tmp) / "tokens.txt"
+        edited_path = Path(tmp) / "edited.txt"
+        binary_path = Path(tmp) / "tokens.bin"
+
+        for sample in ("read x, y; write x,y {,} é", generate_source(50)):
+            tokens = TinyLexer(sample).tokenize()
+            with text_path.open('w', encoding='utf-8') as f:
+                write_tokens(tokens, f)
+            for source in (tokens, TinyLexer(sample).tokenize_stream()):
+                with binary_path.open('wb') as f:
+                    write_binary_tokens(source, f)
+                if list(read_binary_tokens(binary_path)) != tokens:
+                    raise Exception("binary token file round trip failed")
+            if read_token_file(text_path) != tokens:
+                raise Exception("text token file round trip failed")
+
+        tokens = TinyLexer(generate_source(args.size), engine='regex').tokenize()
+        with text_path.open('w', encoding='utf-8') as f:
+            write_tokens(tokens, f)
+        with edited_path.open('w', encoding='utf-8') as f:
+            f.write("# edited by hand\n")
+            write_tokens(tokens, f)
+        with binary_path.open('wb') as f:
+            write_binary_tokens(tokens, f)
+        print(f"tokenfile: {len(tokens):,} tokens, text {text_path.stat().st_size:,} bytes, "
+              f"binary {binary_path.stat().st_size:,} bytes")
+
+        cases = (
+            ("strip/split reader", lambda: split_token_file(text_path)),
+            ("read_token_file text", lambda: read_token_file(text_path)),
+            ("read_token_file edited", lambda: read_token_file(edited_path)),
+            ("read_token_file binary", lambda: read_token_file(binary_path)),
+        )
+        for name, func in cases:
+            seconds, loaded = best_time(func, args.repeat)
+            if len(loaded) != len(tokens):
+                raise Exception(f"'{name}' loaded {len(loaded)} tokens instead of {len(tokens)}")
+            report(name, seconds, len(loaded), "tokens")
+
+
+### scanning a directory of programs serially and with a process pool; outputs must be byte-identical
+def bench_batch(args):
+    files = max(args.size // 100, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp) / "src"
+        source_dir.mkdir()
+        for i in range(files):
+            (source_dir / f"program{i}.tiny").write_text(generate_source(100, seed=i))
+        _, inputs = collect_batch_inputs(source_dir)
+        print(f"batch: {files} files")
+
+        outputs = {}
+        for workers in (1, args.workers):
+            out_dir = Path(tmp) / f"out{workers}"
+            seconds, results = best_time(
+                lambda: list(scan_batch(inputs, out_dir, workers=workers, engine='regex')), args.repeat)
+            outputs[workers] = {Path(result[1]).name: Path(result[1]).read_bytes() for result in results}
+            report(f"workers={workers or 'cpu count'}", seconds, sum(result[2] for result in results), "tokens")
+        if outputs[1] != outputs[args.workers]:
+            raise Exception("parallel batch output differs from the serial run")
+
+
+def bench_batchparse(args):
+    files = max(args.size // 100, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            path = Path(tmp) / f"program{i}.tiny"
+            path.write_text(generate_source(100, seed=i))
+            paths.append(path)
+        print(f"batchparse: {files} source files")
+
+        summaries = {}
+        for workers in (1, args.workers):
+            for keep_ast in (False, True):
+                seconds, results = best_time(
+                    lambda: list(parse_batch(paths, workers=workers, keep_ast=keep_ast)), args.repeat)
+                summaries[workers, keep_ast] = [(r['path'], r['accepted'], r['nodes']) for r in results]
+                report(f"workers={workers or 'cpu count'}{', with ASTs' if keep_ast else ''}", seconds,
+                       sum(r['nodes'] for r in results), "nodes")
+        if len(set(map(tuple, summaries.values()))) != 1:
+            raise Exception("batch parse summaries differ between runs")
+
+
+### editing a large program: IncrementalLexer.edit() versus re-scanning the whole text after every keystroke
+def bench_relex(args):
+    lexer = IncrementalLexer(generate_source(max(args.size // 2, 1)))
+    print(f"relex: {lexer.text.count(chr(10)):,} lines, {len(lexer.tokens):,} tokens")
+    rng = random.Random(0)
+    edits = []
+    for _ in range(200):
+        pos = rng.randrange(len(lexer.text))
+        edits.append((pos, pos + rng.choice((0, 0, 1)), rng.choice(('x', '1', ' ', ';', ':=', '\n', '{', '}', ''))))
+
+    start = time.perf_counter()
+    for pos, end, text in edits:
+        lexer.edit(pos, end, text)
+    incremental = (time.perf_counter() - start) / len(edits)
+
+    full, tokens = best_time(lambda: TinyLexer(lexer.text, engine='regex').tokenize_stream(), args.repeat)
+    if list(tokens) != list(lexer.tokens):
+        raise Exception("incremental tokens differ from a full re-scan")
+    print(f"{'full re-scan':<24} {full * 1000:10.3f} ms per edit")
+    print(f"{'IncrementalLexer.edit':<24} {incremental * 1000:10.3f} ms per edit")
+
+
+### edit-to-tree latency: IncrementalLexer.edit() + IncrementalParser.reparse() versus a full scan and parse
+def bench_reparse(args):
+    lexer = IncrementalLexer(generate_source(max(args.size // 4, 1)))
+    parser = IncrementalParser(lexer.tokens)
+    parser.parse()
+    print(f"reparse: {len(lexer.tokens):,} tokens")
+    rng = random.Random(0)
+
+    full_parses = 0
+    parse = parser.parse
+
+    def counting_parse(tokens=None):
+        nonlocal full_parses
+        full_parses += 1
+        return parse(tokens)
+    parser.parse = counting_parse
+
+    edits = 200
+    incremental = 0.0
+    for i in range(edits):
+        text = lexer.text
+        if i % 2:  # change a digit (numbers, the x/fact suffixes)
+            pos = rng.randrange(len(text))
+            while not text[pos].isdigit():
+                pos = (pos + 1) % len(text)
+            edit = (pos, pos + 1, str(rng.randrange(10)))
+        else:  # insert a statement after a ';'
+            pos = text.index(';', rng.randrange(len(text) - 20)) + 1
+            edit = (pos, pos, rng.choice((" write 1;", " x := (x + 1) * 2;", " repeat y := y - 1 until y < 0;")))
+        start = time.perf_counter()
+        parser.reparse(*lexer.edit(*edit))
+        incremental += time.perf_counter() - start
+
+    def full():
+        return TinyParser(TinyLexer(lexer.text, engine='regex').tokenize_stream()).parse_program()
+
+    seconds, tree = best_time(full, args.repeat)
+    if repr(tree) != repr(parser.tree):
+        raise Exception("incrementally parsed tree differs from a full parse")
+    print(f"{'full scan + parse':<24} {seconds * 1000:10.3f} ms per edit")
+    print(f"{'edit + reparse':<24} {incremental / edits * 1000:10.3f} ms per edit "
+          f"({full_parses} of {edits} fell back to a full parse)")
+
+
+### scan + parse versus ParseCache hits from memory and from disk (a new ParseCache over the same directory,
+### as in the next run); hits must give back the same tokens, tree and errors. Then checks disk eviction
+def bench_cache(args):
+    text = generate_source(args.size)
+    rejected = text + "write"
+    with tempfile.TemporaryDirectory() as tmp:
+        tokens = TinyLexer(text, engine='regex').tokenize_stream()
+        print(f"cache: {len(text):,} chars, {len(tokens):,} tokens")
+        reference = PARSER_ENGINES['iterative'](tokens).parse_program()
+
+        cache = ParseCache(tmp)
+        for content in (text, rejected):
+            cold = cache.parse(content)
+            for name, hit in (("memory", cache.parse(content)), ("disk", ParseCache(tmp).parse(content))):
+                if list(hit[0]) != list(cold[0]) or hit[2] != cold[2] \
+                        or (hit[1] is not None and not same_tree(hit[1], cold[1])):
+                    raise Exception(f"{name} cache hit differs from the parse that stored it")
+        if not same_tree(cache.parse(text)[1], reference) or cache.parse(rejected)[2] is None:
+            raise Exception("cached parse differs from a plain parse")
+
+        cases = (
+            ("scan + parse", lambda: PARSER_ENGINES['iterative'](
+                TinyLexer(text, engine='regex').tokenize_stream()).parse_program()),
+            ("memory hit", lambda: cache.parse(text)[1]),
+            ("disk hit", lambda: ParseCache(tmp).parse(text)[1]),
+        )
+        for name, func in cases:
+            seconds, _ = best_time(func, args.repeat)
+            report(name, seconds, len(tokens), "tokens")
+
+        small = Path(tmp) / "small"
+        bounded = ParseCache(small, memory_bytes=0, disk_bytes=16 * 1024)
+        for i in range(50):
+            bounded.parse(generate_source(5, seed=i))
+        on_disk = sum(path.stat().st_size for path in small.rglob('*.entry'))
+        if on_disk > bounded.disk_bytes or bounded.get(bounded.key('source', generate_source(5, seed=49))) is None:
+            raise Exception("disk eviction did not keep the newest entries within the limit")
+
+
+### the recursive layout TreeVisualizer used before TreeLayout: widths in a dict, then a walk that draws
+### each shape and line as it goes. Returns (sorted shapes, sorted lines) with line kinds
+def recursive_layout(ast_root, layout):
+    spacing, vertical = layout.horizontal_spacing, layout.vertical_spacing
+    widths = {}
+    shapes = []
+    lines = []
+
+    def calculate_width(node):
+        label = node.label
+        if label.startswith('OpExpr') and len(node.children) >= 3:
+            widths[node] = calculate_width(node.children[1]) + 1 + calculate_width(node.children[2])
+        elif not node.children:
+            widths[node] = 1
+        else:
+            widths[node] = max(1, sum(calculate_width(child) for child in node.children))
+        return widths[node]
+
+    def draw_shape(x, y, label, is_statement, parent_pos):
+        if parent_pos:
+            lines.append((parent_pos[0], parent_pos[1], x, y, EDGE))
+        shapes.append((x, y, is_statement, label))
+        return {'pos': (x, y + layout.size_of(is_statement)[1] / 2), 'is_statement': is_statement}
+
+    def draw(node, x, y, parent_pos):
+        label = node.label
+        if label.startswith('StmtSeq'):
+            total_width = sum(widths[child] for child in node.children)
+            current_x = x - (total_width - 1) * spacing / 2
+            previous = None
+            for i, child in enumerate(node.children):
+                child_x = current_x + (widths[child] - 1) * spacing / 2
+                info = draw(child, child_x, y, parent_pos if i == 0 else None)
+                if previous and info:
+                    lines.append((previous['pos'][0] + layout.size_of(previous['is_statement'])[0] / 2,
+                                  previous['pos'][1], info['pos'][0] - layout.size_of(info['is_statement'])[0] / 2,
+                                  info['pos'][1], SIBLING))
+                previous = info
+                current_x += widths[child] * spacing
+            return previous
+        if label.startswith('OpExpr') and len(node.children) >= 3:
+            info = draw_shape(x, y, format_label(node.children[0]), False, parent_pos)
+            left, right = node.children[1], node.children[2]
+            total_width = widths[left] + widths[right]
+            child_y = y + layout.oval_height + vertical
+            draw(left, x - (total_width - 1) * spacing / 2, child_y, (x, y + layout.oval_height))
+            draw(right, x + (total_width - 1) * spacing / 2, child_y, (x, y + layout.oval_height))
+            return info
+        is_statement = any(label.startswith(name) for name in
+                           ('IfStmt', 'RepeatStmt', 'AssignStmt', 'ReadStmt', 'WriteStmt'))
+        height = layout.size_of(is_statement)[1]
+        info = draw_shape(x, y, format_label(node), is_statement, parent_pos)
+        if label.startswith('ReadStmt'):
+            children = [child for child in node.children if not child.label.startswith('Identifier')]
+        elif label.startswith('AssignStmt'):
+            children = node.children[1:]
+        else:
+            children = node.children
+        current_x = x - (sum(widths[child] for child in children) - 1) * spacing / 2
+        for child in children:
+            draw(child, current_x + (widths[child] - 1) * spacing / 2, y + height + vertical, (x, y + height))
+            current_x += widths[child] * spacing
+        return info
+
+    root = ast_root.children[0]
+    calculate_width(root)
+    draw(root, layout.origin[0], layout.origin[1], None)
+    return sorted(shapes), sorted(lines)
+
+
+### TreeLayout on a wide (flat) tree at three sizes and on a deep one; per-node time should stay flat.
+### The flat tree is checked against the recursive layout it replaced
+def bench_layout(args):
+    tokens = TinyLexer(generate_source(min(args.size, 2000)), engine='regex').tokenize()
+    tree = PARSER_ENGINES['iterative'](tokens).parse_program()
+    layout = TreeLayout().layout(tree)
+    if recursive_layout(tree, layout) != (sorted(layout.shapes()), sorted(layout.segments())):
+        raise Exception("TreeLayout differs from the recursive layout")
+
+    programs = [(f"flat {size}", generate_source(size)) for size in (args.size // 4, args.size // 2, args.size)]
+    programs.append((f"nested {args.depth}", generate_nested_source(args.depth)))
+    for name, source in programs:
+        tree = PARSER_ENGINES['iterative'](TinyLexer(source, engine='regex').tokenize()).parse_program()
+        seconds, layout = best_time(lambda: TreeLayout().layout(tree), args.repeat)
+        report(f"layout {name}", seconds, len(layout), "shapes")
+
+
+### write_svg on one large tree (checked to be well-formed XML with one shape per layout entry), then
+### exporting a directory of programs serially and with a process pool
+def bench_export(args):
+    tree = PARSER_ENGINES['iterative'](TinyLexer(generate_source(args.size), engine='regex').tokenize()).parse_program()
+    layout = TreeLayout().layout(tree)
+    with tempfile.TemporaryDirectory() as tmp:
+        svg_path = Path(tmp) / "tree.svg"
+
+        def to_file():
+            with svg_path.open('w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+                return write_svg(layout, f)
+
+        to_file()
+        root = ElementTree.parse(svg_path).getroot()
+        shapes = sum(1 for element in root if element.tag.endswith(('}rect', '}ellipse')))
+        if shapes != len(layout):
+            raise Exception(f"SVG has {shapes} shapes instead of {len(layout)}")
+        print(f"export: {len(layout):,} shapes, {svg_path.stat().st_size:,} bytes of SVG")
+        seconds, _ = best_time(to_file, args.repeat)
+        report("write_svg", seconds, len(layout), "shapes")
+
+        files = max(args.size // 100, 2)
+        paths = []
+        for i in range(files):
+            path = Path(tmp) / f"program{i}.tiny"
+            path.write_text(generate_source(100, seed=i))
+            paths.append(path)
+        for workers in (1, args.workers):
+            seconds, results = best_time(
+                lambda: list(export_batch(paths, Path(tmp) / "svg", workers=workers)), args.repeat)
+            if any(result[4] is not None for result in results):
+                raise Exception("batch export failed")
+            report(f"{files} files, workers={workers or 'cpu count'}", seconds, files, "files")
+
+
+### (name, program AST, inputs) of the programs run by the execution benchmarks: Parser/input5.txt (both
+### branches of its if), the generated factorial blocks and a loop-heavy program
+def execution_programs(args):
+    rng = random.Random(0)
+    blocks = min(args.size, 5000)
+    sample = PARSER_ENGINES['iterative'](read_token_file(Path(__file__).parent / "Parser" / "input5.txt"))
+    sample = sample.parse_program()
+    programs = [
+        ("input5.txt", sample, [3, 5]),
+        ("input5.txt else", sample, [3, -5]),
+        (f"{blocks} factorial blocks", generate_source(blocks), [rng.randint(0, 30) for _ in range(blocks)]),
+        (f"loop n={args.size * 5}", generate_loop_source(), [args.size * 5]),
+    ]
+    return [(name, program if not isinstance(program, str) else
+             PARSER_ENGINES['iterative'](TinyLexer(program, engine='regex').tokenize()).parse_program(), inputs)
+            for name, program, inputs in programs]
+
+
+### TinyInterpreter against the label-walking evaluator on the execution_programs; every program must write
+### the same values under both
+def bench_run(args):
+    for name, program, inputs in execution_programs(args):
+        expected, executed = labelled_evaluate(program, inputs)
+        interpreter = TinyInterpreter(program)
+        if interpreter.run(inputs) != expected:
+            raise Exception(f"TinyInterpreter output differs from the reference evaluation on {name}")
+        print(f"run {name}: {executed:,} statements executed")
+        seconds, _ = best_time(lambda: labelled_evaluate(program, inputs), args.repeat)
+        report("label walk", seconds, executed, "stmts")
+        seconds, _ = best_time(lambda: interpreter.run(inputs), args.repeat)
+        report("TinyInterpreter", seconds, executed, "stmts")
+
+
+### Bytecode VM throughput in instructions/sec on the execution_programs, checked against the label-walking
+### evaluator, with TinyInterpreter for comparison in statements/sec
+def bench_vm(args):
+    for name, program, inputs in execution_programs(args):
+        expected, executed = labelled_evaluate(program, inputs)
+        seconds, bytecode = best_time(lambda: Bytecode(program), args.repeat)
+        if bytecode.run(inputs) != expected:
+            raise Exception(f"Bytecode VM output differs from the reference evaluation on {name}")
+        print(f"vm {name}: {len(bytecode):,} instructions, {bytecode.steps:,} executed "
+              f"({executed:,} statements)")
+        report("compile", seconds, len(bytecode), "instrs")
+        seconds, _ = best_time(lambda: bytecode.run(inputs), args.repeat)
+        report("Bytecode.run", seconds, bytecode.steps, "instrs")
+        report("Bytecode.run", seconds, executed, "stmts")
+        interpreter = TinyInterpreter(program)
+        seconds, _ = best_time(lambda: interpreter.run(inputs), args.repeat)
+        report("TinyInterpreter", seconds, executed, "stmts")
+
+
+### PythonProgram against the label-walking evaluator and TinyInterpreter on the execution_programs (outputs
+### must match), with the cost of compiling a program and of finding it again in the compiled program cache
+def bench_pycompile(args):
+    for name, program, inputs in execution_programs(args):
+        expected, executed = labelled_evaluate(program, inputs)
+        COMPILED_PROGRAMS.clear()
+        compiled = compile_program(program)
+        if compiled.run(inputs) != expected:
+            raise Exception(f"compiled program output differs from the reference evaluation on {name}")
+        print(f"pycompile {name}: {compiled.source.count(chr(10)):,} lines of Python, "
+              f"{executed:,} statements executed")
+        nodes = count_nodes(program)
+        seconds, _ = best_time(lambda: PythonProgram(program), args.repeat)
+        report("compile", seconds, nodes, "nodes")
+        seconds, _ = best_time(lambda: compile_program(program), args.repeat)
+        report("compile, cached", seconds, nodes, "nodes")
+        interpreter = TinyInterpreter(program)
+        for runner_name, run in (("label walk", lambda: labelled_evaluate(program, inputs)),
+                                 ("TinyInterpreter", lambda: interpreter.run(inputs)),
+                                 ("PythonProgram", lambda: compiled.run(inputs))):
+            seconds, _ = best_time(run, args.repeat)
+            report(runner_name, seconds, executed, "stmts")
+
+
+### VectorizedProgram on `size * 10` input records against running the program once per record with
+### TinyInterpreter and PythonProgram (the outputs of every record must match), on Parser/input.txt, a
+### factorial program and the loop-heavy program with a different loop count per record. Factorials of 21
+### and more overflow 64 bits, those records leave the batch and are run on their own
+def bench_vector(args):
+    if np is None:
+        print("vector: skipped, NumPy is not installed")
+        return
+    rng = random.Random(0)
+    records = args.size * 10
+    factorial = "read x; if 0 < x then fact := 1; repeat fact := fact * x; x := x - 1 until x = 0; write fact end"
+    programs = [
+        ("input.txt", PARSER_ENGINES['iterative'](read_token_file(Path(__file__).parent / "Parser" / "input.txt")),
+         [[x, x + rng.choice((-3, -1, 1, 7))] for x in (rng.randint(-50, 50) for _ in range(records))]),
+        ("factorial", PARSER_ENGINES['iterative'](TinyLexer(factorial, engine='regex').tokenize()),
+         [[rng.randint(-2, 22)] for _ in range(records)]),
+        ("loop", PARSER_ENGINES['iterative'](TinyLexer(generate_loop_source(), engine='regex').tokenize()),
+         [[rng.randint(0, 40)] for _ in range(records)]),
+    ]
+    for name, parser, inputs in programs:
+        program = parser.parse_program()
+        compiled = compile_program(program)
+        interpreter = TinyInterpreter(program)
+        table = np.array(inputs, dtype=np.int64)
+        vectorized = VectorizedProgram(program)
+        batch = vectorized.run(table)
+        expected = [compiled.run(record) for record in inputs]
+        if any(batch.outputs(i) != outputs for i, outputs in enumerate(expected)):
+            raise Exception(f"vectorized outputs differ from per-record execution on {name}")
+        print(f"vector {name}: {records:,} records, {len(batch.values):,} values written, "
+              f"{batch.scalar_records} records run on their own")
+        per_record = None
+        for runner_name, run in (("TinyInterpreter/record", lambda: [interpreter.run(record) for record in inputs]),
+                                 ("PythonProgram/record", lambda: [compiled.run(record) for record in inputs]),
+                                 ("VectorizedProgram", lambda: vectorized.run(table))):
+            seconds, _ = best_time(run, args.repeat)
+            report(runner_name, seconds, records, "records")
+            if runner_name == "PythonProgram/record":
+                per_record = seconds
+        print(f"{'speedup':<24} {per_record / seconds:10.1f} x over PythonProgram per record")
+
+
+### written values of the interpreter on program, or the runtime error it stops with
+def run_outcome(program, inputs):
+    try:
+        return TinyInterpreter(program).run(inputs)
+    except Exception as e:
+        return str(e)
+
+
+### fold_constants on a constant-heavy loop and the execution_programs: node counts before and after,
+### folding time, and the interpreter on both trees, which must write the same values (or fail the same way)
+def bench_fold(args):
+    statements = max(args.size // 100, 1)
+    source = generate_constant_source(statements)
+    programs = [(f"{statements} constant-heavy statements, n=100",
+                 PARSER_ENGINES['iterative'](TinyLexer(source, engine='regex').tokenize()).parse_program(), [100])]
+    programs.extend(execution_programs(args))
+    for name, program, inputs in programs:
+        seconds, folded = best_time(lambda: fold_constants(program), args.repeat)
+        if run_outcome(folded, inputs) != run_outcome(program, inputs):
+            raise Exception(f"folded program behaves differently on {name}")
+        before, after = count_nodes(program), count_nodes(folded)
+        print(f"fold {name}: {before:,} -> {after:,} nodes ({(before - after) / before:.1%} fewer)")
+        report("fold_constants", seconds, before, "nodes")
+        for tree_name, tree in (("compile + run", program), ("folded compile + run", folded)):
+            seconds, _ = best_time(lambda: run_outcome(tree, inputs), args.repeat)
+            report(tree_name, seconds, before, "nodes")
+
+
+BENCHMARKS = {
+    'ast': bench_ast,
+    'batch': bench_batch,
+    'batchparse': bench_batchparse,
+    'cache': bench_cache,
+    'export': bench_export,
+    'fold': bench_fold,
+    'layout': bench_layout,
+    'mmap': bench_mmap,
+    'parse': bench_parse,
+    'pipeline': bench_pipeline,
+    'print': bench_print,
+    'pycompile': bench_pycompile,
+    'relex': bench_relex,
+    'reparse': bench_reparse,
+    'run': bench_run,
+    'scanner': bench_scanner,
+    'stream': bench_stream,
+    'tokenfile': bench_tokenfile,
+    'tokens': bench_tokens,
+    'vector': bench_vector,
+    'vm': bench_vm,
+    'write': bench_write,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="TINY scanner/parser benchmarks")
+    arg_parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all'])
+    arg_parser.add_argument('--size', type=int, default=20000,
+                            help="number of generated program blocks (default: 20000)")
+    arg_parser.add_argument('--depth', type=int, default=100000,
+                            help="nesting depth of the generated nested program (default: 100000)")
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help="worker processes for the batch benchmarks (default: one per CPU)")
+    arg_parser.add_argument('--repeat', type=int, default=3,
+                            help="runs per measurement, the best one is reported (default: 3)")
+    args = arg_parser.parse_args()
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    for name in names:
+        BENCHMARKS[name](args)
+        print()
+
+
+if __name__ == '__main__':
+    main()
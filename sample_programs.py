@@ -0,0 +1,153 @@
+# sample_programs.py
+# Generated TINY programs and the reference checks on their results, shared by benchmark.py and the tests:
+# tree equality and a plain evaluator walking the node labels
+import random
+
+
+### generate a TINY program made of `blocks` factorial-style blocks with varying names and comments
+def generate_source(blocks, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for i in range(blocks):
+        x = f"x{i % 97}"
+        fact = f"fact{i % 89}"
+        parts.append(
+            f"{{ block {i} }}\n"
+            f"read {x};\n"
+            f"if 0 < {x} then\n"
+            f"  {fact} := 1;\n"
+            f"  repeat\n"
+            f"    {fact} := {fact} * {x};\n"
+            f"    {x} := {x} - 1\n"
+            f"  until {x} = 0;\n"
+            f"  write ({fact} + {rng.randint(0, 999)}) * 2\n"
+            f"end;\n"
+        )
+    parts.append("write 0\n")
+    return "".join(parts)
+
+
+### a program nested `depth` levels deep: if/repeat blocks around a parenthesized expression
+def generate_nested_source(depth):
+    opening = "".join("if x < 1 then " if i % 2 else "repeat " for i in range(depth))
+    closing = "".join(" end" if i % 2 else " until x = 0" for i in reversed(range(depth)))
+    return f"{opening}write {'(' * depth}x{' + 1)' * depth}{closing}"
+
+
+### `statements` write statements over long expressions with every operator and some brackets
+def generate_expression_source(statements, terms=24, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(statements):
+        parts = []
+        for i in range(terms):
+            operand = rng.choice(("x", "y1", "count", str(rng.randint(0, 99))))
+            if i % 6 == 5:
+                operand = f"({operand} - {rng.choice(('x', '1'))})"
+            parts.append(operand)
+            if i < terms - 1:
+                parts.append(rng.choice("+-*/") if i != terms // 2 else rng.choice("<="))
+        lines.append("write " + " ".join(parts))
+    return ";\n".join(lines)
+
+
+### a loop-heavy program: reads n, runs n iterations of arithmetic, a division test and a nested countdown
+def generate_loop_source():
+    return (
+        "read n;\n"
+        "i := 0; sum := 0; count := 0;\n"
+        "repeat\n"
+        "  i := i + 1;\n"
+        "  sum := sum + i * i - (i - 1) * 2;\n"
+        "  if sum / 7 * 7 = sum then count := count + 1 else count := count - 0 end;\n"
+        "  k := 3;\n"
+        "  repeat k := k - 1 until k = 0\n"
+        "until n < i + 1;\n"
+        "write sum; write count; write (0 - sum) / 9\n"
+    )
+
+
+### `statements` assignments inside a loop of `n` iterations, written the way generated or macro-expanded
+### code often is: constant subexpressions, constants spread over a chain and identities like * 1 and + 0
+def generate_constant_source(statements, seed=0):
+    rng = random.Random(seed)
+    lines = ["read n;", "i := 0;", "repeat"]
+    for k in range(statements):
+        a, b, c, d = (rng.randint(1, 9) for _ in range(4))
+        target = f"v{k % 13}"
+        lines.append(rng.choice((
+            f"  {target} := i * {a} * {b} + {c} * {d} - {a} + 0;",
+            f"  {target} := (i + {a}) * 1 + {b} + {c} - {d};",
+            f"  {target} := {target} + {a} * {b} / {c} + i * 0 - 0;",
+            f"  {target} := ({a} < {b}) * i + ({c} = {d}) * {target} + 1 * i;",
+        )))
+    lines.append("  i := i + 1\nuntil n < i + 1;")
+    lines.append("; ".join(f"write v{k}" for k in range(min(statements, 13))))
+    return "\n".join(lines)
+
+
+### structural equality of two ASTNode trees, without recursion
+def same_tree(a, b):
+    pending = [(a, b)]
+    while pending:
+        a, b = pending.pop()
+        if a.kind != b.kind or a.value != b.value or len(a.children) != len(b.children):
+            return False
+        pending.extend(zip(a.children, b.children))
+    return True
+
+
+### the straightforward evaluator: a recursive walk dispatching on node labels, variables in a dict keyed by
+### their "Identifier(x)" labels. Returns (written values, statements executed)
+def labelled_evaluate(program, inputs):
+    env = {}
+    inputs = iter(inputs)
+    outputs = []
+    executed = 0
+
+    def evaluate(node):
+        label = node.label
+        if label.startswith('Number'):
+            return int(node.value)
+        if label.startswith('Identifier'):
+            return env.get(label, 0)
+        op, left, right = node.children[0].label, evaluate(node.children[1]), evaluate(node.children[2])
+        if op == 'Op(+)':
+            return left + right
+        if op == 'Op(-)':
+            return left - right
+        if op == 'Op(*)':
+            return left * right
+        if op == 'Op(/)':
+            quotient = abs(left) // abs(right)
+            return quotient if (left < 0) == (right < 0) else -quotient
+        if op == 'Op(<)':
+            return int(left < right)
+        return int(left == right)
+
+    def run(node):
+        nonlocal executed
+        label = node.label
+        if label == 'StmtSeq':
+            for child in node.children:
+                run(child)
+            return
+        executed += 1
+        if label == 'AssignStmt':
+            env[node.children[0].label] = evaluate(node.children[1])
+        elif label == 'ReadStmt':
+            env[node.children[0].label] = next(inputs)
+        elif label == 'WriteStmt':
+            outputs.append(evaluate(node.children[0]))
+        elif label == 'IfStmt':
+            if evaluate(node.children[0]):
+                run(node.children[1])
+            elif len(node.children) > 2:
+                run(node.children[2])
+        else:
+            run(node.children[0])
+            while not evaluate(node.children[1]):
+                run(node.children[0])
+
+    run(program.children[0])
+    return outputs, executed
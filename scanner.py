@@ -1,5 +1,17 @@
 from pathlib import Path
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, chain, islice
+import argparse
+import glob
+import mmap
+import multiprocessing
+import os
+import re
+import struct
 import sys
+import time
 
 # Token definitions
 KEYWORDS = {
@@ -25,15 +37,186 @@ SINGLE_CHAR_TOKENS = {
     ')': 'CLOSEDBRACKET'
 }
 
+### Scanning engines: 'char' walks the text with peek/advance, 'regex' uses MASTER_PATTERN
+ENGINES = ('char', 'regex')
+
+### ASCII characters for which str.isspace() is true (same set the char engine skips)
+WHITESPACE_CHARS = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f '
+
+### One match = skip whitespace and { ... } comments, then capture one lexeme.
+### The final \Z alternative gives a single empty match at the end of the text, so trailing
+### whitespace or an unterminated comment never makes the pattern backtrack.
+SKIPPED_PATTERN = r'(?:[' + WHITESPACE_CHARS + r']+|\{[^}]*(?:\}|\Z))*'
+LEXEME_PATTERN = r'(?:([A-Za-z][A-Za-z0-9]*|[0-9]+|:=|[^' + WHITESPACE_CHARS + r'{])|\Z)'
+MASTER_PATTERN = re.compile(SKIPPED_PATTERN + LEXEME_PATTERN)
+
+### Small integer codes for the token types, used by TokenStream. EOF is code 0
+TOKEN_TYPES = ('EOF', 'IDENTIFIER', 'NUMBER', 'ASSIGN', 'UNKNOWN') \
+    + tuple(KEYWORDS.values()) + tuple(SINGLE_CHAR_TOKENS.values())
+TOKEN_CODES = {ttype: code for code, ttype in enumerate(TOKEN_TYPES)}
+EOF_CODE = TOKEN_CODES['EOF']
+
+### Same pattern over bytes for scanning memory-mapped files without decoding them, with the skipped
+### whitespace and comments captured too: findall then gives (skipped, lexeme) pairs whose lengths add up to
+### every lexeme's offset, so scan_mapped_file needs no match object per token.
+### The map is scanned MAPPED_WINDOW bytes at a time to keep the pairs of one window only
+MAPPED_PATTERN = re.compile(('(' + SKIPPED_PATTERN + ')' + LEXEME_PATTERN).encode('ascii'))
+MAPPED_WINDOW = 4096
+NON_ASCII_BYTE = re.compile(rb'[\x80-\xff]')
+
+## expecting to return the (value, type) token for a lexeme captured by MASTER_PATTERN
+def classify_lexeme(lexeme):
+    ch = lexeme[0]
+    if ch.isalpha():
+        return (lexeme, KEYWORDS.get(lexeme.lower(), 'IDENTIFIER'))
+    if ch.isdigit():
+        return (lexeme, 'NUMBER')
+    if lexeme == ':=':
+        return (lexeme, 'ASSIGN')
+    return (lexeme, SINGLE_CHAR_TOKENS.get(lexeme, 'UNKNOWN'))
+
+
+
+### Output: token lines are formatted in batches and handed to writelines(), the stdout echo is optional
+WRITE_BATCH = 8192
+OUTPUT_BUFFER = 1024 * 1024
+
+
+## write every token as a "value , TYPE" line to out and echo at most echo_limit of them to echo
+## (out=None: echo only, echo=None: no echo, echo_limit=None: no cap). Returns the number of tokens
+def write_tokens(tokens, out, echo=None, echo_limit=None):
+    count = 0
+    echoed = 0
+    lines = []
+
+    def flush():
+        nonlocal count, echoed
+        if out is not None:
+            out.writelines(lines)
+        count += len(lines)
+        if echo is not None and (echo_limit is None or echoed < echo_limit):
+            shown = lines if echo_limit is None else lines[:echo_limit - echoed]
+            echo.writelines(shown)
+            echoed += len(shown)
+
+    for value, ttype in tokens:
+        lines.append(f"{value} , {ttype}\n")
+        if len(lines) == WRITE_BATCH:
+            flush()
+            lines = []
+    flush()
+    return count
+
+
+
+
+### Compact token list: one byte for the type code plus the offset and length of the lexeme in
+### the source text, no per-token tuple or substring. Indexing gives the usual (value, type) tuple,
+### so it reads like a list of tokens; the parsers read types and lexemes through accessors(), no tuple.
+### The source is a str or an ASCII bytes-like buffer such as an mmap (see scan_mapped_file),
+### lexemes are decoded on access
+class TokenStream:
+    def __init__(self, source):
+        self.source = source
+        self.is_text = isinstance(source, str)
+        self.kinds = array('B')
+        self.starts = array('Q')
+        self.lengths = array('I')
+        self._cached = (None, None)  # (index, token) of the last lookup, the parser peeks repeatedly
+
+    def append(self, code, start, length):
+        self.kinds.append(code)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    ### (value, type) of token i, negative indexes count from the end like a list
+    def __getitem__(self, i):
+        cached_i, token = self._cached
+        if i == cached_i:
+            return token
+        code = self.kinds[i]
+        if code == EOF_CODE:
+            token = ('EOF', 'EOF')
+        else:
+            start = self.starts[i]
+            value = self.source[start:start + self.lengths[i]]
+            token = (value if self.is_text else value.decode('ascii'), TOKEN_TYPES[code])
+        self._cached = (i, token)
+        return token
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self[i]
+
+    def kind(self, i):
+        return TOKEN_TYPES[self.kinds[i]]
+
+    ### (type of token i, lexeme of token i) functions for a parser, which looks at every token several
+    ### times: closures over the arrays, no attribute lookup and no (value, type) tuple per call
+    def accessors(self):
+        kinds, starts, lengths, source = self.kinds, self.starts, self.lengths, self.source
+        types, eof = TOKEN_TYPES, EOF_CODE
+
+        def type_at(i):
+            return types[kinds[i]]
+
+        if self.is_text:
+            def lexeme_at(i):
+                start = starts[i]
+                return source[start:start + lengths[i]] if kinds[i] != eof else 'EOF'
+        else:
+            def lexeme_at(i):
+                start = starts[i]
+                return source[start:start + lengths[i]].decode('ascii') if kinds[i] != eof else 'EOF'
+        return type_at, lexeme_at
+
+    ### lexeme of token i, sliced from the source without building the (value, type) tuple
+    def lexeme(self, i):
+        if self.kinds[i] == EOF_CODE:
+            return 'EOF'
+        start = self.starts[i]
+        value = self.source[start:start + self.lengths[i]]
+        return value if self.is_text else value.decode('ascii')
+
+    ### a TokenStream over the same source with copies of the arrays, unaffected by later edits of this one
+    def copy(self):
+        stream = TokenStream(self.source)
+        stream.is_text = self.is_text
+        stream.kinds = array('B', self.kinds)
+        stream.starts = array('Q', self.starts)
+        stream.lengths = array('I', self.lengths)
+        return stream
+
+    ### total bytes held by the arrays (the source text itself is shared, not counted)
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.starts, self.lengths))
+
+    ### release the source buffer when it is a memory map
+    def close(self):
+        if isinstance(self.source, mmap.mmap):
+            self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
 
 class TinyLexer:
 
-    ### Initialize with input text
-    def __init__(self, text):
+    ### Initialize with input text and the scanning engine to use (see ENGINES)
+    def __init__(self, text, engine='char'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown scanning engine '{engine}', expected one of {ENGINES}")
         self.text = text
         self.pos = 0
         self.length = len(text)
+        self.engine = engine
 
     ### retrun the current character without advancing
     def peek(self):
@@ -122,24 +305,441 @@ class TinyLexer:
     you can use the functions we created above (collect_identifier_or_keyword, collect_number, collect_operators_and_symbols, skip_whitespace, peek, advance)
     """
     def tokenize(self):
+        if self.engine == 'regex':
+            return self.tokenize_regex()
         tokens = []
         while True:
             self.skip_whitespace()
-            ch = self.peek()
-
-            if ch is None:
+            if self.peek() is None:
                 break
-            if ch.isalpha():
-                token = self.collect_identifier_or_keyword()
-            elif ch.isdigit():
-                token = self.collect_number()
-            else:
-                token = self. collect_operators_and_symbols()
+            tokens.append(self.next_token())
+
+        tokens.append(('EOF','EOF'))
+        return tokens
+
+    ## collect the token starting at the current (non-whitespace) position
+    def next_token(self):
+        ch = self.peek()
+        if ch.isalpha():
+            return self.collect_identifier_or_keyword()
+        elif ch.isdigit():
+            return self.collect_number()
+        else:
+            return self.collect_operators_and_symbols()
+
+    ## same tokens as tokenize() but every lexeme comes from one MASTER_PATTERN.findall call,
+    ## repeated lexemes share one token tuple. TINY is ASCII, anything else goes through the char engine
+    def tokenize_regex(self):
+        if not self.text.isascii():
+            return TinyLexer(self.text[self.pos:]).tokenize()
+
+        seen = {}
+        tokens = []
+        for lexeme in MASTER_PATTERN.findall(self.text, self.pos):
+            token = seen.get(lexeme)
+            if token is None:
+                if not lexeme:  # the empty match at the end of the text
+                    break
+                token = seen[lexeme] = classify_lexeme(lexeme)
             tokens.append(token)
 
+        self.pos = self.length
         tokens.append(('EOF','EOF'))
         return tokens
 
+    ## same tokens as tokenize() stored in a TokenStream over self.text, ending with EOF
+    def tokenize_stream(self):
+        stream = TokenStream(self.text)
+        append = stream.append
+
+        if self.text.isascii():
+            codes = {}
+            for m in MASTER_PATTERN.finditer(self.text, self.pos):
+                lexeme = m.group(1)
+                if lexeme is None:  # the empty match at the end of the text
+                    break
+                code = codes.get(lexeme)
+                if code is None:
+                    code = codes[lexeme] = TOKEN_CODES[classify_lexeme(lexeme)[1]]
+                start = m.start(1)
+                append(code, start, len(lexeme))
+            self.pos = self.length
+        else:
+            while True:
+                self.skip_whitespace()
+                if self.peek() is None:
+                    break
+                start = self.pos
+                append(TOKEN_CODES[self.next_token()[1]], start, self.pos - start)
+
+        append(EOF_CODE, self.length, 0)
+        return stream
+
+
+
+## scan a file through mmap, straight from the mapped bytes with no decoded copy of the text.
+## Returns a TokenStream over the map (close it when done, or use it in a with block).
+## TINY is ASCII, a file with other bytes is read as text and scanned by tokenize_stream() instead
+def scan_mapped_file(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # an empty file cannot be mapped
+            return TinyLexer('').tokenize_stream()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if NON_ASCII_BYTE.search(mapped):
+        mapped.close()
+        return TinyLexer(Path(path).read_text()).tokenize_stream()
+
+    stream = TokenStream(mapped)
+    codes = {}
+    size = len(mapped)
+    pos = 0
+    window = MAPPED_WINDOW
+    while pos < size:
+        end = min(size, pos + window)
+        pairs = MAPPED_PATTERN.findall(mapped, pos, end)
+        keep = len(pairs)
+        while keep and not pairs[keep - 1][1]:  # the empty match at the end, comments after the last token
+            keep -= 1
+        if end < size:
+            keep -= 1  # the last token may be cut by the window, it is scanned again with the next one
+            if keep <= 0:  # a comment or lexeme longer than the window
+                window *= 2
+                continue
+        elif keep == 0:
+            break
+        del pairs[keep:]
+
+        lexemes = [lexeme for _, lexeme in pairs]
+        for lexeme in set(lexemes).difference(codes):
+            codes[lexeme] = TOKEN_CODES[classify_lexeme(lexeme.decode('ascii'))[1]]
+        stream.kinds.extend(map(codes.__getitem__, lexemes))
+        stream.lengths.extend(map(len, lexemes))
+        offsets = accumulate(map(len, chain.from_iterable(pairs)), initial=pos)
+        stream.starts.extend(islice(offsets, 1, None, 2))
+        pos = stream.starts[-1] + stream.lengths[-1]
+    stream.append(EOF_CODE, size, 0)
+    return stream
+
+
+
+### Streaming: chunks are read from a file object and scanned as they arrive. A token that touches
+### the end of the buffered text may still grow (identifier, number, ':' before '=') so it is kept
+### back and re-scanned together with the next chunk; an open { comment is dropped chunk by chunk.
+CHUNK_SIZE = 64 * 1024
+SEEN_LIMIT = 4096
+
+
+## expecting to return (tokens, consumed, in_comment) for the complete tokens at the start of buf
+## in_comment is True when buf ends inside an unterminated { comment that the next chunk may close
+def scan_chunk(buf, final, seen=None):
+    if seen is None:
+        seen = {}
+    tokens = []
+    end = len(buf)
+
+    if not buf.isascii():  # same cut points, but with the char engine so non-ASCII behaves as in tokenize()
+        lexer = TinyLexer(buf)
+        while True:
+            skip_start = lexer.pos
+            lexer.skip_whitespace()
+            start = lexer.pos
+            if start >= end:
+                return tokens, end, not final and buf.rfind('{', skip_start) > buf.rfind('}', skip_start)
+            token = lexer.next_token()
+            if lexer.pos == end and not final:
+                return tokens, start, False
+            tokens.append(token)
+
+    for m in MASTER_PATTERN.finditer(buf):
+        lexeme = m.group(1)
+        if lexeme is None:  # only whitespace / comments up to the end of buf
+            skip_start = m.start()
+            return tokens, end, not final and buf.rfind('{', skip_start) > buf.rfind('}', skip_start)
+        if m.end() == end and not final:
+            return tokens, m.start(1), False
+        token = seen.get(lexeme)
+        if token is None:
+            token = seen[lexeme] = classify_lexeme(lexeme)
+        tokens.append(token)
+    return tokens, end, False
+
+
+## yield the same tokens as TinyLexer(source.read()).tokenize(), reading chunk_size characters at a time
+## memory stays bounded by the chunk size plus the longest token, whatever the size of the input
+def iter_tokens(source, chunk_size=CHUNK_SIZE):
+    seen = {}
+    pending = ''
+    in_comment = False
+    while True:
+        chunk = source.read(chunk_size)
+        final = not chunk
+        if in_comment:
+            close = chunk.find('}')
+            if close < 0 and not final:
+                continue
+            chunk = chunk[close + 1:] if close >= 0 else ''
+        buf = pending + chunk
+        tokens, consumed, in_comment = scan_chunk(buf, final, seen)
+        yield from tokens
+        if final:
+            break
+        pending = '' if in_comment else buf[consumed:]
+        if len(seen) > SEEN_LIMIT:
+            seen.clear()
+
+    yield ('EOF','EOF')
+
+
+
+### Incremental scanning: after an edit only the text from the end of the last token before the edit
+### is re-scanned, and only until a new token starts where an old (shifted) token started past the edit.
+### A token end is never inside a { comment, so the restart point needs no comment state, and an
+### edit that opens or closes a comment simply keeps the re-scan going until the tokens line up again.
+### Tokens before the edit and after the resync point are kept; only their offsets are shifted
+class IncrementalLexer:
+
+    ### scan text once; self.tokens is the TokenStream kept up to date by edit()
+    def __init__(self, text):
+        self.text = text
+        self.tokens = TinyLexer(text, engine='regex').tokenize_stream()
+
+    ### (code, start, length) of the tokens from position pos on, with the engine tokenize_stream() uses
+    def _scan_from(self, pos):
+        text = self.text
+        if text.isascii():
+            codes = {}
+            for m in MASTER_PATTERN.finditer(text, pos):
+                lexeme = m.group(1)
+                if lexeme is None:
+                    return
+                code = codes.get(lexeme)
+                if code is None:
+                    code = codes[lexeme] = TOKEN_CODES[classify_lexeme(lexeme)[1]]
+                yield code, m.start(1), len(lexeme)
+        else:
+            lexer = TinyLexer(text)
+            lexer.pos = pos
+            while True:
+                lexer.skip_whitespace()
+                if lexer.peek() is None:
+                    return
+                start = lexer.pos
+                yield TOKEN_CODES[lexer.next_token()[1]], start, lexer.pos - start
+
+    ## replace text[start:end] with new_text and update the tokens.
+    ## Returns (first, removed, added): tokens[first:first + removed] were replaced by `added` new tokens
+    def edit(self, start, end, new_text):
+        old_length = len(self.text)
+        if not 0 <= start <= end <= old_length:
+            raise ValueError(f"Edit range {start}:{end} outside the text (length {old_length})")
+        self.text = self.text[:start] + new_text + self.text[end:]
+        delta = len(new_text) - (end - start)
+        new_end = start + len(new_text)
+
+        stream = self.tokens
+        kinds, starts, lengths = stream.kinds, stream.starts, stream.lengths
+        count = len(kinds) - 1  # the last token is EOF
+
+        # first token that ends at or after the edit (it may grow into the edited text, "ab" + "c"),
+        # the re-scan starts at the end of the token before it
+        first = bisect_left(starts, start, 0, count)
+        if first and starts[first - 1] + lengths[first - 1] >= start:
+            first -= 1
+        restart = starts[first - 1] + lengths[first - 1] if first else 0
+
+        new_kinds, new_starts, new_lengths = array('B'), array('Q'), array('I')
+        old = first  # first old token not yet passed by the re-scan
+        for code, token_start, length in self._scan_from(restart):
+            if token_start >= new_end:
+                while old < count and starts[old] + delta < token_start:
+                    old += 1
+                if old < count and starts[old] + delta == token_start:
+                    break  # same text from here on: the rest of the old tokens are still valid
+            new_kinds.append(code)
+            new_starts.append(token_start)
+            new_lengths.append(length)
+        else:
+            old = count
+
+        tail = starts[old:]
+        if delta:
+            tail = array('Q', map(delta.__add__, tail))
+        kinds[first:old] = new_kinds
+        lengths[first:old] = new_lengths
+        starts[first:] = new_starts + tail
+        stream.source = self.text
+        stream._cached = (None, None)
+        return first, old - first, len(new_kinds)
+
+
+
+### Binary token file: header (magic, token count, text size), the type code of every token as a
+### byte, the length of every lexeme as a little-endian uint32, then the lexemes back to back as
+### UTF-8 text. Loading is two array.fromfile() calls and one accumulate() for the offsets.
+### The type codes are TOKEN_TYPES indexes: change BINARY_MAGIC whenever TOKEN_TYPES changes
+BINARY_MAGIC = b'TINYTOK1'
+BINARY_HEADER = struct.Struct('<8sQQ')
+
+
+## write tokens (a TokenStream or any iterable of (value, type)) to the binary file object out
+def write_binary_tokens(tokens, out):
+    if isinstance(tokens, TokenStream):
+        kinds = tokens.kinds
+        lengths = tokens.lengths
+        source = tokens.source
+        lexemes = [source[start:start + length] for start, length in zip(tokens.starts, lengths)]
+        text = ''.join(lexemes).encode('utf-8') if tokens.is_text else b''.join(lexemes)
+    else:
+        kinds = array('B')
+        lengths = array('I')
+        lexemes = []
+        for value, ttype in tokens:
+            code = TOKEN_CODES.get(ttype)
+            if code is None:
+                raise Exception(f"Token type '{ttype}' cannot be stored in a binary token file")
+            if code == EOF_CODE:
+                value = ''
+            kinds.append(code)
+            lengths.append(len(value))
+            lexemes.append(value)
+        text = ''.join(lexemes).encode('utf-8')
+
+    if sys.byteorder == 'big':
+        lengths = array('I', lengths)
+        lengths.byteswap()
+    out.write(BINARY_HEADER.pack(BINARY_MAGIC, len(kinds), len(text)))
+    kinds.tofile(out)
+    lengths.tofile(out)
+    out.write(text)
+    return len(kinds)
+
+
+## True when path starts with the binary token file magic
+def is_binary_token_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+## load a binary token file written by write_binary_tokens into a TokenStream
+def read_binary_tokens(path):
+    with open(path, 'rb') as f:
+        return load_binary_tokens(f, path)
+
+
+## load binary tokens from the binary file object f (any object with read(), e.g. io.BytesIO)
+## into a TokenStream, name is the file name used in error messages
+def load_binary_tokens(f, name):
+    header = f.read(BINARY_HEADER.size)
+    if len(header) != BINARY_HEADER.size or header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise Exception(f"'{name}' is not a binary token file")
+    _, count, text_size = BINARY_HEADER.unpack(header)
+
+    stream = TokenStream(None)
+    try:
+        stream.kinds.fromfile(f, count)
+        stream.lengths.fromfile(f, count)
+    except EOFError:
+        raise Exception(f"Binary token file '{name}' is truncated")
+    text = f.read(text_size)
+    if len(text) != text_size:
+        raise Exception(f"Binary token file '{name}' is truncated")
+
+    if sys.byteorder == 'big':
+        stream.lengths.byteswap()
+    stream.starts = array('Q', accumulate(stream.lengths, initial=0))
+    stream.starts.pop()
+    stream.source = text.decode('utf-8')
+    stream.is_text = True
+    return stream
+
+
+
+### Batch mode: many source files, one token file each, spread over worker processes.
+### Token files are named after their source plus one of these suffixes (and never scanned themselves)
+BATCH_SUFFIXES = ('.tokens.txt', '.tokens.bin')
+
+## scan one source file into output_path (text or binary token file), returns the number of tokens
+def scan_file(input_path, output_path, engine='char', binary=False):
+    lexer = TinyLexer(Path(input_path).read_text(), engine=engine)
+    if binary:
+        with open(output_path, 'wb', buffering=OUTPUT_BUFFER) as f:
+            return write_binary_tokens(lexer.tokenize_stream(), f)
+    with open(output_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+        return write_tokens(lexer.tokenize(), f)
+
+
+## worker side of scan_batch: (input, output, token count or None, seconds, error message or None)
+def scan_batch_job(job):
+    input_path, output_path, engine, binary = job
+    start = time.perf_counter()
+    try:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        count = scan_file(input_path, output_path, engine, binary)
+        return (input_path, output_path, count, time.perf_counter() - start, None)
+    except Exception as e:
+        return (input_path, output_path, None, time.perf_counter() - start, str(e))
+
+
+## the source files named by sources (a directory: its files matching pattern, or a glob pattern)
+## returns (base directory, sorted [(path, path relative to base)]), base being the directory itself
+## or the part of the glob before the first wildcard
+def collect_batch_inputs(sources, pattern='*'):
+    if Path(sources).is_dir():
+        base = Path(sources)
+        paths = [path for path in base.glob(pattern) if path.is_file() and not path.name.endswith(BATCH_SUFFIXES)]
+    else:
+        fixed = []
+        for part in Path(sources).parts[:-1]:
+            if any(c in part for c in '*?['):
+                break
+            fixed.append(part)
+        base = Path(*fixed)
+        paths = [Path(path) for path in glob.glob(sources, recursive=True)
+                 if Path(path).is_file() and not path.endswith(BATCH_SUFFIXES)]
+    return base, sorted((path, path.relative_to(base)) for path in paths)
+
+
+## scan every input into out_dir (same relative layout, name + '.tokens.txt' / '.tokens.bin') with
+## `workers` processes, workers=1 scans in this process. Yields the scan_batch_job results in input order
+def scan_batch(inputs, out_dir, workers=None, engine='char', binary=False):
+    suffix = BATCH_SUFFIXES[1] if binary else BATCH_SUFFIXES[0]
+    jobs = [(str(path), str(Path(out_dir) / relative.with_name(relative.name + suffix)), engine, binary)
+            for path, relative in inputs]
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(scan_batch_job, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        yield from pool.map(scan_batch_job, jobs, chunksize=chunksize)
+
+
+def run_batch(args):
+    base, inputs = collect_batch_inputs(args.batch, args.pattern)
+    if not inputs:
+        print(f"Error: no input files match '{args.batch}'.")
+        return
+    out_dir = Path(args.out_dir) if args.out_dir else base
+
+    start = time.perf_counter()
+    files = tokens = failed = 0
+    busy = 0.0
+    for input_path, output_path, count, seconds, error in scan_batch(
+            inputs, out_dir, workers=args.workers, engine=args.engine, binary=args.binary):
+        files += 1
+        busy += seconds
+        if error is not None:
+            failed += 1
+            print(f"FAILED  {input_path}: {error}")
+            continue
+        tokens += count
+        if not args.no_echo:
+            print(f"{seconds * 1000:9.2f} ms  {count:>10} tokens  {input_path} -> {output_path}")
+    wall = time.perf_counter() - start
+
+    print(f"Batch complete. {files - failed}/{files} files, {tokens} tokens in {wall:.3f} s "
+          f"({tokens / wall if wall else 0:,.0f} tokens/s, {busy:.3f} s spent in workers)")
+
 
 
 
@@ -153,12 +753,44 @@ def main():
 
     default_in = script_directory / "input.txt"
     default_out = script_directory / "output.txt"
-    if  1 == len(sys.argv):
+
+    arg_parser = argparse.ArgumentParser(
+        usage="<exe> or python main.py [<input_file> <output_file>] [options]")
+    arg_parser.add_argument('paths', nargs='*')
+    arg_parser.add_argument('--engine', choices=ENGINES, default='char',
+                            help="scanning engine (default: char)")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="read the input in chunks with iter_tokens() instead of all at once")
+    arg_parser.add_argument('--mmap', action='store_true',
+                            help="memory-map the input and scan its bytes without decoding a copy")
+    arg_parser.add_argument('--binary', action='store_true',
+                            help="write a binary token file (see write_binary_tokens) instead of text")
+    arg_parser.add_argument('--no-echo', action='store_true',
+                            help="do not print the tokens to the console")
+    arg_parser.add_argument('--echo-limit', type=int, default=None, metavar='N',
+                            help="print only the first N tokens to the console")
+    arg_parser.add_argument('--batch', default=None, metavar='SOURCES',
+                            help="scan every file of a directory, or matching a glob pattern, into one token "
+                                 "file each")
+    arg_parser.add_argument('--pattern', default='*',
+                            help="with --batch DIRECTORY: file name pattern to scan (default: *)")
+    arg_parser.add_argument('--out-dir', default=None, metavar='DIR',
+                            help="with --batch: directory for the token files (default: next to the inputs)")
+    arg_parser.add_argument('--workers', type=int, default=None, metavar='N',
+                            help="with --batch: worker processes (default: one per CPU, 1: no pool)")
+    args = arg_parser.parse_args()
+
+    if args.batch is not None and not args.paths:
+        run_batch(args)
+        pause_if_frozen()
+        return
+
+    if 0 == len(args.paths):
         input_path = default_in
         output_path = default_out
-    elif 3 == len(sys.argv):
-        input_path = Path(sys.argv[1])
-        output_path = Path(sys.argv[2])
+    elif 2 == len(args.paths):
+        input_path = Path(args.paths[0])
+        output_path = Path(args.paths[1])
     else:
         print("Usage: <exe> or python main.py <input_file> <output_file>")
         pause_if_frozen()
@@ -170,24 +802,46 @@ def main():
         pause_if_frozen()
         return
 
-    text = input_path.read_text()
-
-    lexer = TinyLexer(text)
-    tokens = lexer.tokenize()
-
-    with output_path.open('w', encoding='utf-8') as f:
-        for value, ttype in tokens:
-            f.write(f"{value} , {ttype}\n")
-
-    print(f"Tokenization complete. {len(tokens)} tokens written to {output_path.resolve()}")
-    print("--- Tokens ---")
-    for value, ttype in tokens:
-        print(f"{value} , {ttype}")
+    if args.mmap:
+        source = tokens = scan_mapped_file(input_path)
+    elif args.stream:
+        source = input_path.open()
+        tokens = iter_tokens(source)
+    elif args.binary:
+        source = None
+        tokens = TinyLexer(input_path.read_text(), engine=args.engine).tokenize_stream()
+    else:
+        source = None
+        tokens = TinyLexer(input_path.read_text(), engine=args.engine).tokenize()
+
+    echo = None if args.no_echo else sys.stdout
+    try:
+        if args.binary:
+            if args.stream:  # the binary writer needs every token, collect them while they stream by
+                tokens = list(tokens)
+            with output_path.open('wb', buffering=OUTPUT_BUFFER) as f:
+                count = write_binary_tokens(tokens, f)
+            if echo is not None:
+                print("--- Tokens ---")
+                write_tokens(tokens, None, echo=echo, echo_limit=args.echo_limit)
+        else:
+            with output_path.open('w', encoding='utf-8', buffering=OUTPUT_BUFFER) as f:
+                if echo is not None:
+                    print("--- Tokens ---")
+                count = write_tokens(tokens, f, echo=echo, echo_limit=args.echo_limit)
+    finally:
+        if source is not None:
+            source.close()
+
+    if echo is not None and args.echo_limit is not None and count > args.echo_limit:
+        print(f"... {count - max(args.echo_limit, 0)} more tokens not shown")
+    print(f"Tokenization complete. {count} tokens written to {output_path.resolve()}")
 
     pause_if_frozen()
     
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # batch workers in the PyInstaller executable
     main()
 
 
@@ -0,0 +1,7 @@
+# conftest.py
+# The modules import each other from the repository root and Parser/, like the scripts do when run
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "Parser")]
@@ -0,0 +1,155 @@
+# test_incremental.py
+# After any edit IncrementalParser.reparse must give what a full parse of the edited tokens gives: the same
+# tree, or the same syntax error. Edits go through IncrementalLexer (source) or diff_tokens (token lists)
+import random
+import re
+
+from sample_programs import generate_source, same_tree
+from scanner import TinyLexer, IncrementalLexer
+from tiny_parser import TinyParser
+from tiny_incremental import IncrementalParser, merge_edits, diff_tokens
+
+### text inserted by the random edits: whole statements, pieces of statements and lone keywords
+SNIPPETS = (" write 1;", " x := (x + 1) * 2;", " repeat y := y - 1 until y < 0;", "if x < 1 then ", " end",
+            " else ", ";", " until ", "(", ")", " + 3", "7", "read z; ", "  ")
+STATEMENTS = (" write 1;", " x := (x + 1) * 2;", " repeat y := y - 1 until y < 0;",
+              " if x < 1 then read x end;")
+
+
+##### (tree, None) of a full parse of tokens, or (None, error message)
+def full_parse(tokens):
+    try:
+        return TinyParser(tokens).parse_program(), None
+    except Exception as e:
+        return None, str(e)
+
+
+##### (tree, None) of parser.reparse(*edit), or (None, error message)
+def reparse(parser, edit, tokens=None):
+    try:
+        return parser.reparse(*edit, tokens), None
+    except Exception as e:
+        return None, str(e)
+
+
+def assert_same_result(result, expected, context):
+    tree, error = result
+    expected_tree, expected_error = expected
+    assert error == expected_error, context
+    if expected_tree is not None:
+        assert same_tree(tree, expected_tree), context
+
+
+##### a random edit (start, end, new text) of text: mostly a changed number or a statement inserted after a
+##### ';', which keep the program valid, otherwise a snippet replacing or inserted at any position
+def random_edit(rng, text):
+    r = rng.random()
+    if r < 0.3:
+        digits = [m.start() for m in re.finditer(r'\d', text)]
+        if digits:
+            start = rng.choice(digits)
+            return start, start + 1, str(rng.randint(0, 99))
+    elif r < 0.6:
+        ends = [m.end() for m in re.finditer(';', text)]
+        if ends:
+            return (start := rng.choice(ends)), start, rng.choice(STATEMENTS)
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.choice((0, 0, 1, 2, 5, 12)))
+    return start, end, rng.choice(SNIPPETS) if rng.random() < 0.8 or start == end else ""
+
+
+##### the edit (start, end, new text) that turns text into target: everything outside their common prefix
+##### and suffix
+def text_edit(text, target):
+    count = min(len(text), len(target))
+    start = 0
+    while start < count and text[start] == target[start]:
+        start += 1
+    tail = 0
+    while tail < count - start and text[-1 - tail] == target[-1 - tail]:
+        tail += 1
+    return start, len(text) - tail, target[start:len(target) - tail]
+
+
+def test_source_edits_match_full_parse():
+    rng = random.Random(0)
+    lexer = IncrementalLexer(generate_source(15))
+    parser = IncrementalParser(lexer.tokens)
+    parser.parse()
+    last_valid, broken, valid = lexer.text, 0, 0
+    for step in range(600):
+        if broken > rng.randint(0, 3):
+            # back to the last valid program in one edit, the tree comes back from failed re-parses
+            edit = text_edit(lexer.text, last_valid)
+        else:
+            edit = random_edit(rng, lexer.text)
+        result = reparse(parser, lexer.edit(*edit))
+        assert_same_result(result, full_parse(TinyLexer(lexer.text, engine='regex').tokenize()),
+                           (step, edit, lexer.text))
+        if result[1] is None:
+            last_valid, broken, valid = lexer.text, 0, valid + 1
+        else:
+            broken += 1
+    assert valid > 300  # most steps edit a valid program
+
+
+def test_merged_edits_match_full_parse():
+    rng = random.Random(1)
+    lexer = IncrementalLexer(generate_source(10))
+    parser = IncrementalParser(lexer.tokens)
+    parser.parse()
+    last_valid, valid = lexer.text, 0
+    for step in range(150):
+        pending = None
+        for edit in [text_edit(lexer.text, last_valid)] + [None] * rng.randint(1, 3):
+            edit = lexer.edit(*(edit or random_edit(rng, lexer.text)))
+            pending = edit if pending is None else merge_edits(pending, edit)
+        result = reparse(parser, pending)
+        assert_same_result(result, full_parse(TinyLexer(lexer.text, engine='regex').tokenize()),
+                           (step, lexer.text))
+        if result[1] is None:
+            last_valid, valid = lexer.text, valid + 1
+    assert valid > 50
+
+
+def test_token_list_edits_match_full_parse():
+    rng = random.Random(2)
+    tokens = last_valid = TinyLexer(generate_source(10), engine='regex').tokenize()
+    parser = IncrementalParser(tokens)
+    parser.parse()
+    valid = 0
+    for step in range(300):
+        if tokens is not last_valid and rng.random() < 0.5:
+            new_tokens = last_valid
+        else:
+            text = " ".join(value for value, _ in tokens[:-1])
+            start, end, new_text = random_edit(rng, text)
+            new_tokens = TinyLexer(text[:start] + new_text + text[end:], engine='regex').tokenize()
+        result = reparse(parser, diff_tokens(parser.tokens, new_tokens), new_tokens)
+        assert_same_result(result, full_parse(new_tokens), (step, new_tokens))
+        tokens = new_tokens
+        if result[1] is None:
+            last_valid, valid = tokens, valid + 1
+    assert valid > 150
+
+
+def test_statements_outside_the_edit_are_reused():
+    lexer = IncrementalLexer("read x; y := x + 1; if y < 3 then write y end; write x")
+    parser = IncrementalParser(lexer.tokens)
+    before = list(parser.parse().children[0].children)
+    position = lexer.text.index("x + 1")
+    tree = parser.reparse(*lexer.edit(position, position + 1, "y"))
+    after = tree.children[0].children
+    assert after[0] is before[0] and after[2] is before[2] and after[3] is before[3]
+    assert after[1] is not before[1]
+    assert after[1].children[1].children[1].value == 'y'
+
+
+def test_reparse_after_an_error_recovers():
+    lexer = IncrementalLexer("read x; write x")
+    parser = IncrementalParser(lexer.tokens)
+    parser.parse()
+    assert reparse(parser, lexer.edit(7, 7, " if"))[1] is not None
+    tree, error = reparse(parser, lexer.edit(7, 10, ""))
+    assert error is None
+    assert same_tree(tree, full_parse(TinyLexer(lexer.text).tokenize())[0])
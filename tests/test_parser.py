@@ -0,0 +1,61 @@
+# test_parser.py
+# The token helpers keep their (value, type) results for lists and TokenStreams alike, and every parser
+# engine builds the same tree, or raises the same error, from either representation
+import pytest
+
+from sample_programs import generate_source, same_tree
+from scanner import TinyLexer
+from tiny_parser import TinyParser, PARSER_ENGINES
+
+SOURCES = [
+    "read x; if x < 1 then write (x + 2) * 3 else repeat x := x - 1 until x = 0 end",
+    "x := 1 + 2 * 3 - 4 / (5 - 6) = 7; write x",
+    generate_source(10),
+]
+
+ERRORS = ["read", "x := (1", "write 1 +", "if x then write 1", "read x;; write x", "write 1 < 2 < 3"]
+
+
+def token_lists(source):
+    return [TinyLexer(source).tokenize(), TinyLexer(source).tokenize_stream()]
+
+
+@pytest.mark.parametrize("tokens", token_lists("read x"), ids=["list", "stream"])
+def test_helpers_return_tokens(tokens):
+    parser = TinyParser(tokens)
+    assert parser.peek() == ('read', 'READ')
+    assert parser.advance() == ('read', 'READ')
+    assert parser.match('IDENTIFIER') == ('x', 'IDENTIFIER')
+    assert parser.peek_type() == 'EOF'
+    assert parser.advance() == ('EOF', 'EOF')
+    assert parser.advance() == ('EOF', 'EOF')  # past the end
+    with pytest.raises(Exception, match=r"Expected READ but got \('EOF', 'EOF'\)"):
+        parser.match('READ')
+
+
+@pytest.mark.parametrize("tokens", token_lists("write y"), ids=["list", "stream"])
+def test_lexeme_helpers(tokens):
+    parser = TinyParser(tokens)
+    assert parser.match_lexeme('WRITE') == 'write'
+    assert parser.advance_lexeme() == 'y'
+    assert parser.peek_type() == 'EOF'
+    assert parser.advance_lexeme() == 'EOF'
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_engines_build_the_same_tree(source):
+    expected = TinyParser(TinyLexer(source).tokenize()).parse_program()
+    for engine, parser_class in sorted(PARSER_ENGINES.items()):
+        for tokens in token_lists(source):
+            assert same_tree(parser_class(tokens).parse_program(), expected), engine
+
+
+@pytest.mark.parametrize("source", ERRORS)
+def test_engines_raise_the_same_error(source):
+    with pytest.raises(Exception) as expected:
+        TinyParser(TinyLexer(source).tokenize()).parse_program()
+    for engine, parser_class in sorted(PARSER_ENGINES.items()):
+        for tokens in token_lists(source):
+            with pytest.raises(Exception) as error:
+                parser_class(tokens).parse_program()
+            assert str(error.value) == str(expected.value), engine
@@ -0,0 +1,119 @@
+# test_token_files.py
+# Token files survive a round trip: text files written by write_tokens and binary files written by
+# write_binary_tokens load back as the tokens they were written from, and parse to the same tree
+import io
+
+import pytest
+
+import scanner
+from sample_programs import generate_source, same_tree
+from scanner import (TinyLexer, write_tokens, write_binary_tokens, read_binary_tokens, load_binary_tokens,
+                     is_binary_token_file, scan_mapped_file, BINARY_HEADER)
+from tiny_parser import PARSER_ENGINES, read_token_file, parse_token_text
+
+SAMPLES = [
+    "read x; write x",
+    "read x, y; write x,y {,} é",        # comma and non-ASCII lexemes
+    "x := 10 + y ; ; ## := :",           # unknown characters and a lone ':'
+    "{ only a comment }",
+    generate_source(20),
+]
+
+
+def write_text_file(path, tokens):
+    with open(path, 'w', encoding='utf-8') as f:
+        write_tokens(tokens, f)
+
+
+def write_binary_file(path, tokens):
+    with open(path, 'wb') as f:
+        write_binary_tokens(tokens, f)
+
+
+@pytest.mark.parametrize("source", SAMPLES)
+def test_text_round_trip(tmp_path, source):
+    tokens = TinyLexer(source).tokenize()
+    path = tmp_path / "tokens.txt"
+    write_text_file(path, tokens)
+    assert not is_binary_token_file(path)
+    assert read_token_file(path) == tokens
+
+
+@pytest.mark.parametrize("source", SAMPLES)
+def test_binary_round_trip(tmp_path, source):
+    tokens = TinyLexer(source).tokenize()
+    path = tmp_path / "tokens.bin"
+    for written in (tokens, TinyLexer(source).tokenize_stream()):
+        write_binary_file(path, written)
+        assert is_binary_token_file(path)
+        assert list(read_binary_tokens(path)) == tokens
+        assert list(read_token_file(path)) == tokens
+
+
+def test_binary_round_trip_from_mapped_file(tmp_path):
+    source_path = tmp_path / "program.tiny"
+    source_path.write_text(generate_source(20))
+    tokens = TinyLexer(source_path.read_text()).tokenize()
+    out = io.BytesIO()
+    with scan_mapped_file(source_path) as stream:
+        write_binary_tokens(stream, out)
+    out.seek(0)
+    assert list(load_binary_tokens(out, "<memory>")) == tokens
+
+
+@pytest.mark.parametrize("window", [1, 3, 64, 4096])
+def test_mapped_file_windows(tmp_path, monkeypatch, window):
+    # tokens and comments cut by the window end are scanned again with the next window
+    monkeypatch.setattr(scanner, 'MAPPED_WINDOW', window)
+    path = tmp_path / "program.tiny"
+    for source in SAMPLES[2:] + ["x:=y{ open comment", "read abc123 ;  ", "{" + "c" * 100 + "} x:=1"]:
+        path.write_text(source)
+        with scan_mapped_file(path) as stream:
+            assert list(stream) == list(TinyLexer(source).tokenize_stream()), source
+
+
+def test_text_and_binary_files_parse_to_the_same_tree(tmp_path):
+    tokens = TinyLexer(generate_source(30), engine='regex').tokenize()
+    write_text_file(tmp_path / "tokens.txt", tokens)
+    write_binary_file(tmp_path / "tokens.bin", tokens)
+    expected = PARSER_ENGINES['iterative'](tokens).parse_program()
+    for name in ("tokens.txt", "tokens.bin"):
+        for engine in sorted(PARSER_ENGINES):
+            tree = PARSER_ENGINES[engine](read_token_file(tmp_path / name)).parse_program()
+            assert same_tree(tree, expected), (name, engine)
+
+
+def test_hand_edited_text():
+    text = ("# a comment\n"
+            "\n"
+            "read , READ\n"
+            "  x   ,IDENTIFIER  \n"
+            ", , UNKNOWN\n"
+            "a,b , UNKNOWN\n")
+    assert parse_token_text(text) == [('read', 'READ'), ('x', 'IDENTIFIER'), (',', 'UNKNOWN'),
+                                      ('a,b', 'UNKNOWN')]
+
+
+def test_text_without_eof_gets_one(tmp_path):
+    path = tmp_path / "tokens.txt"
+    path.write_text("read , READ\nx , IDENTIFIER\n")
+    assert read_token_file(path) == [('read', 'READ'), ('x', 'IDENTIFIER'), ('EOF', 'EOF')]
+
+
+def test_invalid_text_line_is_reported():
+    with pytest.raises(Exception, match="Invalid token format on line 2"):
+        parse_token_text("read , READ\nx IDENTIFIER\n")
+
+
+def test_binary_rejects_unknown_token_types():
+    with pytest.raises(Exception, match="cannot be stored in a binary token file"):
+        write_binary_tokens([('(', 'LPAREN')], io.BytesIO())
+
+
+def test_truncated_binary_file_is_reported():
+    out = io.BytesIO()
+    write_binary_tokens(TinyLexer("read x; write x").tokenize(), out)
+    data = out.getvalue()
+    for size in (BINARY_HEADER.size - 1, BINARY_HEADER.size + 3, len(data) - 1):
+        with pytest.raises(Exception):
+            load_binary_tokens(io.BytesIO(data[:size]), "<truncated>")
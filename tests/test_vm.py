@@ -0,0 +1,141 @@
+# test_vm.py
+# The bytecode VM must write the same values as the reference evaluation
+# (sample_programs.labelled_evaluate, a plain walk over the node labels) and fail with the same errors as
+# TinyInterpreter
+from pathlib import Path
+import random
+
+import pytest
+
+from sample_programs import labelled_evaluate, generate_source, generate_loop_source, generate_constant_source
+from scanner import TinyLexer
+from tiny_parser import PARSER_ENGINES, read_token_file
+from tiny_interpreter import TinyInterpreter
+from tiny_optimize import fold_constants
+from tiny_vm import Bytecode
+
+INPUT5 = Path(__file__).resolve().parent.parent / "Parser" / "input5.txt"
+
+
+def parse(source):
+    return PARSER_ENGINES['iterative'](TinyLexer(source, engine='regex').tokenize()).parse_program()
+
+
+##### (program, inputs) of a random program over a, b, c: nested if/else and repeat, every operator,
+##### comparisons used as values. Every repeat counts its own variable down, so all of them end
+def random_program(rng):
+    def expr(depth, ops='+-*/'):
+        if depth <= 0 or rng.random() < 0.3:
+            return rng.choice(('a', 'b', 'c', str(rng.randint(0, 5))))
+        text = f"{expr(depth - 1, ops)} {rng.choice(ops)} {expr(depth - 1, ops)}"
+        if rng.random() < 0.3:
+            text = f"({text})"
+        if rng.random() < 0.2:
+            text = f"{text} {rng.choice('<=')} {expr(depth - 1, ops)}"
+        return text
+
+    def statements(depth):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            r = rng.random()
+            if depth > 0 and r < 0.2:
+                else_part = f" else {statements(depth - 1)}" if rng.random() < 0.5 else ""
+                parts.append(f"if {expr(2)} then {statements(depth - 1)}{else_part} end")
+            elif depth > 0 and r < 0.35:
+                counter = f"k{depth}"
+                parts.append(f"{counter} := {rng.randint(0, 4)}; "
+                             f"repeat {statements(depth - 1)}; {counter} := {counter} - 1 until {counter} < 1")
+            elif r < 0.5:
+                parts.append(f"read {rng.choice('abc')}")
+            elif r < 0.7:
+                parts.append(f"write {expr(3)}")
+            else:
+                # no * inside loops, repeated squaring grows the numbers too fast
+                parts.append(f"{rng.choice('abc')} := {expr(3, '+-/' if depth < 3 else '+-*/')}")
+        return "; ".join(parts)
+
+    return statements(3), [rng.randint(-5, 5) for _ in range(rng.randint(0, 6))]
+
+
+##### outputs of a run, or ('error', message)
+def outcome(run, inputs):
+    try:
+        return run(inputs)
+    except Exception as e:
+        return ('error', str(e))
+
+
+PROGRAMS = [
+    ("factorial blocks", generate_source(40), [random.Random(1).randint(0, 12) for _ in range(40)]),
+    ("loop", generate_loop_source(), [200]),
+    ("constant-heavy", generate_constant_source(12), [30]),
+    ("division truncates toward zero",
+     "write 7 / 2; write 0 - 7 / 2; write (0 - 7) / 2; write 7 / (0 - 2)", []),
+    ("comparisons as values", "read x; y := x < 3; z := x = 4; write y + z * 2; write (x < 5) * 10", [4]),
+    ("if without else", "read x; if x < 0 then x := 0 - x end; write x", [-9]),
+    ("if else chain", "read x; if x = 1 then write 10 else if x = 2 then write 20 else write 30 end end",
+     [2]),
+    ("nested repeat", "read n; repeat k := n; repeat write k * n; k := k - 1 until k = 0; n := n - 1 "
+                      "until n < 1", [4]),
+    ("compare and jump on expressions", "read x; repeat x := x + 3 until x * 2 = 18 + 0; "
+                                        "if x + 1 < x * 2 then write x end", [0]),
+    ("uninitialized variables", "write never + 1; x := x + y; write x", []),
+]
+
+
+@pytest.mark.parametrize("name, source, inputs", PROGRAMS, ids=[name for name, _, _ in PROGRAMS])
+def test_matches_reference_evaluation(name, source, inputs):
+    program = parse(source)
+    expected, _ = labelled_evaluate(program, inputs)
+    assert Bytecode(program).run(inputs) == expected
+    assert Bytecode(fold_constants(program)).run(inputs) == expected
+
+
+@pytest.mark.parametrize("inputs", [[3, 5], [3, -5]])
+def test_token_file_program(inputs):
+    program = PARSER_ENGINES['iterative'](read_token_file(INPUT5)).parse_program()
+    expected, _ = labelled_evaluate(program, inputs)
+    assert Bytecode(program).run(inputs) == expected
+
+
+def test_random_programs():
+    rng = random.Random(0)
+    checked = 0
+    while checked < 300:
+        source, inputs = random_program(rng)
+        try:
+            program = parse(source)
+        except Exception:
+            continue  # e.g. a comparison chained on a comparison
+        expected = outcome(TinyInterpreter(program).run, inputs)
+        if not isinstance(expected, tuple):
+            assert labelled_evaluate(program, inputs)[0] == expected, source
+        assert outcome(Bytecode(program).run, inputs) == expected, source
+        checked += 1
+
+
+@pytest.mark.parametrize("source, inputs, message", [
+    ("x := 0; write 5 / x", [], "Runtime Error: division by zero"),
+    ("read x; read y", [1], "Runtime Error: no input left for 'read y'"),
+])
+def test_errors_match_interpreter(source, inputs, message):
+    program = parse(source)
+    with pytest.raises(Exception, match=message):
+        TinyInterpreter(program).run(inputs)
+    with pytest.raises(Exception, match=message):
+        Bytecode(program).run(inputs)
+
+
+def test_variables_and_steps_after_run():
+    program = parse("read n; total := 0; repeat total := total + n; n := n - 1 until n = 0; write total")
+    bytecode = Bytecode(program)
+    assert bytecode.run([4]) == [10]
+    assert bytecode.variables == {'n': 0, 'total': 10}
+    assert bytecode.steps == 2 + 3 * 4 + 3  # READ, MOVE, four runs of the loop body, LOAD, WRITE, HALT
+
+
+def test_disassemble_lists_every_instruction():
+    bytecode = Bytecode(parse("read x; if x < 3 then write x * 2 else x := x - 1 end"))
+    lines = bytecode.disassemble().split("\n")
+    assert len(lines) == len(bytecode)
+    assert lines[-1].split()[1] == 'HALT'